@@ -0,0 +1,51 @@
+"""Memory of parsed map entities: list of dictionaries against the columnar EntityTable"""
+
+import argparse
+import gc
+import tracemalloc
+from typing import Callable
+
+from bspp import bspp
+from bspp.model import EntityTable, StringTable
+from bspp.postprocess import count_by_classname
+from bench.synthetic import entities_lump, synthetic_entities
+
+
+def traced_size(build: Callable[[], object]) -> int:
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--maps", type=int, default=20, help="number of maps kept in memory")
+    parser.add_argument("--entities", type=int, default=2000, help="entities per map")
+    args = parser.parse_args()
+
+    lumps = [entities_lump(synthetic_entities(args.entities, seed))[:-1] for seed in range(args.maps)]
+
+    def dicts():
+        return [list(bspp.parse_entities(lump)) for lump in lumps]
+
+    def tables():
+        strings = StringTable()
+        return [EntityTable(bspp.parse_entities(lump), strings) for lump in lumps]
+
+    dict_size = traced_size(dicts)
+    table_size = traced_size(tables)
+    print(f"{args.maps} maps, {args.entities + 1} entities each")
+    print(f"dicts        {dict_size / 1e6:10.2f} MB")
+    print(f"EntityTable  {table_size / 1e6:10.2f} MB")
+    print(f"ratio        {dict_size / table_size:10.2f}x")
+    if [count_by_classname(e) for e in dicts()] != [count_by_classname(e) for e in tables()]:
+        raise Exception("Aggregation mismatch")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Entities lump parsing: the line based regex parser against the byte tokenizer, with and without projection"""
+
+import argparse
+import gc
+import time
+from typing import Callable
+
+from bspp import bspp
+from bspp.postprocess import pp_entity_filter
+from bench.synthetic import entities_lump, synthetic_entities
+
+
+def best_of(fn: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+        gc.enable()
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entities", type=int, default=20000, help="number of entities in the lump")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    lump = entities_lump(synthetic_entities(args.entities))[:-1]  # get_lump strips the terminating zero
+    regex = best_of(lambda: list(bspp.parse_entity_obj(str(lump, encoding="ascii").splitlines())), args.repeat)
+    tokenizer = best_of(lambda: list(bspp.parse_entities(lump)), args.repeat)
+    projected = best_of(
+        lambda: list(bspp.parse_entities(lump, pp_entity_filter.accepts, pp_entity_filter.keys)), args.repeat
+    )
+    counts = best_of(lambda: bspp.count_entities(lump), args.repeat)
+    print(f"lump size: {len(lump) / 1e6:.2f} MB, {args.entities + 1} entities")
+    print(f"regex     {regex * 1000:10.2f} ms {len(lump) / regex / 1e6:8.2f} MB/s")
+    print(f"tokenizer {tokenizer * 1000:10.2f} ms {len(lump) / tokenizer / 1e6:8.2f} MB/s")
+    print(f"speedup   {regex / tokenizer:10.2f}x")
+    print(f"pp_map projection {projected * 1000:10.2f} ms, speedup {regex / projected:.2f}x")
+    print(f"counts only       {counts * 1000:10.2f} ms, speedup {regex / counts:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""MD4 throughput: hashlib (when OpenSSL provides it) against the built-in fallback"""
+
+import argparse
+import hashlib
+import os
+import time
+from typing import Any, Callable, Dict
+
+from bspp.md4 import MD4
+
+
+def throughput(md4_new: Callable[[], Any], data: bytes, chunk: int, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        md4 = md4_new()
+        for ofs in range(0, len(data), chunk):
+            md4.update(data[ofs : ofs + chunk])
+        md4.digest()
+        best = min(best, time.perf_counter() - start)
+    return len(data) / best / 1e6
+
+
+def implementations() -> Dict[str, Callable[[], Any]]:
+    impls: Dict[str, Callable[[], Any]] = {"builtin": MD4}
+    try:
+        hashlib.new("md4")
+        impls["hashlib"] = lambda: hashlib.new("md4")
+    except ValueError:
+        pass
+    return impls
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=4, help="MB of data to hash")
+    parser.add_argument("--chunk", type=int, default=256 * 1024, help="update() size in bytes")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    data = os.urandom(args.size * 1024 * 1024)
+    digests = {name: md4_new() for name, md4_new in implementations().items()}
+    for md4 in digests.values():
+        md4.update(data)
+    if len({md4.digest() for md4 in digests.values()}) != 1:
+        raise Exception("Digest mismatch")
+    for name, md4_new in implementations().items():
+        print(f"{name:8} {throughput(md4_new, data, args.chunk, args.repeat):10.2f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
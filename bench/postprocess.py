@@ -0,0 +1,79 @@
+"""Mirror wide statistics: pp_map per map and merging dictionaries against the batched pp_maps"""
+
+import argparse
+import random
+from typing import Dict, List
+from unittest.mock import patch
+
+from bench.entities import best_of
+from bspp import postprocess
+from bspp.model import MapEntities
+from bspp.postprocess import pp_map, pp_maps
+
+pickups = [
+    "weapon_railgun",
+    "weapon_rocketlauncher",
+    "weapon_shotgun",
+    "weapon_plasmagun",
+    "weapon_nailgun",
+    "item_quad",
+    "item_health",
+    "item_health_large",
+    "item_armor_shard",
+    "item_armor_body",
+    "ammo_rockets",
+    "ammo_slugs",
+    "ammo_shells",
+    "holdable_teleporter",
+    "team_CTF_redflag",
+    "team_CTF_blueflag",
+]
+
+
+def synthetic_maps(count: int, seed: int = 46) -> List[MapEntities]:
+    rnd = random.Random(seed)
+    maps = []
+    for i in range(count):
+        entities = [{"classname": "worldspawn", "message": f"Map {i}"}]
+        entities.extend({"classname": rnd.choice(pickups)} for _ in range(rnd.randint(20, 120)))
+        maps.append(MapEntities(f"map{i}", i.to_bytes(4, "little"), entities))
+    return maps
+
+
+def loop_totals(maps: List[MapEntities]) -> Dict[str, int]:
+    totals: Dict[str, int] = {}
+    for m in map(pp_map, maps):
+        for counts in (m.aggregated_items, m.aggregated_weapons):
+            for classname, count in counts.items():
+                totals[classname] = totals.get(classname, 0) + count
+    return totals
+
+
+def batch_totals(maps: List[MapEntities]) -> Dict[str, int]:
+    batch = pp_maps(maps)
+    return {c: n for c, n in batch.totals().items() if postprocess.item_filter(c) or c.startswith("weapon_")}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--maps", type=int, default=5000, help="number of maps")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    maps = synthetic_maps(args.maps)
+    if loop_totals(maps) != batch_totals(maps):
+        raise Exception("Aggregation mismatch")
+    loop = best_of(lambda: loop_totals(maps), args.repeat)
+    batch = best_of(lambda: batch_totals(maps), args.repeat)
+    print(f"{args.maps} maps, NumPy {'enabled' if postprocess._numpy() is not None else 'not available'}")
+    print(f"pp_map loop {loop * 1000:10.2f} ms")
+    print(f"pp_maps     {batch * 1000:10.2f} ms")
+    print(f"speedup     {loop / batch:10.2f}x")
+    if postprocess._numpy() is not None:
+        with patch.object(postprocess, "_numpy", return_value=None):
+            fallback = best_of(lambda: batch_totals(maps), args.repeat)
+        print(f"pp_maps without NumPy {fallback * 1000:10.2f} ms, speedup {loop / fallback:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Start-up cost of the command line tool: import time, and the latency of a run on one small PK3"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Optional, Tuple
+
+from bench.synthetic import bsp_bytes, map_entities, write_pk3
+
+
+def import_times(command: List[str]) -> List[Tuple[str, int]]:
+    """
+    :return: the cumulative import time of the top level modules imported by a run, in microseconds, as reported by
+        `-X importtime`, the slowest first.
+    """
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime"] + command, capture_output=True, text=True, check=True
+    ).stderr
+    times = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        # nested imports are indented, their time is included in the top level one
+        if cumulative.strip().isdigit() and not name[1:].startswith(" "):
+            times.append((name.strip(), int(cumulative)))
+    return sorted(times, key=lambda t: -t[1])
+
+
+def latency(command: List[str], repeat: int, stdin: Optional[str] = None) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + command, input=stdin, capture_output=True, text=True, check=True)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--batch", type=int, default=100, help="files read from the standard input by one process")
+    parser.add_argument("--top", type=int, default=10, help="number of the slowest imports listed")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pk3_file = write_pk3(
+            os.path.join(tmp_dir, "small.pk3"), {"small": bsp_bytes(map_entities("Small", {"weapon_railgun": 2}))}
+        )
+        command = ["-m", "bspp", "-J", pk3_file]
+        times = import_times(command)
+        print(f"imports: {sum(t for _, t in times) / 1000:.1f} ms")
+        for name, t in times[: args.top]:
+            print(f"  {name:30} {t / 1000:8.1f} ms")
+
+        interpreter = latency(["-c", "pass"], args.repeat)
+        run = latency(command, args.repeat)
+        batch = latency(["-m", "bspp", "-J", "--stdin"], args.repeat, f"{pk3_file}\n" * args.batch)
+        print(f"interpreter: {interpreter * 1000:.1f} ms")
+        print(f"one run: {run * 1000:.1f} ms")
+        print(f"--stdin: {batch / args.batch * 1000:.1f} ms per file, {args.batch} files")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Benchmark suite of the processing stages on synthetic maps and archives, with JSON results to compare runs"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipInfo
+
+from bench.entities import best_of
+from bspp import bspp
+from bspp.hash import bsp_hash, pk3_hash_info
+from bspp.model import MapEntities
+from bspp.postprocess import pp_entity_filter, pp_map
+from bench.synthetic import synthetic_bsp, write_synthetic_tree
+
+Result = Dict[str, Any]
+
+
+def measure(fn: Callable[[], object], repeat: int, size: int = 0, items: int = 0) -> Result:
+    seconds = best_of(fn, repeat)
+    result: Result = dict(seconds=seconds)
+    if size:
+        result.update(bytes=size, mb_per_s=size / seconds / 1e6)
+    if items:
+        result.update(items=items, items_per_s=items / seconds)
+    return result
+
+
+def zip_infos(count: int) -> List[ZipInfo]:
+    infos = []
+    for i in range(count):
+        info = ZipInfo(f"textures/synthetic/t{i}.tga")
+        info.CRC = (i * 2654435761) & 0xFFFFFFFF
+        info.file_size = 1024 + i
+        infos.append(info)
+    return infos
+
+
+def run(args: argparse.Namespace) -> Dict[str, Result]:
+    results: Dict[str, Result] = {}
+    bsp_data = synthetic_bsp(args.entities, args.lump_size, args.bsp_size)
+    lump = bspp.get_lump(bsp_data, 0)
+    lines = str(lump, encoding="ascii").splitlines()
+    entity_count = sum(1 for _ in bspp.parse_entities(lump))
+
+    results["get_lump"] = measure(lambda: bspp.get_lump(bsp_data, 0), args.repeat, len(lump))
+    results["parse_entity_obj"] = measure(lambda: list(bspp.parse_entity_obj(lines)), args.repeat, len(lump))
+    results["parse_entities"] = measure(lambda: list(bspp.parse_entities(lump)), args.repeat, len(lump))
+    results["bsp_hash"] = measure(lambda: bsp_hash(bsp_data), args.repeat, len(bsp_data))
+    infos = zip_infos(args.zip_entries)
+    results["pk3_hash_info"] = measure(lambda: pk3_hash_info(infos), args.repeat, items=len(infos))
+    all_entities = MapEntities("synthetic", b"\0\0\0\0", list(bspp.parse_entities(lump)))
+    results["pp_map"] = measure(lambda: pp_map(all_entities), args.repeat, items=entity_count)
+    projected = MapEntities("synthetic", b"\0\0\0\0", bspp.lump_entities(lump, pp_entity_filter))
+    results["pp_map_projected"] = measure(lambda: pp_map(projected), args.repeat, items=entity_count)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pk3_files = write_synthetic_tree(
+            tmp_dir,
+            args.pk3s,
+            args.maps_per_pk3,
+            args.entities,
+            args.lump_size,
+            args.bsp_size,
+            ZIP_STORED if args.stored else ZIP_DEFLATED,
+        )
+        tree_size = sum(os.path.getsize(pk3_file) for pk3_file in pk3_files)
+        maps = args.pk3s * args.maps_per_pk3
+        results["inventory"] = measure(lambda: list(bspp.inventory([tmp_dir])), args.repeat, items=args.pk3s)
+        for name, workers in (("process", None), ("process_parallel", 0)):
+            results[name] = measure(
+                lambda w=workers: list(
+                    bspp.process(
+                        [tmp_dir], bspp.ProcessOptions(entity_filter=pp_entity_filter, parallel=bspp.Parallelism(w))
+                    )
+                ),
+                args.repeat,
+                tree_size,
+                maps,
+            )
+    return results
+
+
+def compare(results: Dict[str, Result], baseline: Dict[str, Result], threshold: float) -> List[str]:
+    """
+    :return: the benchmarks slower than the baseline by more than `threshold`, e.g. 0.1 for 10%.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        change = result["seconds"] / baseline[name]["seconds"] - 1
+        print(f"{name:18} {change:+8.1%}", file=sys.stderr)
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entities", type=int, default=5000, help="entities per map")
+    parser.add_argument("--lump-size", type=int, default=0, help="minimum entities lump size in bytes")
+    parser.add_argument("--bsp-size", type=int, default=2_000_000, help="minimum BSP size in bytes")
+    parser.add_argument("--pk3s", type=int, default=8, help="number of archives processed end to end")
+    parser.add_argument("--maps-per-pk3", type=int, default=2)
+    parser.add_argument("--stored", action="store_true", help="store the maps in the archives uncompressed")
+    parser.add_argument("--zip-entries", type=int, default=10000, help="central directory entries to hash")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("-o", "--output", metavar="FILE", help="write the JSON results to FILE instead of stdout")
+    parser.add_argument("--compare", metavar="FILE", help="JSON results of an earlier run to compare to")
+    parser.add_argument("--threshold", type=float, default=0.1, help="slowdown reported as a regression")
+    args = parser.parse_args(argv)
+
+    params = {k: v for k, v in vars(args).items() if k not in ("output", "compare", "threshold")}
+    report = dict(
+        timestamp=time.time(),
+        python=platform.python_version(),
+        implementation=platform.python_implementation(),
+        machine=platform.machine(),
+        cpu_count=os.cpu_count(),
+        params=params,
+        results=run(args),
+    )
+    encoded = json.dumps(report, indent=1)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(encoded + "\n")
+    else:
+        print(encoded)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("params") != params:
+            print("Warning: the baseline was run with different parameters", file=sys.stderr)
+        regressions = compare(report["results"], baseline["results"], args.threshold)
+        if regressions:
+            print(f"Regressions: {', '.join(regressions)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""Deterministic synthetic maps and archives, shared by the benchmarks and the tests"""
+
+import os
+import random
+import struct
+from typing import Dict, List, Mapping, Optional, Sequence
+from zipfile import ZipFile, ZIP_DEFLATED
+
+BSP_HEADER_SIZE = 0x90
+BSP_LUMP_COUNT = 17
+
+
+def entities_lump(entities: List[Dict[str, str]]) -> bytes:
+    lines = []
+    for entity in entities:
+        lines.append("{")
+        lines.extend(f'"{key}" "{value}"' for key, value in entity.items())
+        lines.append("}")
+    return ("\n".join(lines) + "\n").encode("ascii") + b"\0"
+
+
+def bsp_bytes(
+    entities: List[Dict[str, str]],
+    padding: int = 0,
+    seed: Optional[int] = None,
+    shaders: Sequence[str] = (),
+    models: int = 0,
+) -> bytes:
+    """
+    Build a minimal IBSP v46 file with an entities lump, optional shaders and models lumps, followed by `padding` bytes
+    of filler visibility lump data.
+    The filler is a repeating byte sequence, or incompressible pseudo random data generated from `seed`.
+    """
+    if seed is None:
+        filler = (bytes(range(256)) * (padding // 256 + 1))[:padding]
+    else:
+        filler = random.Random(seed).getrandbits(padding * 8).to_bytes(padding, "little") if padding else b""
+    lumps = {
+        0: entities_lump(entities),
+        1: b"".join(struct.pack("<64s2i", shader.encode("ascii"), 0, 1) for shader in shaders),
+        7: bytes(40 * models),
+        16: filler,
+    }
+    lump_dir = []
+    offset = BSP_HEADER_SIZE
+    for index in range(BSP_LUMP_COUNT):
+        length = len(lumps.get(index, b""))
+        lump_dir.append((offset, length))
+        offset += length
+    header = b"IBSP" + struct.pack("<i", 46) + b"".join(struct.pack("<2i", *entry) for entry in lump_dir)
+    return header + b"".join(lumps.get(index, b"") for index in range(BSP_LUMP_COUNT))
+
+
+def map_entities(title: str, items: Mapping[str, int]) -> List[Dict[str, str]]:
+    entities = [{"classname": "worldspawn", "message": title}]
+    for classname, count in items.items():
+        entities.extend({"classname": classname, "origin": f"{i} 0 0"} for i in range(count))
+    return entities
+
+
+def write_pk3(file_name: str, maps: Mapping[str, bytes], compression: int = ZIP_DEFLATED) -> str:
+    with ZipFile(file_name, "w", compression) as pk3_zip:
+        for map_name, bsp_data in maps.items():
+            pk3_zip.writestr(f"maps/{map_name}.bsp", bsp_data)
+    return file_name
+
+
+def synthetic_entities(count: int, seed: int = 46, title: str = "Synthetic CTF") -> List[Dict[str, str]]:
+    """
+    Deterministic, map like entities: a worldspawn followed by `count` lights, models, spawn points and pickups.
+    """
+    rnd = random.Random(seed)
+    entities = [{"classname": "worldspawn", "message": title, "_color": "1 0.9 0.8", "ambient": "5"}]
+    classnames = ["light"] * 6 + ["misc_model", "target_position", "info_player_deathmatch", "item_armor_shard"]
+    for i in range(count):
+        origin = " ".join(str(rnd.randint(-4096, 4096)) for _ in range(3))
+        entity = {"classname": rnd.choice(classnames), "origin": origin}
+        if entity["classname"] == "light":
+            entity.update(light=str(rnd.randint(100, 600)), _color="1 1 1", target=f"t{i}")
+        elif entity["classname"] == "misc_model":
+            entity.update(model=f"models/mapobjects/obj{i % 50}.md3", angle=str(rnd.randint(0, 359)))
+        entities.append(entity)
+    return entities
+
+
+def synthetic_bsp(
+    entity_count: int = 1000, lump_size: int = 0, bsp_size: int = 0, seed: int = 46, title: str = "Synthetic CTF"
+) -> bytes:
+    """
+    Deterministic IBSP v46 file.
+    :param entity_count: number of entities besides the worldspawn.
+    :param lump_size: minimum entities lump size in bytes, more entities are generated to reach it.
+    :param bsp_size: minimum file size, the rest is filled with incompressible lump data.
+    :param seed: the same seed gives the same file.
+    :param title: map title, the message of the worldspawn.
+    """
+    entities = synthetic_entities(entity_count, seed, title)
+    while len(entities_lump(entities)) < lump_size:
+        entities = synthetic_entities(len(entities) * 2, seed, title)
+    padding = max(bsp_size - BSP_HEADER_SIZE - len(entities_lump(entities)), 0)
+    return bsp_bytes(entities, padding, seed)
+
+
+def write_synthetic_tree(
+    root: str,
+    pk3_count: int,
+    maps_per_pk3: int = 1,
+    entity_count: int = 1000,
+    lump_size: int = 0,
+    bsp_size: int = 0,
+    compression: int = ZIP_DEFLATED,
+    seed: int = 46,
+) -> List[str]:
+    """
+    Write a folder of PK3 archives of synthetic maps, every map is different. Maps are generated and written one at a
+    time, only one of them is ever held in memory.
+    :return: the PK3 files written.
+    """
+    os.makedirs(root, exist_ok=True)
+    pk3_files = []
+    for i in range(pk3_count):
+        pk3_file = os.path.join(root, f"synth{i:05}.pk3")
+        with ZipFile(pk3_file, "w", compression) as pk3_zip:
+            for j in range(maps_per_pk3):
+                bsp_data = synthetic_bsp(entity_count, lump_size, bsp_size, seed + i * maps_per_pk3 + j, f"Map {i} {j}")
+                pk3_zip.writestr(f"maps/synth{i}_{j}.bsp", bsp_data)
+        pk3_files.append(pk3_file)
+    return pk3_files
@@ -1,3 +1,4 @@
 """Quake 3 BSP and PK3 map info extractor"""
+
 __author__ = "Zsolt Mészárovics"
 __version__ = "1.0.1"
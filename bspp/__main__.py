@@ -0,0 +1,3 @@
+from bspp.cli import main
+
+main()
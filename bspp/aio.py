@@ -0,0 +1,70 @@
+import asyncio
+import logging
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import partial
+from typing import AsyncIterator, Iterable, Optional, Set, Union
+from zipfile import ZipFile
+
+from bspp.bspp import ProcessOptions, process_pk3_zip
+from bspp.model import EntityFilter, PK3, PK3Entity
+from bspp.postprocess import pp_entity_filter, pp_pk3
+
+log = logging.getLogger(__name__)
+
+
+def process_pk3(
+    file_name: str, postprocess: bool = False, entity_filter: Optional[EntityFilter] = None
+) -> Union[PK3Entity, PK3]:
+    with ZipFile(file_name, "r") as pk3_zip:
+        if postprocess and entity_filter is None:
+            entity_filter = pp_entity_filter
+        pk3 = process_pk3_zip(pk3_zip, ProcessOptions(entity_filter=entity_filter))
+    return pp_pk3(pk3) if postprocess else pk3
+
+
+async def process_many(
+    paths: Iterable[str],
+    concurrency: int = 4,
+    executor: Optional[Executor] = None,
+    postprocess: bool = False,
+    entity_filter: Optional[EntityFilter] = None,
+) -> AsyncIterator[Union[PK3Entity, PK3]]:
+    """
+    Process PK3 files without blocking the event loop, decompression, hashing and parsing run in an executor.
+    Results are yielded as they complete. Closing the iterator or cancelling the consuming task cancels the work that
+    has not been started yet.
+    :param paths: PK3 files, consumed lazily.
+    :param concurrency: maximum number of archives in flight.
+    :param executor: executor to run the work in, a process pool of `concurrency` workers is used by default.
+    :param postprocess: yield `pp_map`-ed `PK3` results instead of the raw `PK3Entity` ones.
+    :param entity_filter: only parse the matching entities, `pp_entity_filter` is the default when post-processing.
+    :return: async iterator of the results.
+    """
+    if concurrency < 1:
+        raise ValueError(f"Invalid concurrency: {concurrency}")
+    loop = asyncio.get_running_loop()
+    own_executor = ProcessPoolExecutor(max_workers=concurrency) if executor is None else None
+    work = partial(process_pk3, postprocess=postprocess, entity_filter=entity_filter)
+    path_iter = iter(paths)
+    pending: Set[asyncio.Future] = set()
+
+    def submit_next() -> bool:
+        for path in path_iter:
+            pending.add(loop.run_in_executor(executor or own_executor, work, path))
+            return True
+        return False
+
+    try:
+        while len(pending) < concurrency and submit_next():
+            pass
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            pending.difference_update(done)
+            for future in done:
+                submit_next()
+                yield future.result()
+    finally:
+        for future in pending:
+            future.cancel()
+        if own_executor is not None:
+            own_executor.shutdown(wait=False)
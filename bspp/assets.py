@@ -0,0 +1,185 @@
+import json
+import logging
+import posixpath
+import zlib
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from zipfile import BadZipFile, ZipFile, ZipInfo
+
+from bspp.bspfile import ShaderTable, lump_directory, lump_record_sizes, models_lump, read_lumps, shaders_lump
+from bspp.bspp import is_pk3, is_pk3_bsp, walk
+from bspp.errors import BSPError, LimitExceededError
+from bspp.layout import bsp_header_size
+from bspp.limits import ResourceLimits
+from bspp.model import JSONEncodingAwareClassEncoder
+
+log = logging.getLogger(__name__)
+image_extensions = frozenset((".tga", ".jpg", ".jpeg", ".png"))
+# shader names that are never backed by a file
+builtin_shaders = frozenset(("noshader",))
+# failures of a single member, the rest of the archive is still indexed
+_member_errors = (BSPError, LimitExceededError, BadZipFile, EOFError, zlib.error)
+
+
+@dataclass
+class MapAssets:
+    pk3_name: str
+    map_name: str
+    shaders: List[str]
+    model_count: int
+
+    def to_json(self):
+        return dict(pk3_name=self.pk3_name, map_name=self.map_name, shaders=self.shaders, model_count=self.model_count)
+
+
+def asset_key(name: str) -> str:
+    """
+    Normalized name of an asset: lower case, forward slashes, and no extension for images, as shaders refer to them.
+    """
+    name = name.replace("\\", "/").lower()
+    root, extension = posixpath.splitext(name)
+    return root if extension in image_extensions else name
+
+
+def shader_names(script: str) -> Iterator[str]:
+    """
+    Names of the shaders defined in a shader script, the tokens outside of the curly braces.
+    """
+    depth = 0
+    for line in script.splitlines():
+        for token in line.partition("//")[0].replace("{", " { ").replace("}", " } ").split():
+            if token == "{":
+                depth += 1
+            elif token == "}":
+                depth = max(depth - 1, 0)
+            elif depth == 0:
+                yield token
+
+
+class AssetIndex:
+    """
+    Cross-PK3 index of the assets provided by the archives and the shaders used by their maps, to find the missing
+    shaders and the archives a map depends on.
+    A shader is provided by an archive that defines it in a shader script or holds an image of the same name.
+    Only the header and the shaders lump of the maps are read, within the resource limits.
+    """
+
+    def __init__(self, limits: ResourceLimits = ResourceLimits()) -> None:
+        self.limits = limits
+        self.providers: Dict[str, Set[str]] = {}
+        self.maps: List[MapAssets] = []
+
+    def add(self, files: Iterable[str]) -> None:
+        """
+        :param files: PK3 files or folders, folders are walked recursively for .pk3 files.
+        """
+        for file_name in walk(files):
+            if not is_pk3(file_name):
+                log.warning("Not a PK3, skipped: %s", file_name)
+                continue
+            try:
+                self.add_pk3(file_name)
+            except (OSError, BadZipFile) as e:
+                log.warning("Skipping %s: %s", file_name, e)
+
+    def add_pk3(self, file_name: str) -> None:
+        log.info("Indexing assets of %s", file_name)
+        with ZipFile(file_name, "r") as pk3_zip:
+            for info in pk3_zip.infolist():
+                if info.is_dir():
+                    continue
+                self._provide(asset_key(info.filename), file_name)
+                if info.filename.lower().startswith("scripts/") and info.filename.lower().endswith(".shader"):
+                    self._add_script(file_name, pk3_zip, info)
+                elif is_pk3_bsp(info.filename):
+                    self._add_map(file_name, pk3_zip, info)
+
+    def _add_script(self, pk3_name: str, pk3_zip: ZipFile, info: ZipInfo) -> None:
+        try:
+            self.limits.check_member(info)
+            if info.file_size > self.limits.lump_limit:
+                raise LimitExceededError(f"Script of {info.file_size} bytes is larger than {self.limits.lump_limit}")
+            # zipfile inflates no more than the size checked above
+            script = pk3_zip.read(info)
+        except _member_errors as e:
+            log.warning("Skipping %s in %s: %s", info.filename, pk3_name, e)
+            return
+        for shader in shader_names(script.decode("latin-1")):
+            self._provide(asset_key(shader), pk3_name)
+
+    def _add_map(self, pk3_name: str, pk3_zip: ZipFile, info: ZipInfo) -> None:
+        try:
+            self.limits.check_member(info)
+            with pk3_zip.open(info) as bsp_file:
+                lumps = lump_directory(bsp_file.read(bsp_header_size), info.file_size)
+                (lump,) = read_lumps(bsp_file, lumps, [shaders_lump], self.limits.lump_limit)
+            shaders = sorted({asset_key(name) for name in ShaderTable(lump).names})
+        except _member_errors as e:
+            log.warning("Skipping %s in %s: %s", info.filename, pk3_name, e)
+            return
+        map_name = info.filename[len("maps/") : -len(".bsp")]
+        model_count = lumps[models_lump][1] // lump_record_sizes[models_lump]
+        self.maps.append(MapAssets(pk3_name, map_name, shaders, model_count))
+
+    def _provide(self, key: str, pk3_name: str) -> None:
+        self.providers.setdefault(key, set()).add(pk3_name)
+
+    def missing(self) -> Dict[Tuple[str, str], List[str]]:
+        """
+        :return: the shaders not provided by any indexed archive, by PK3 and map name, for the maps missing any.
+        """
+        missing = {}
+        for m in self.maps:
+            shaders = [s for s in m.shaders if s not in self.providers and s not in builtin_shaders]
+            if shaders:
+                missing[(m.pk3_name, m.map_name)] = shaders
+        return missing
+
+    def dependencies(self, pk3_name: str) -> Set[str]:
+        """
+        :return: the other archives providing shaders that the maps of an archive use but the archive itself lacks.
+        """
+        dependencies: Set[str] = set()
+        for m in self.maps:
+            if m.pk3_name != pk3_name:
+                continue
+            for shader in m.shaders:
+                providers = self.providers.get(shader, set())
+                if pk3_name not in providers:
+                    dependencies.update(providers)
+        return dependencies
+
+
+def main(args: Optional[List[str]] = None) -> None:
+    import argparse  # pylint: disable=import-outside-toplevel
+
+    parser = argparse.ArgumentParser(description="BSP asset index: missing shaders and dependencies of maps")
+    parser.add_argument("files", metavar="F", nargs="+", help="a pk3 file or folder, include the base game archives")
+    parser.add_argument("-j", dest="json", action="store_true", help="JSON output")
+    parsed = parser.parse_args(args)
+
+    index = AssetIndex()
+    index.add(parsed.files)
+    missing = index.missing()
+    if parsed.json:
+        report = [
+            dict(
+                m.to_json(),
+                missing=missing.get((m.pk3_name, m.map_name), []),
+                dependencies=sorted(index.dependencies(m.pk3_name)),
+            )
+            for m in index.maps
+        ]
+        print(json.dumps(report, indent=True, cls=JSONEncodingAwareClassEncoder))
+        return
+    for m in index.maps:
+        print(f"{m.pk3_name}\t{m.map_name}\t{m.model_count} models\t{len(m.shaders)} shaders")
+        for shader in missing.get((m.pk3_name, m.map_name), []):
+            print(f"  missing: {shader}")
+        for dependency in sorted(index.dependencies(m.pk3_name)):
+            print(f"  depends on: {dependency}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,173 @@
+import struct
+import sys
+from array import array
+from typing import TYPE_CHECKING, Iterator, List, Optional, Tuple, Union
+
+from bspp.errors import BadHeaderError, BadLumpError, BadVersionError, LimitExceededError
+from bspp.layout import bsp_head, bsp_header_size, bsp_version
+
+if TYPE_CHECKING:
+    from bspp.hash import BinaryStream
+
+lump_names = (
+    "entities",
+    "shaders",
+    "planes",
+    "nodes",
+    "leafs",
+    "leafsurfaces",
+    "leafbrushes",
+    "models",
+    "brushes",
+    "brushsides",
+    "drawverts",
+    "drawindexes",
+    "fogs",
+    "surfaces",
+    "lightmaps",
+    "lightgrid",
+    "visibility",
+)
+entities_lump, shaders_lump, models_lump = 0, 1, 7
+# record size of the lumps that are arrays of fixed size records, by lump index
+lump_record_sizes = {
+    1: 72,
+    2: 16,
+    3: 36,
+    4: 48,
+    5: 4,
+    6: 4,
+    7: 40,
+    8: 12,
+    9: 8,
+    10: 44,
+    11: 4,
+    12: 72,
+    13: 104,
+    14: 128 * 128 * 3,  # lightmaps
+    15: 8,
+}
+_lump_dir = struct.Struct(f"<{len(lump_names) * 2}i")
+_shader_name = struct.Struct("<64s8x")
+
+
+class ShaderTable:
+    """
+    The shaders lump decoded column-wise: a list of names, surface and content flags in integer arrays.
+    """
+
+    __slots__ = ("names", "surface_flags", "content_flags")
+
+    def __init__(self, lump: Union[bytes, memoryview]):
+        if len(lump) % _shader_name.size:
+            raise BadLumpError("Invalid shaders lump size")
+        self.names: List[str] = [
+            name.partition(b"\0")[0].decode("ascii", "replace") for (name,) in _shader_name.iter_unpack(lump)
+        ]
+        ints = array("i")
+        ints.frombytes(lump)
+        if sys.byteorder == "big":
+            ints.byteswap()
+        ints_per_record = _shader_name.size // ints.itemsize
+        self.surface_flags = ints[16::ints_per_record]
+        self.content_flags = ints[17::ints_per_record]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __iter__(self) -> Iterator[Tuple[str, int, int]]:
+        return zip(self.names, self.surface_flags, self.content_flags)
+
+
+def lump_directory(header: Union[bytes, bytearray, memoryview], bsp_size: int) -> List[Tuple[int, int]]:
+    """
+    Parse and validate the lump directory of a BSP header.
+    :param header: the beginning of the BSP, at least `bsp_header_size` bytes of it.
+    :param bsp_size: total size of the BSP, no lump may extend beyond it.
+    :return: the offset and length of every lump, by lump index.
+    :raises BadHeaderError, BadVersionError, BadLumpError: when invalid.
+    """
+    if len(header) < bsp_header_size or bytes(header[0:4]) != bsp_head:
+        raise BadHeaderError("Invalid BSP header")
+    if bytes(header[4:8]) != bsp_version:
+        raise BadVersionError("Invalid BSP version")
+    entries = _lump_dir.unpack_from(header, 8)
+    lumps: List[Tuple[int, int]] = []
+    for index, name in enumerate(lump_names):
+        offset, length = entries[index * 2], entries[index * 2 + 1]
+        if length < 0 or length and (offset < bsp_header_size or offset + length > bsp_size):
+            raise BadLumpError(f"Invalid dir entry offsets of the {name} lump")
+        lumps.append((offset, length))
+    return lumps
+
+
+def read_lumps(
+    bsp_file: "BinaryStream", lumps: List[Tuple[int, int]], indices: List[int], max_length: Optional[int] = None
+) -> List[bytes]:
+    """
+    Read lumps of a BSP stream after its header, like a zip entry that is expensive to seek backwards: the lumps are
+    read in the order they are stored in, each one reached by seeking forward.
+    :param lumps: the `lump_directory` of the BSP.
+    :param indices: the lumps to read.
+    :param max_length: reject larger lumps with a `LimitExceededError`, before reading any.
+    :return: the lump data, in the order of `indices`.
+    """
+    for index in indices:
+        length = lumps[index][1]
+        if max_length is not None and length > max_length:
+            raise LimitExceededError(f"The {lump_names[index]} lump of {length} bytes is larger than {max_length}")
+    data = {}
+    for index in sorted(indices, key=lambda i: lumps[i][0]):
+        offset, length = lumps[index]
+        bsp_file.seek(offset)
+        data[index] = bsp_file.read(length)
+        if len(data[index]) < length:
+            raise BadLumpError(f"Truncated {lump_names[index]} lump")
+    return [data[index] for index in indices]
+
+
+class BSPFile:
+    """
+    A Quake 3 BSP with its lump directory parsed and validated once. Lumps are zero-copy views of the data, valid as
+    long as the data is, e.g. until an mmap is closed.
+    """
+
+    __slots__ = ("data", "lumps")
+
+    def __init__(self, data: Union[bytes, bytearray, memoryview]):
+        """
+        :param data: the whole BSP, any bytes-like object including an mmap.
+        :raises BadHeaderError, BadVersionError, BadLumpError: when invalid.
+        """
+        self.data = memoryview(data)
+        self.lumps = lump_directory(self.data, len(self.data))
+
+    def lump(self, index: int) -> memoryview:
+        offset, length = self.lumps[index]
+        return self.data[offset : offset + length]
+
+    def entities(self) -> bytes:
+        """
+        :return: entities lump data, without the terminating byte -- like `get_lump`.
+        """
+        lump = self.lump(entities_lump)
+        return bytes(lump[: len(lump) - 1])
+
+    def shaders(self) -> ShaderTable:
+        return ShaderTable(self.lump(shaders_lump))
+
+    def count(self, index: int) -> int:
+        """
+        :return: number of records in a lump of fixed size records.
+        """
+        record_size = lump_record_sizes.get(index)
+        if record_size is None:
+            raise ValueError(f"The {lump_names[index]} lump has no fixed size records")
+        return self.lumps[index][1] // record_size
+
+    @property
+    def model_count(self) -> int:
+        """
+        Number of models, the world itself and the brush models of doors, platforms, triggers and such.
+        """
+        return self.count(models_lump)
@@ -1,55 +1,171 @@
 #!/usr/bin/env python3
 
-import json
 import logging
 import os
-import re
 import struct
-from typing import List, Dict, Iterable, Union
-from zipfile import ZipFile
-
-from bspp.hash import pk3_hash_info, bsp_hash
-from bspp.model import MapEntities, PK3Entity, PK3, JSONEncodingAwareClassEncoder
-from bspp.postprocess import pp_map
+import sys
+from contextlib import nullcontext
+from dataclasses import dataclass, replace
+from functools import lru_cache, partial
+from itertools import compress, count, repeat
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Collection,
+    List,
+    Dict,
+    Iterable,
+    Iterator,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+from bspp.errors import BadHeaderError, BadLumpError, BadVersionError, LimitExceededError, ParseError, SkipList
+from bspp.layout import bsp_head, bsp_header_size, bsp_version
+from bspp.model import (
+    MapEntities,
+    PK3Entity,
+    JSONEncodingAwareClassEncoder,
+    EntityFilter,
+    Map,
+    PK3,
+    MapListing,
+    PK3Listing,
+    FileError,
+)
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor, Future
+    from zipfile import ZipFile
+    from bspp.cache import Fingerprint, ResultCache
+    from bspp.dedup import MapStore
+    from bspp.hash import BinaryStream
+    from bspp.limits import MemoryBudget, ResourceLimits
+    from bspp.parallel import Schedule
+    from bspp.stats import StageEvent
+
+# pylint: disable=import-outside-toplevel
+# modules that only some code paths need are imported where they're used: `import bspp.bspp` is part of the start-up
+# time of every command line run, longer than processing a small PK3 takes
 
 log = logging.getLogger(__name__)
-pk3_file_exp = re.compile(r".+\.pk3$", re.I)
-bsp_file_exp = re.compile(r".+\.bsp$", re.I)
-pk3_bsp_file = re.compile(r"^maps/[^.]+.bsp$", re.I)
-bsp_head = b"IBSP"
-bsp_version = b"\x2e\0\0\0"
-obj_beg_exp = re.compile(r"\s*{\s*")
-obj_end_exp = re.compile(r"\s*}\s*")
-obj_string_exp = re.compile(r'\s*"([^"]*)"\s*')
-
-
-def is_pk3_bsp(pk3_zip_entry: str):
-    return pk3_bsp_file.match(pk3_zip_entry)
+entity_whitespace_bytes = b" \t\r\n\0"
+entity_whitespace = frozenset(entity_whitespace_bytes)
+
+
+def is_pk3_bsp(pk3_zip_entry: str) -> bool:
+    """
+    A map in a PK3: a .bsp entry in the maps folder, no other dots in its name.
+    """
+    return (
+        len(pk3_zip_entry) > 9
+        and pk3_zip_entry[:5].lower() == "maps/"
+        and pk3_zip_entry[-4:].lower() == ".bsp"
+        and "." not in pk3_zip_entry[5:-4]
+    )
 
 
 def is_pk3(dir_file: str) -> bool:
     return len(dir_file) > 4 and dir_file[-4:].lower() == ".pk3"
 
 
+def is_bsp(file_name: str) -> bool:
+    return len(file_name) > 4 and file_name[-4:].lower() == ".bsp"
+
+
 def get_lump(bsp_bytes: bytes, index: int) -> bytes:
     bsp_data_view = memoryview(bsp_bytes)
-    bsp_size = len(bsp_bytes)
+    offset, length = lump_dir_entry(bsp_data_view[0:bsp_header_size], index, len(bsp_bytes))
+    return bytes(bsp_data_view[offset : offset + length - 1])
+
+
+def read_lump(bsp_file: "BinaryStream", index: int, bsp_size: int, max_length: Optional[int] = None) -> bytes:
+    """
+    Read a lump from a seekable BSP stream, without reading anything else than the header and the lump itself.
+    :param bsp_file: seekable binary stream, like a plain file, an mmap or a stored zip entry.
+    :param index: lump index.
+    :param bsp_size: total size of the BSP.
+    :param max_length: reject larger lumps with a `LimitExceededError`, before reading them.
+    :return: lump data, without the terminating byte -- like `get_lump`.
+    """
+    bsp_file.seek(0)
+    offset, length = lump_dir_entry(bsp_file.read(bsp_header_size), index, bsp_size)
+    _check_lump_length(length, max_length)
+    bsp_file.seek(offset)
+    return bsp_file.read(max(length - 1, 0))
+
+
+def read_lump_and_hash(  # pylint: disable=too-many-locals
+    bsp_file: IO[bytes], index: int, bsp_size: int, read_size: Optional[int] = None, max_length: Optional[int] = None
+) -> Tuple[bytes, bytes]:
+    """
+    Single pass over a BSP stream that is expensive to seek, like a deflated zip entry: every chunk updates the BSP hash
+    and the lump is captured on the fly as soon as the lump directory in the header is known.
+    :param bsp_file: binary stream positioned at the beginning of the BSP.
+    :param index: lump index.
+    :param bsp_size: total size of the BSP.
+    :param read_size: size of the chunks read from the stream, the `bspp.hash.chunk_size` by default.
+    :param max_length: reject larger lumps with a `LimitExceededError`, before capturing them.
+    :return: lump data -- like `get_lump`, and the BSP hash.
+    """
+    from bspp.hash import BSPHasher, chunk_size, read_chunks
+
+    hasher = BSPHasher()
+    header = bytearray()
+    lump = bytearray()
+    lump_start = lump_end = -1
+    position = 0
+    for chunk in read_chunks(bsp_file, read_size or chunk_size):
+        hasher.update(chunk)
+        chunk_end = position + len(chunk)
+        if lump_start < 0:
+            header += chunk[: bsp_header_size - position]
+            if len(header) >= bsp_header_size:
+                offset, length = lump_dir_entry(header, index, bsp_size)
+                _check_lump_length(length, max_length)
+                lump_start, lump_end = offset, offset + max(length - 1, 0)
+        if lump_start < chunk_end and lump_end > position:
+            lump += memoryview(chunk)[max(lump_start - position, 0) : lump_end - position]
+        position = chunk_end
+    if lump_start < 0:
+        raise BadHeaderError("Invalid BSP header")
+    if len(lump) < lump_end - lump_start:
+        raise BadLumpError("Invalid dir entry offsets")
+    return bytes(lump), hasher.digest()
+
+
+def _check_lump_length(length: int, max_length: Optional[int]) -> None:
+    if max_length is not None and length > max_length:
+        raise LimitExceededError(f"Lump of {length} bytes is larger than {max_length}")
+
+
+def lump_dir_entry(header: Union[bytes, bytearray, memoryview], index: int, bsp_size: int) -> Tuple[int, int]:
     log.debug("BSP size: %d", bsp_size)
-    if bytes(bsp_data_view[0:4]) != bsp_head:
-        raise Exception("Invalid BSP header")
-    if bytes(bsp_data_view[4:8]) != bsp_version:
-        raise Exception("Invalid BSP version")
+    if len(header) < bsp_header_size or bytes(header[0:4]) != bsp_head:
+        raise BadHeaderError("Invalid BSP header")
+    if bytes(header[4:8]) != bsp_version:
+        raise BadVersionError("Invalid BSP version")
     dir_entry_ofs = 8 + index * 8
-    (offset, length) = struct.unpack(
-        "<2i", bytes(bsp_data_view[dir_entry_ofs : dir_entry_ofs + 8])
-    )  # index 0 lump: entities
+    offset, length = struct.unpack_from("<2i", header, dir_entry_ofs)  # index 0 lump: entities
     log.debug("Entities lump is at offset %d with size %d", offset, length)
-    if length < 0 or offset < 0x90 or offset + length > bsp_size:
-        raise Exception("Invalid dir entry offsets")
-    return bytes(bsp_data_view[offset : offset + length - 1])
+    if length < 0 or offset < bsp_header_size or offset + length > bsp_size:
+        raise BadLumpError("Invalid dir entry offsets")
+    return offset, length
+
+
+@lru_cache(maxsize=None)
+def _entity_line_patterns():
+    import re
+
+    return re.compile(r"\s*{\s*"), re.compile(r"\s*}\s*"), re.compile(r'\s*"([^"]*)"\s*')
 
 
 def parse_entity_obj(lines: Iterable[str]) -> Iterable[Dict[str, str]]:
+    obj_beg_exp, obj_end_exp, obj_string_exp = _entity_line_patterns()
     in_obj = False
     entity_obj: Dict[str, str] = {}
     line_no = 0
@@ -63,7 +179,7 @@ def parse_entity_obj(lines: Iterable[str]) -> Iterable[Dict[str, str]]:
                     in_obj = True
                     entity_obj = {}
                 continue
-            raise Exception(f"Expected object open curly at {line_no}")
+            raise ParseError(f"Expected object open curly at {line_no}", line_no)
 
         if obj_end_exp.match(line):
             in_obj = False
@@ -74,95 +190,732 @@ def parse_entity_obj(lines: Iterable[str]) -> Iterable[Dict[str, str]]:
             continue
         m = obj_string_exp.match(line)
         if not m or m.start() > 0:
-            raise Exception(f"Expected string literal key at {line_no}")
+            raise ParseError(f"Expected string literal key at {line_no}", line_no)
         key = m[1]
         m = obj_string_exp.match(line, m.end())
         if not m or m.end() < len(line):
-            raise Exception(f"Expected string literal value at {line_no}")
+            raise ParseError(f"Expected string literal value at {line_no}", line_no)
         value = m[1]
         if key in entity_obj:
             log.warning("Duplicate key: %s at %d", key, line_no)
         entity_obj[key] = value
 
 
-def process_entities(bsp_data: bytes) -> List[Dict[str, str]]:
-    return list(parse_entity_obj(str(get_lump(bsp_data, 0), encoding="ascii").splitlines()))
+def parse_entities(
+    entities_lump: bytes,
+    classnames: Optional[Union[Collection[str], Callable[[str], bool]]] = None,
+    keys: Optional[Collection[str]] = None,
+) -> Iterator[Dict[str, str]]:
+    """
+    Single pass tokenizer of an entities lump, working on the raw bytes: layout is free form, so several pairs or braces
+    may share a line and pairs may span lines. Only the tokens that end up in the results are decoded, entities not
+    matching `classnames` are skipped by the scanner as soon as their classname is known, without slicing or decoding
+    any of their tokens, and the keys not kept are compared as raw bytes, never decoded.
+    :param entities_lump: raw entities lump, as returned by `get_lump`.
+    :param classnames: classnames to keep, or a predicate on the classname, all entities are kept by default.
+    :param keys: keys to keep besides the classname, all keys are kept by default.
+    :return: entities with a classname, one dictionary per entity.
+    """
+    accepts = _classname_predicate(classnames)
+    key_filter = None if keys is None else {key.encode("ascii") for key in keys} | {b"classname"}
+    scanner = _EntityScanner(entities_lump, accepts)
+    for position, tokens in scanner:
+        if accepts is None and key_filter is None:
+            decoded = map(bytes.decode, tokens)
+            entity = dict(zip(decoded, decoded))
+            if entity.get("classname") is None:
+                log.warning("Empty object at byte %d", scanner.offset(position))
+                continue
+            if len(entity) * 2 < len(tokens):
+                log.warning("Duplicate key in object at byte %d", scanner.offset(position))
+            yield entity
+            continue
+        classname = _raw_classname(tokens)
+        if classname is None:
+            log.warning("Empty object at byte %d", scanner.offset(position))
+            continue
+        yield {
+            tokens[i].decode(): tokens[i + 1].decode()
+            for i in range(0, len(tokens), 2)
+            if key_filter is None or tokens[i] in key_filter
+        }
+
+
+def count_entities(
+    entities_lump: bytes, classnames: Optional[Union[Collection[str], Callable[[str], bool]]] = None
+) -> Dict[str, int]:
+    """
+    Counts-only variant of `parse_entities`, no entity dictionaries are built at all.
+    :param entities_lump: raw entities lump, as returned by `get_lump`.
+    :param classnames: classnames to count, or a predicate on the classname, all are counted by default.
+    :return: number of entities by classname.
+    """
+    accepts = _classname_predicate(classnames)
+    counts: Dict[str, int] = {}
+    scanner = _EntityScanner(entities_lump)
+    for position, tokens in scanner:
+        raw_classname = _raw_classname(tokens)
+        if raw_classname is None:
+            log.warning("Empty object at byte %d", scanner.offset(position))
+            continue
+        classname = raw_classname.decode()
+        if accepts is None or accepts(classname):
+            counts[classname] = counts.get(classname, 0) + 1
+    return counts
+
+
+def _classname_predicate(
+    classnames: Optional[Union[Collection[str], Callable[[str], bool]]],
+) -> Optional[Callable[[str], bool]]:
+    if classnames is None or callable(classnames):
+        return classnames
+    return frozenset(classnames).__contains__
+
+
+def _raw_classname(tokens: List[bytes], start: int = 0, end: Optional[int] = None) -> Optional[bytes]:
+    end = len(tokens) if end is None else end
+    for key_index in range(end - 2, start - 1, -2):  # the last one wins, like with dictionaries
+        if tokens[key_index] == b"classname":
+            return tokens[key_index + 1]
+    return None
+
+
+def _between_entities(structure: bytes, seen: Set[bytes]) -> bool:
+    if structure.translate(None, entity_whitespace_bytes) != b"}{":
+        return False
+    seen.add(structure)
+    return True
+
+
+class _EntityScanner:
+    """
+    Splits an entities lump at quotes, which is done at C speed: even parts are the structure between string literals,
+    odd parts are the string literals themselves. Only structure parts that are not plain whitespace are looked at on
+    the Python side, and the ones between two entities are recognized as a whole, not byte by byte. The tokens of an
+    entity are a slice of the string literals, entities rejected by `accepts` are not even sliced. Byte offsets are only
+    calculated when reporting.
+    """
+
+    def __init__(self, entities_lump: bytes, accepts: Optional[Callable[[str], bool]] = None):
+        data = bytes(entities_lump)
+        if not data.isascii():
+            try:
+                data.decode("ascii")
+            except UnicodeDecodeError as e:
+                raise self.error("Non-ASCII character", e.start) from e
+        self.parts = data.split(b'"')
+        if len(self.parts) % 2 == 0:
+            raise self.error("Unterminated string literal", len(data) - len(self.parts[-1]) - 1)
+        self.tokens = self.parts[1::2]
+        self.accepts = accepts
+        # verdicts of `accepts` by raw classname, the same few classnames are repeated all over a map
+        self.verdicts: Dict[bytes, bool] = {}
+        self.entity_start = -1
+        self.entity_position = (0, 0)
+        self.tokens_end = 0  # end of the tokens consumed by entities
+
+    @staticmethod
+    def error(message: str, offset: int) -> ParseError:
+        return ParseError(f"{message} at byte {offset}", offset)
+
+    def offset(self, position: Tuple[int, int]) -> int:
+        structure_index, char_index = position
+        return sum(len(part) + 1 for part in self.parts[: structure_index * 2]) + char_index
+
+    def token_offset(self, token_index: int) -> int:
+        return sum(len(part) + 1 for part in self.parts[: token_index * 2 + 1]) - 1
+
+    def __iter__(self) -> Iterator[Tuple[Tuple[int, int], List[bytes]]]:
+        structures = self.parts[0::2]
+        tokens, accepts = self.tokens, self.accepts
+        stripped = map(bytes.strip, structures, repeat(entity_whitespace_bytes))
+        # structure parts seen between two entities, a closing and an opening brace in whitespace, a lump repeats a few
+        between_entities: Set[bytes] = set()
+        for structure_index in compress(count(), stripped):
+            structure = structures[structure_index]
+            start = self.entity_start
+            if (
+                start >= 0
+                and not (structure_index - start) % 2
+                and (structure in between_entities or _between_entities(structure, between_entities))
+            ):
+                # the common case: close an entity and open the next one without looking at each byte
+                self.tokens_end = structure_index
+                if accepts is None or self._kept(start, structure_index):
+                    yield self.entity_position, tokens[start:structure_index]
+                self.entity_start = structure_index
+                self.entity_position = (structure_index, structure.index(b"{"))
+                continue
+            for entity in self._scan_structure(structure, structure_index):
+                if entity is not None:
+                    yield entity
+        if self.entity_start >= 0:
+            log.warning("Unterminated object at byte %d", self.offset(self.entity_position))
+        elif len(self.tokens) > self.tokens_end:
+            raise self.error("Expected object open curly", self.token_offset(self.tokens_end))
+
+    def _scan_structure(
+        self, structure: bytes, structure_index: int
+    ) -> Iterator[Optional[Tuple[Tuple[int, int], List[bytes]]]]:
+        for char_index, char in enumerate(structure):
+            if char in entity_whitespace:
+                continue
+            position = (structure_index, char_index)
+            if char == 0x7B:  # {
+                self._open(position)
+            elif char == 0x7D:  # }
+                yield self._close(position)
+            else:
+                raise self.error(f"Unexpected character {chr(char)!r}", self.offset(position))
+
+    def _open(self, position: Tuple[int, int]) -> None:
+        if self.entity_start >= 0:
+            raise self.error("Expected string literal key", self.offset(position))
+        if position[0] > self.tokens_end:
+            raise self.error("Expected object open curly", self.token_offset(self.tokens_end))
+        self.entity_start, self.entity_position = position[0], position
+
+    def _close(self, position: Tuple[int, int]) -> Optional[Tuple[Tuple[int, int], List[bytes]]]:
+        structure_index = position[0]
+        if self.entity_start < 0:
+            offset = self.token_offset(self.tokens_end) if structure_index > self.tokens_end else self.offset(position)
+            raise self.error("Expected object open curly", offset)
+        if (structure_index - self.entity_start) % 2:
+            raise self.error("Expected string literal value", self.offset(position))
+        return self._closed(structure_index)
+
+    def _closed(self, structure_index: int) -> Optional[Tuple[Tuple[int, int], List[bytes]]]:
+        start = self.entity_start
+        self.entity_start, self.tokens_end = -1, structure_index
+        if self.accepts is None or self._kept(start, structure_index):
+            return self.entity_position, self.tokens[start:structure_index]
+        return None
+
+    def _kept(self, start: int, end: int) -> bool:
+        """
+        Entities rejected by `accepts` are dropped before their tokens are even sliced, the ones without a classname
+        are kept, to be reported.
+        """
+        classname = _raw_classname(self.tokens, start, end)
+        if classname is None:
+            return True
+        verdict = self.verdicts.get(classname)
+        if verdict is None:
+            verdict = self.verdicts[classname] = bool(self.accepts and self.accepts(classname.decode()))
+        return verdict
+
+
+def process_entities(
+    bsp_data: bytes,
+    classnames: Optional[Union[Collection[str], Callable[[str], bool]]] = None,
+    keys: Optional[Collection[str]] = None,
+) -> List[Dict[str, str]]:
+    from bspp import stats
+
+    entities_lump = get_lump(bsp_data, 0)
+    with stats.timed("entities") as timer:
+        entities = list(parse_entities(entities_lump, classnames, keys))
+        timer.bytes_in, timer.entities = len(entities_lump), len(entities)
+        return entities
+
+
+def lump_entities(entities_lump: bytes, entity_filter: Optional[EntityFilter] = None) -> List[Dict[str, str]]:
+    """
+    :raise ParseError: if there is no worldspawn, which every map has and `pp_map` needs, unless it's filtered out.
+    """
+    from bspp import stats
+
+    with stats.timed("entities") as timer:
+        if entity_filter is None:
+            entities = list(parse_entities(entities_lump))
+        else:
+            entities = list(parse_entities(entities_lump, entity_filter.accepts, entity_filter.keys))
+        timer.bytes_in, timer.entities = len(entities_lump), len(entities)
+    if (entity_filter is None or entity_filter.accepts("worldspawn")) and not any(
+        entity["classname"] == "worldspawn" for entity in entities
+    ):
+        raise ParseError("No worldspawn entity", 0)
+    return entities
+
+
+def resolve_workers(workers: Optional[int]) -> int:
+    """
+    Normalize a worker count option.
+    :param workers: `None` or 1 for sequential processing, 0 for one worker per CPU, or an explicit count.
+    :return: the number of worker processes to use, 1 meaning no pool at all.
+    """
+    if workers is None:
+        return 1
+    if workers < 0:
+        raise ValueError(f"Invalid number of workers: {workers}")
+    return workers or os.cpu_count() or 1
+
+
+@dataclass(frozen=True)
+class Parallelism:
+    """
+    How files are spread over worker processes by `process`.
+    :param workers: number of worker processes, 0 for one per CPU, `None` or 1 to process in the calling process.
+    :param ordered: when processing in parallel keep the input order instead of yielding results as they finish.
+    :param budget: when processing in parallel hold back files while the `memory_estimate` of the files in flight
+        would exceed it, the calling process has a single file in flight anyway.
+    :param executor: process pool of `workers` processes to use, kept by the caller across calls, a pool is started
+        for each call otherwise.
+    """
+
+    workers: Optional[int] = None
+    ordered: bool = False
+    budget: Optional["MemoryBudget"] = None
+    executor: Optional["Executor"] = None
+
+
+@dataclass(frozen=True)
+class ProcessOptions:
+    """
+    How `process` and the file level functions process files.
+    :param cache: optional persistent cache of PK3 results.
+    :param entity_filter: only parse the matching entities, like `pp_entity_filter` when only `pp_map` is needed.
+    :param map_store: optional store of parsed maps to skip the copies of a BSP found in several archives.
+    :param limits: reject the maps beyond these limits, as failures, before inflating them.
+    :param resilient: yield a `FileError` for every file or PK3 map that fails instead of raising, the good maps of a
+        PK3 are still yielded.
+    :param skip_list: skip the files that failed in earlier runs and add the ones that fail now, implies `resilient`.
+    :param parallel: worker processes of `process`.
+    """
+
+    cache: Optional["ResultCache"] = None
+    entity_filter: Optional[EntityFilter] = None
+    map_store: Optional["MapStore"] = None
+    limits: Optional["ResourceLimits"] = None
+    resilient: bool = False
+    skip_list: Optional[SkipList] = None
+    parallel: Parallelism = Parallelism()
+
+    def for_workers(self) -> "ProcessOptions":
+        """
+        :return: the options without the state kept in the calling process: the cache, the skip list and the pool.
+        """
+        return replace(self, cache=None, skip_list=None, parallel=Parallelism())
+
+
+def process(
+    files: Iterable[str], options: ProcessOptions = ProcessOptions()
+) -> Iterable[Union[PK3Entity, MapEntities, FileError]]:
+    """
+    Process .bsp and .pk3 files, folders are walked recursively for .pk3 files.
+    :param files: files or folders to process.
+    :param options: caching, filtering, limits, error handling and worker processes.
+    :return: lazy iterable of the results.
+    """
+    worker_count = resolve_workers(options.parallel.workers)
+    file_names = walk(files)
+    skip_list = options.skip_list
+    if skip_list is not None:
+        options = replace(options, resilient=True)
+        file_names = (file_name for file_name in file_names if not skip_list.skips(file_name))
+    results: Iterable[Union[PK3Entity, MapEntities, FileError]]
+    if worker_count <= 1:
+        results = _process_sequential(file_names, options)
+    elif options.resilient or _parent_state(options):
+        results = _process_shared_pool(file_names, worker_count, options)
+    else:
+        from bspp.parallel import Schedule
+
+        task = partial(process_file, options=options.for_workers())
+        schedule = Schedule(options.parallel.ordered, budget=options.parallel.budget, weight=_weight(options))
+        results = _pool_map(task, file_names, worker_count, options, schedule)
+    return results if skip_list is None else _skip_failed(results, skip_list)
+
+
+def _pool_map(
+    task: Callable[[str], Any], file_names: Iterable[str], workers: int, options: ProcessOptions, schedule: "Schedule"
+) -> Iterator[Any]:
+    from bspp.parallel import executor_map, pool_map
+
+    if options.parallel.executor is None:
+        return pool_map(task, file_names, workers, schedule)
+    return executor_map(options.parallel.executor, task, file_names, workers * 2, schedule)
+
+
+def _parent_state(options: ProcessOptions) -> bool:
+    """
+    :return: whether results have to pass through the calling process: to be cached, deduplicated or timed.
+    """
+    from bspp import stats
+
+    return options.cache is not None or options.map_store is not None or stats.active() is not None
+
 
+def _skip_failed(
+    results: Iterable[Union[PK3Entity, MapEntities, FileError]], skip_list: SkipList
+) -> Iterator[Union[PK3Entity, MapEntities, FileError]]:
+    for result in results:
+        if isinstance(result, FileError) and result.map_name is None:
+            skip_list.add(result)
+        yield result
 
-def process(files: Iterable[str]) -> Iterable[Union[PK3Entity, MapEntities]]:
+
+def _process_sequential(
+    file_names: Iterable[str], options: ProcessOptions
+) -> Iterator[Union[PK3Entity, MapEntities, FileError]]:
+    for file_name in file_names:
+        if options.resilient:
+            yield from process_file_resilient(file_name, options)
+        else:
+            yield process_file(file_name, options)
+
+
+def _process_shared_pool(
+    file_names: Iterable[str], workers: int, options: ProcessOptions
+) -> Iterator[Union[PK3Entity, MapEntities, FileError]]:
+    from bspp import parallel, stats
+
+    # the cache is only accessed from the calling process, workers get the misses only
+    misses: Dict[str, "Fingerprint"] = {}
+    task = partial(_process_file_task, options=options.for_workers(), collect_stats=stats.active() is not None)
+
+    def submit(executor: "Executor", file_name: str) -> "Future":
+        if options.cache is not None and is_pk3(file_name):
+            try:
+                fingerprint = options.cache.fingerprint(file_name)
+            except Exception as e:  # pylint: disable=broad-except
+                if not options.resilient:
+                    raise
+                log.warning("Failed to process %s: %s", file_name, e)
+                return parallel.completed(([FileError.of(file_name, e)], 0, 0, []))
+            cached = options.cache.get(fingerprint, file_name, options.entity_filter)
+            if cached:
+                return parallel.completed(([cached], 0, 0, []))
+            misses[file_name] = fingerprint
+        return executor.submit(task, file_name)
+
+    schedule = parallel.Schedule(options.parallel.ordered, submit, options.parallel.budget, _weight(options))
+    for results, dedup_hits, dedup_misses, events in _pool_map(task, file_names, workers, options, schedule):
+        stats.record_all(events)
+        if options.map_store is not None:
+            # workers have their own copies of the store, collect their counts
+            options.map_store.add_counts(dedup_hits, dedup_misses)
+        result = results[0]
+        if options.cache is not None and isinstance(result, PK3Entity) and result.pk3_name in misses:
+            fingerprint = misses.pop(result.pk3_name)
+            if len(results) == 1:  # PK3s with failed maps are retried next time
+                options.cache.put(fingerprint, result, options.entity_filter)
+        yield from results
+
+
+def _process_file_task(
+    file_name: str, options: ProcessOptions, collect_stats: bool = False
+) -> Tuple[List[Union[PK3Entity, MapEntities, FileError]], int, int, List["StageEvent"]]:
+    from bspp import stats
+
+    # runs in a worker process, the dedup counts and the statistics are sent back along with the results
+    map_store = options.map_store
+    hits, misses = (map_store.hits, map_store.misses) if map_store is not None else (0, 0)
+    events: List["StageEvent"] = []
+    with stats.collecting(stats.Stats(events=events)) if collect_stats else nullcontext():
+        if options.resilient:
+            results = process_file_resilient(file_name, options)
+        else:
+            results = [process_file(file_name, options)]
+    if map_store is None:
+        return results, 0, 0, events
+    return results, map_store.hits - hits, map_store.misses - misses, events
+
+
+def walk(files: Iterable[str]) -> Iterator[str]:
     for file_name in files:
         if os.path.isdir(file_name):
             for root, _, w_files in os.walk(file_name):
                 pk3_files = [dir_file for dir_file in w_files if is_pk3(dir_file)]
                 for pk3_file in pk3_files:
-                    yield process_file(os.path.join(root, pk3_file))
+                    yield os.path.join(root, pk3_file)
         else:
-            yield process_file(file_name)
-
-
-def process_file(file_name: str) -> Union[PK3Entity, MapEntities]:
-    if pk3_file_exp.match(file_name):
-        log.info("Processing PK3 %s", file_name)
-        return process_pk3_file(file_name)
-    elif bsp_file_exp.match(file_name):
-        log.info("Processing BSP %s", file_name)
-        return process_map_file(file_name)
-    else:
-        raise ValueError(f"Unknown file type: {file_name}")
-
+            yield file_name
+
+
+def process_file(
+    file_name: str, options: ProcessOptions = ProcessOptions(), errors: Optional[List[FileError]] = None
+) -> Union[PK3Entity, MapEntities]:
+    """
+    :param options: only the cache, the entity filter, the map store and the limits apply to a single file.
+    :param errors: collect the PK3 maps that fail here and carry on with the rest, instead of raising.
+    """
+    from bspp import stats
+
+    with stats.timed("file", file_name) as timer:
+        if is_pk3(file_name):
+            log.info("Processing PK3 %s", file_name)
+            result: Union[PK3Entity, MapEntities] = process_pk3_file(file_name, options, errors)
+        elif is_bsp(file_name):
+            log.info("Processing BSP %s", file_name)
+            result = process_map_file(file_name, options)
+        else:
+            raise ValueError(f"Unknown file type: {file_name}")
+        if timer:
+            timer.bytes_in = os.path.getsize(file_name)
+            maps = result.map_entities if isinstance(result, PK3Entity) else [result]
+            timer.entities = sum(len(m.entities) for m in maps)
+        return result
+
+
+def process_file_resilient(
+    file_name: str, options: ProcessOptions = ProcessOptions()
+) -> List[Union[PK3Entity, MapEntities, FileError]]:
+    """
+    Same as `process_file`, except that failures are returned as `FileError` records instead of being raised.
+    :return: the result followed by the errors of the PK3 maps that failed, or a single error if the file failed.
+    """
+    errors: List[FileError] = []
+    try:
+        result = process_file(file_name, options, errors)
+    except Exception as e:  # pylint: disable=broad-except
+        log.warning("Failed to process %s: %s", file_name, e)
+        return [FileError.of(file_name, e)]
+    return [result, *errors]
+
+
+def process_map_file(file_name: str, options: ProcessOptions = ProcessOptions()) -> MapEntities:
+    from bspp import stats
+    import mmap
+    from bspp.hash import bsp_hash_chunks, read_chunks
 
-def process_map_file(file_name: str) -> MapEntities:
     with open(file_name, "rb") as bsp_file:
-        bsp_data = bsp_file.read()
-        return MapEntities(file_name, bsp_hash(bsp_data), process_entities(bsp_data))
-
-
-def process_pk3_file(file_name: str) -> PK3Entity:
+        bsp_size = os.fstat(bsp_file.fileno()).st_size
+        if bsp_size < bsp_header_size:
+            raise BadHeaderError("Invalid BSP header")
+        with mmap.mmap(bsp_file.fileno(), 0, access=mmap.ACCESS_READ) as bsp_data:
+            with stats.timed("map", file_name) as timer:
+                timer.bytes_in = timer.bytes_out = bsp_size
+                entities_lump = read_lump(bsp_data, 0, bsp_size, _lump_limit(options.limits))
+                bsp_data.seek(0)
+                bsp_crc = bsp_hash_chunks(read_chunks(bsp_data))
+            return MapEntities(file_name, bsp_crc, lump_entities(entities_lump, options.entity_filter))
+
+
+def process_pk3_file(
+    file_name: str, options: ProcessOptions = ProcessOptions(), errors: Optional[List[FileError]] = None
+) -> PK3Entity:
+    """
+    :param options: the limits reject the maps beyond them, before inflating them.
+    :param errors: collect the maps that fail here and carry on with the rest, instead of raising.
+    """
+    from zipfile import ZipFile
+
+    cache = options.cache
     with ZipFile(file_name, "r") as pk3_zip:
-        return process_pk3_zip(pk3_zip)
-
+        if cache is None:
+            return process_pk3_zip(pk3_zip, options, errors)
+        fingerprint = cache.fingerprint(file_name, pk3_zip)
+        pk3 = cache.get(fingerprint, file_name, options.entity_filter)
+        if pk3 is None:
+            error_count = len(errors) if errors is not None else 0
+            pk3 = process_pk3_zip(pk3_zip, options, errors)
+            if not errors or len(errors) == error_count:  # PK3s with failed maps are retried next time
+                cache.put(fingerprint, pk3, options.entity_filter)
+        return pk3
+
+
+def process_pk3_zip(
+    pk3_zip: "ZipFile", options: ProcessOptions = ProcessOptions(), errors: Optional[List[FileError]] = None
+) -> PK3Entity:
+    from bspp import stats
+    from bspp.hash import pk3_hash_info
 
-def process_pk3_zip(pk3_zip: ZipFile) -> PK3Entity:
     zip_info_list = pk3_zip.infolist()
     bsp_name_list = list(filter(is_pk3_bsp, map(lambda entry: entry.filename, zip_info_list)))
     if log.isEnabledFor(logging.DEBUG):
         log.debug("Maps: %s", ", ".join(bsp_name_list))
-    return PK3Entity(
-        str(pk3_zip.filename), pk3_hash_info(zip_info_list), list(_process_pk3_zip_maps(pk3_zip, bsp_name_list))
-    )
-
-
-def _process_pk3_zip_maps(pk3_zip: ZipFile, bsp_name_list: Iterable[str]) -> Iterable[MapEntities]:
+    with stats.timed("pk3", str(pk3_zip.filename)) as timer:
+        pk3 = PK3Entity(
+            str(pk3_zip.filename),
+            pk3_hash_info(zip_info_list),
+            list(_process_pk3_zip_maps(pk3_zip, bsp_name_list, options, errors)),
+        )
+        if timer:
+            bsp_infos = [pk3_zip.getinfo(bsp_name) for bsp_name in bsp_name_list]
+            timer.bytes_in = sum(info.compress_size for info in bsp_infos)
+            timer.bytes_out = sum(info.file_size for info in bsp_infos)
+            timer.entities = sum(len(m.entities) for m in pk3.map_entities)
+        return pk3
+
+
+def _process_pk3_zip_maps(
+    pk3_zip: "ZipFile", bsp_name_list: Iterable[str], options: ProcessOptions, errors: Optional[List[FileError]]
+) -> Iterable[MapEntities]:
     for bsp_file_name in bsp_name_list:
         log.info("Processing pk3 map: %s", bsp_file_name)
-        with pk3_zip.open(bsp_file_name, "r") as bsp_file:
-            bsp_data = bsp_file.read()
-        entities = process_entities(bsp_data)
-        yield MapEntities(bsp_file_name[len("maps/") : -len(".bsp")], bsp_hash(bsp_data), entities)
+        if errors is None:
+            yield _process_pk3_zip_map(pk3_zip, bsp_file_name, options)
+            continue
+        try:
+            map_entities = _process_pk3_zip_map(pk3_zip, bsp_file_name, options)
+        except Exception as e:  # pylint: disable=broad-except
+            log.warning("Failed to process %s in %s: %s", bsp_file_name, pk3_zip.filename, e)
+            errors.append(FileError.of(str(pk3_zip.filename), e, _map_name(bsp_file_name)))
+            continue
+        yield map_entities
+
+
+def _map_name(bsp_file_name: str) -> str:
+    return bsp_file_name[len("maps/") : -len(".bsp")]
+
+
+def _process_pk3_zip_map(pk3_zip: "ZipFile", bsp_file_name: str, options: ProcessOptions) -> MapEntities:
+    from bspp import stats
+
+    map_name = _map_name(bsp_file_name)
+    bsp_info = pk3_zip.getinfo(bsp_file_name)
+    entity_filter, map_store = options.entity_filter, options.map_store
+    if options.limits is not None:
+        options.limits.check_member(bsp_info)
+    map_key = None
+    if map_store is not None:
+        map_key = map_store.key(bsp_info, entity_filter)
+        stored = map_store.get(map_key)
+        if stored is not None:
+            log.debug("Already seen: %s", bsp_file_name)
+            return MapEntities(map_name, *stored)
+    with stats.timed("map", bsp_file_name) as timer, pk3_zip.open(bsp_info, "r") as bsp_file:
+        timer.bytes_in, timer.bytes_out = bsp_info.compress_size, bsp_info.file_size
+        entities_lump, bsp_crc = read_lump_and_hash(
+            bsp_file, 0, bsp_info.file_size, max_length=_lump_limit(options.limits)
+        )
+    entities = lump_entities(entities_lump, entity_filter)
+    if map_store is not None and map_key is not None:
+        map_store.put(map_key, bsp_crc, entities)
+    return MapEntities(map_name, bsp_crc, entities)
+
+
+def _lump_limit(limits: Optional["ResourceLimits"]) -> Optional[int]:
+    return limits.lump_limit if limits is not None else None
+
+
+def _weight(options: ProcessOptions) -> Callable[[str], int]:
+    return partial(memory_estimate, limits=options.limits)
+
+
+def memory_estimate(file_name: str, limits: Optional["ResourceLimits"] = None) -> int:
+    """
+    Weight of a file in a `MemoryBudget`: the peak memory of parsing its largest entities lump. The length of the lump
+    is read from the lump directory in the header of each map, only the beginning of a zipped map is inflated.
+    :param limits: the limits the file is processed with, to cap the lump size.
+    :return: the size in bytes, 0 for files that can't be read, their failure is reported by the processing.
+    """
+    from bspp.limits import entity_overhead
+
+    try:
+        size = max(_entities_lengths(file_name), default=0)
+    except Exception:  # pylint: disable=broad-except
+        return 0
+    if limits is not None:
+        size = min(size, limits.lump_limit)
+    return size * entity_overhead
+
+
+def _entities_lengths(file_name: str) -> Iterator[int]:
+    from zipfile import ZipFile
+
+    if not is_pk3(file_name):
+        with open(file_name, "rb") as bsp_file:
+            yield _entities_length(bsp_file.read(bsp_header_size), os.fstat(bsp_file.fileno()).st_size)
+        return
+    with ZipFile(file_name, "r") as pk3_zip:
+        for info in pk3_zip.infolist():
+            if is_pk3_bsp(info.filename):
+                with pk3_zip.open(info) as bsp_file:
+                    yield _entities_length(bsp_file.read(bsp_header_size), info.file_size)
+
+
+def _entities_length(header: bytes, bsp_size: int) -> int:
+    try:
+        return lump_dir_entry(header, 0, bsp_size)[1]
+    except (BadHeaderError, BadVersionError, BadLumpError):
+        return 0  # the map fails before its entities are parsed
+
+
+def list_pk3(file_name: str) -> PK3Listing:
+    """
+    Inventory of a PK3 from its central directory alone, no map is decompressed.
+    :param file_name: input pk3 file.
+    :return: the same pk3 hash as `pk3_hash`, and the name and uncompressed size of the maps.
+    """
+    from bspp.hash import pk3_hash_info
+    from bspp.zipdir import read_central_directory
+
+    with open(file_name, "rb") as pk3_file:
+        entries = read_central_directory(pk3_file)
+    maps = [MapListing(_map_name(entry.filename), entry.file_size) for entry in entries if is_pk3_bsp(entry.filename)]
+    return PK3Listing(file_name, pk3_hash_info(entries), maps)
+
+
+def inventory(files: Iterable[str], resilient: bool = False) -> Iterator[Union[PK3Listing, FileError]]:
+    """
+    List the PK3 archives among the files or in the folders, see `list_pk3`.
+    :param resilient: yield a `FileError` for every archive that can't be listed instead of raising.
+    """
+    for file_name in walk(files):
+        if not is_pk3(file_name):
+            log.warning("Not a PK3, skipped: %s", file_name)
+        elif not resilient:
+            yield list_pk3(file_name)
+        else:
+            try:
+                yield list_pk3(file_name)
+            except Exception as e:  # pylint: disable=broad-except
+                log.warning("Failed to list %s: %s", file_name, e)
+                yield FileError.of(file_name, e)
 
 
-def json_formatted(entity_containers: Iterable[Union[MapEntities, PK3Entity]]):
-    processed = [
-        pp_map(x) if isinstance(x, MapEntities) else PK3(x.pk3_name, x.crc, [pp_map(me) for me in x.map_entities])
-        for x in entity_containers
-    ]
-    print(json.dumps(processed, indent=True, cls=JSONEncodingAwareClassEncoder))
+def _postprocessed(x: Union[MapEntities, PK3Entity, PK3Listing, FileError]) -> Union[Map, PK3, PK3Listing, FileError]:
+    from bspp.postprocess import pp_map, pp_pk3
 
+    if isinstance(x, MapEntities):
+        return pp_map(x)
+    if isinstance(x, PK3Entity):
+        return pp_pk3(x)
+    return x
 
-if __name__ == "__main__":
-    import argparse
-    from bspp.out_plain_text import plain_text
 
-    logging.basicConfig(level=logging.INFO)
+def json_formatted(entity_containers: Iterable[Union[MapEntities, PK3Entity, PK3Listing, FileError]]):
+    import json
+
+    processed = [_postprocessed(x) for x in entity_containers]
+    print(json.dumps(processed, indent=True, cls=JSONEncodingAwareClassEncoder))
 
-    parser = argparse.ArgumentParser(description="BSP info tool")
-    parser.add_argument("files", metavar="F", nargs="+", help="a .bsp or pk3 or file or folder to be processed")
-    parser.add_argument(
-        "-j", dest="output", action="store_const", default=plain_text, const=json_formatted, help="JSON output"
-    )
-    parsed = parser.parse_args()
 
-    if len(parsed.files) < 1:
-        log.warning("No files specified")
+def json_lines(
+    entity_containers: Iterable[Union[MapEntities, PK3Entity, PK3Listing, FileError]],
+    out: Optional[IO[str]] = None,
+    flush_every: int = 1,
+) -> None:
+    """
+    Stream results as JSON Lines, one compact record per PK3 or map, written as soon as it's processed.
+    :param entity_containers: results to write, consumed lazily.
+    :param out: text stream to write to, standard output by default.
+    :param flush_every: flush the stream after this many records.
+    """
+    out = out or sys.stdout
+    encode = JSONEncodingAwareClassEncoder(separators=(",", ":")).encode
+    for i, x in enumerate(entity_containers, 1):
+        out.write(encode(_postprocessed(x)))
+        out.write("\n")
+        if i % flush_every == 0:
+            out.flush()
+    out.flush()
+
+
+def __getattr__(name: str) -> Any:
+    # the post-processing functions used to be imported here, they are still available once needed
+    if name in ("pp_map", "pp_pk3"):
+        from bspp import postprocess
+
+        return getattr(postprocess, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+if __name__ == "__main__":
+    # `python -m bspp.bspp`: the command line imports this module as `bspp.bspp`, reuse it instead of running it twice
+    sys.modules.setdefault("bspp.bspp", sys.modules[__name__])
+    from bspp.cli import main
 
-    parsed.output(process(parsed.files))
+    main()
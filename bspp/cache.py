@@ -0,0 +1,146 @@
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, replace
+from typing import Optional
+from zipfile import ZipFile
+
+from bspp.hash import pk3_hash_info
+from bspp.model import PK3Entity, EntityFilter
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Fingerprint:
+    path: str
+    size: int
+    mtime_ns: int
+    crc: bytes
+
+
+class ResultCache:
+    """
+    Persistent SQLite backed cache of processed PK3 files.
+    Entries are keyed by the absolute path, size and modification time of the archive, plus its pk3 checksum which
+    only needs the zip central directory, so a hit never has to decompress any maps. Results parsed with different
+    entity filters are kept apart.
+    """
+
+    def __init__(self, db_file: str, check_same_thread: bool = True):
+        """
+        :param db_file: SQLite file, created if missing, or ":memory:" for a cache that lasts as long as the process.
+        :param check_same_thread: like for `sqlite3.connect`, `False` to share the cache between threads with a lock.
+        """
+        self.db_file = db_file
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        import sqlite3  # pylint: disable=import-outside-toplevel
+
+        self._db = sqlite3.connect(db_file, check_same_thread=check_same_thread)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS pk3_result ("
+                " path TEXT NOT NULL,"
+                " entity_filter TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " mtime_ns INTEGER NOT NULL,"
+                " crc BLOB NOT NULL,"
+                " stored_at REAL NOT NULL,"
+                " result TEXT NOT NULL,"
+                " PRIMARY KEY (path, entity_filter))"
+            )
+
+    def __enter__(self) -> "ResultCache":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._db.close()
+
+    @staticmethod
+    def fingerprint(file_name: str, pk3_zip: Optional[ZipFile] = None) -> Fingerprint:
+        stat = os.stat(file_name)
+        if pk3_zip is None:
+            with ZipFile(file_name, "r") as own_zip:
+                crc = pk3_hash_info(own_zip.infolist())
+        else:
+            crc = pk3_hash_info(pk3_zip.infolist())
+        return Fingerprint(os.path.abspath(file_name), stat.st_size, stat.st_mtime_ns, crc)
+
+    def get(
+        self, fingerprint: Fingerprint, pk3_name: str, entity_filter: Optional[EntityFilter] = None
+    ) -> Optional[PK3Entity]:
+        """
+        Look up a processed PK3, entries of an archive that has been changed since are evicted.
+        :param fingerprint: fingerprint of the archive.
+        :param pk3_name: name of the archive as it should appear in the result.
+        :param entity_filter: the entity filter the result has been parsed with.
+        :return: the cached result, or `None` on a miss.
+        """
+        row = self._db.execute(
+            "SELECT size, mtime_ns, crc, result FROM pk3_result WHERE path = ? AND entity_filter = ?",
+            (fingerprint.path, _filter_key(entity_filter)),
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        size, mtime_ns, crc, result = row
+        if (size, mtime_ns, bytes(crc)) != (fingerprint.size, fingerprint.mtime_ns, fingerprint.crc):
+            log.debug("Stale cache entry: %s", fingerprint.path)
+            self._delete(fingerprint.path)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return replace(PK3Entity.from_json(json.loads(result)), pk3_name=pk3_name)
+
+    def put(self, fingerprint: Fingerprint, pk3: PK3Entity, entity_filter: Optional[EntityFilter] = None) -> None:
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO pk3_result (path, entity_filter, size, mtime_ns, crc, stored_at, result)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    fingerprint.path,
+                    _filter_key(entity_filter),
+                    fingerprint.size,
+                    fingerprint.mtime_ns,
+                    fingerprint.crc,
+                    time.time(),
+                    json.dumps(pk3.to_json(), separators=(",", ":")),
+                ),
+            )
+
+    def evict_stale(self) -> int:
+        """
+        Remove entries of archives that have been deleted or modified since they were cached.
+        :return: the number of evicted entries.
+        """
+        stale = []
+        rows = self._db.execute("SELECT DISTINCT path, size, mtime_ns FROM pk3_result").fetchall()
+        for path, size, mtime_ns in rows:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                stale.append(path)
+                continue
+            if (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns):
+                stale.append(path)
+        for path in stale:
+            self._delete(path)
+        return len(stale)
+
+    def _delete(self, path: str) -> None:
+        with self._db:
+            self._db.execute("DELETE FROM pk3_result WHERE path = ?", (path,))
+        self.evictions += 1
+
+    def __str__(self) -> str:
+        return f"cache {self.db_file}: {self.hits} hits, {self.misses} misses, {self.evictions} evictions"
+
+
+def _filter_key(entity_filter: Optional[EntityFilter]) -> str:
+    return "" if entity_filter is None else entity_filter.cache_key()
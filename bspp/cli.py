@@ -0,0 +1,288 @@
+"""
+Command line entry point of the BSP info tool.
+Only what the selected options need is imported: a run on a single small PK3 is dominated by the start-up time.
+"""
+
+import logging
+import sys
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Iterator, List, Optional, Tuple, Union
+
+if TYPE_CHECKING:
+    import argparse
+    from concurrent.futures import Executor
+    from bspp.bspp import ProcessOptions
+    from bspp.limits import MemoryBudget, ResourceLimits
+    from bspp.manifest import Manifest
+    from bspp.model import FileError, MapEntities, PK3Entity
+    from bspp.stats import Stats
+
+log = logging.getLogger(__name__)
+
+
+def stdin_paths() -> Iterator[str]:
+    """
+    :return: the paths read from the standard input, one per line, as they arrive.
+    """
+    for line in sys.stdin:
+        path = line.rstrip("\r\n")
+        if path:
+            yield path
+
+
+def main(args: Optional[List[str]] = None) -> None:
+    # pylint: disable=import-outside-toplevel
+    args = sys.argv[1:] if args is None else args
+    if args[:1] == ["query"]:
+        from bspp.index import main as index_main
+
+        index_main(args)
+        return
+
+    parser = _parser()
+    parsed = parser.parse_args(args)
+    if not parsed.files and not parsed.stdin:
+        parser.error("no files specified")
+    if parsed.stdin and parsed.watch:
+        parser.error("--watch can't be combined with --stdin")
+    if parsed.stdin and parsed.manifest:
+        parser.error("--manifest can't be combined with --stdin")
+
+    logging.basicConfig(level=logging.INFO)
+
+    from bspp.bspp import resolve_workers
+
+    worker_count = resolve_workers(parsed.workers)
+    if worker_count <= 1:
+        _Session(parsed, worker_count).serve()
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    # a single pool serves the whole session, every line of --stdin and every rescan of --watch
+    with ProcessPoolExecutor(max_workers=worker_count) as pool:
+        _Session(parsed, worker_count, pool).serve()
+
+
+def _parser() -> "argparse.ArgumentParser":
+    import argparse  # pylint: disable=import-outside-toplevel
+
+    parser = argparse.ArgumentParser(
+        prog="bspp",
+        description="BSP info tool",
+        epilog="bspp query DB [options]: search a map index built by python -m bspp.index build, see bspp query -h",
+    )
+    parser.add_argument("files", metavar="F", nargs="*", help="a .bsp or pk3 or file or folder to be processed")
+    parser.add_argument("-j", dest="output", action="store_const", default="plain", const="json", help="JSON output")
+    parser.add_argument(
+        "-J",
+        "--jsonl",
+        dest="output",
+        action="store_const",
+        const="jsonl",
+        help="streaming JSON Lines output, one record per PK3 or map",
+    )
+    parser.add_argument(
+        "--stdin",
+        action="store_true",
+        help="read files from the standard input, one per line, and write the results of each one as it's read",
+    )
+    parser.add_argument(
+        "-P", "--workers", type=int, metavar="N", help="process archives in N worker processes, 0 for one per CPU"
+    )
+    parser.add_argument(
+        "--ordered", action="store_true", help="keep input order of results when processing in parallel"
+    )
+    parser.add_argument("--cache", metavar="DB", help="persistent result cache file, created if missing")
+    parser.add_argument("--dedup", action="store_true", help="parse identical maps found in several archives only once")
+    parser.add_argument(
+        "--dedup-db", metavar="DB", help="persistent store of parsed maps for --dedup, created if missing"
+    )
+    parser.add_argument("--manifest", metavar="FILE", help="only process files added or changed since the last run")
+    parser.add_argument(
+        "--watch", type=float, metavar="SECONDS", help="keep rescanning and process new or changed files as they appear"
+    )
+    parser.add_argument(
+        "-k",
+        "--keep-going",
+        action="store_true",
+        help="report files and maps that fail to process and carry on with the rest",
+    )
+    parser.add_argument(
+        "--skip-list", metavar="FILE", help="skip files that failed in earlier runs until they change, implies -k"
+    )
+    parser.add_argument(
+        "--list", action="store_true", help="only list the maps of archives from their zip directory, much faster"
+    )
+    parser.add_argument(
+        "--memory-budget",
+        type=int,
+        metavar="MB",
+        help="scan untrusted archives: cap the size of the maps in flight and reject oversized or zip bomb-like maps",
+    )
+    parser.add_argument(
+        "--max-ratio", type=float, metavar="R", help="reject maps compressed better than R:1, 100 by default"
+    )
+    parser.add_argument("--stats", action="store_true", help="print per stage timings and throughput to stderr")
+    parser.add_argument("--slow", type=float, metavar="SECONDS", help="log files that take longer to process")
+    return parser
+
+
+class _Session:
+    """
+    Processing state of a command line run, shared by all its batches of files.
+    """
+
+    def __init__(self, parsed: "argparse.Namespace", worker_count: int, executor: Optional["Executor"] = None):
+        # pylint: disable=import-outside-toplevel
+        self.parsed = parsed
+        self.worker_count = worker_count
+        self.options = _process_options(parsed, executor)
+        self.output, self.list_output = _outputs(parsed.output)
+        self.run_stats: Optional["Stats"] = None
+        if parsed.stats or parsed.slow is not None:
+            from bspp.stats import Stats
+
+            self.run_stats = Stats(slow_threshold=parsed.slow)
+        self.manifest: Optional["Manifest"] = None
+        if parsed.manifest or parsed.watch:
+            from bspp.manifest import Manifest
+
+            self.manifest = Manifest(parsed.manifest)
+
+    def serve(self) -> None:
+        if self.parsed.stdin:
+            # a single process serves many requests, the results of a path are written before the next one is read
+            for path in stdin_paths():
+                self.run([path])
+                sys.stdout.flush()
+        else:
+            self.run(self.parsed.files)
+        self.close()
+
+    def run(self, files: List[str]) -> None:
+        from bspp.bspp import inventory  # pylint: disable=import-outside-toplevel
+
+        if self.parsed.list:
+            self.list_output(inventory(files, self.options.resilient or self.options.skip_list is not None))
+        elif self.manifest is not None:
+            self.run_changed(files, self.manifest)
+        else:
+            self.output_processed(files)
+
+    def run_changed(self, files: List[str], manifest: "Manifest") -> None:
+        from bspp.manifest import watch  # pylint: disable=import-outside-toplevel
+
+        deltas = watch(files, manifest, self.parsed.watch) if self.parsed.watch else iter([manifest.scan(files)])
+        try:
+            for delta in deltas:
+                log.info("%s", delta)
+                for removed in delta.removed:
+                    log.info("Removed: %s", removed)
+                if delta.updated:
+                    self.output_processed(delta.updated)
+                manifest.save()
+        except KeyboardInterrupt:
+            pass
+
+    def processed(self, files: Iterable[str]) -> Iterable[Union["PK3Entity", "MapEntities", "FileError"]]:
+        # pylint: disable=import-outside-toplevel
+        from bspp.bspp import process
+
+        results = process(files, self.options)
+        if self.worker_count <= 1:
+            return results
+        from bspp.parallel import prefetched
+
+        # keep the workers busy while the output is being formatted and written
+        return prefetched(results, self.worker_count * 4)
+
+    def output_processed(self, files: Iterable[str]) -> None:
+        from bspp import stats  # pylint: disable=import-outside-toplevel
+
+        if self.run_stats is None:
+            self.output(self.processed(files))
+        else:
+            with stats.collecting(self.run_stats):
+                stats.timed_output(self.output, self.processed(files))
+        if self.options.skip_list is not None:
+            self.options.skip_list.save()
+
+    def close(self) -> None:
+        options, run_stats = self.options, self.run_stats
+        if options.cache is not None:
+            evicted = options.cache.evict_stale()
+            log.info("%s, %d stale entries removed", options.cache, evicted)
+            options.cache.close()
+        if options.map_store is not None:
+            log.info("%s", options.map_store)
+            options.map_store.close()
+        if options.limits is None and (run_stats is None or not self.parsed.stats):
+            return
+        from bspp.limits import memory_report  # pylint: disable=import-outside-toplevel
+
+        if options.limits is not None:
+            log.info("%s", memory_report(options.parallel.budget))
+        if run_stats is not None and self.parsed.stats:
+            print(run_stats.summary(), file=sys.stderr)
+            print(memory_report(options.parallel.budget), file=sys.stderr)
+
+
+def _outputs(output_format: str) -> Tuple[Callable[[Iterable[Any]], None], Callable[[Iterable[Any]], None]]:
+    """
+    :return: the functions writing the processing results and the listings of `--list` in the format selected.
+    """
+    # pylint: disable=import-outside-toplevel
+    if output_format == "plain":
+        from bspp.out_plain_text import plain_listing, plain_text
+
+        return plain_text, plain_listing
+    from bspp.bspp import json_formatted, json_lines
+
+    output = json_lines if output_format == "jsonl" else json_formatted
+    return output, output
+
+
+def _process_options(parsed: "argparse.Namespace", executor: Optional["Executor"]) -> "ProcessOptions":
+    # pylint: disable=import-outside-toplevel
+    from dataclasses import replace
+    from bspp.bspp import Parallelism, ProcessOptions
+    from bspp.postprocess import pp_entity_filter
+
+    options = ProcessOptions(entity_filter=pp_entity_filter, resilient=parsed.keep_going)
+    if parsed.cache:
+        from bspp.cache import ResultCache
+
+        options = replace(options, cache=ResultCache(parsed.cache))
+    if parsed.dedup or parsed.dedup_db:
+        from bspp.dedup import MapStore
+
+        options = replace(options, map_store=MapStore(db_file=parsed.dedup_db))
+    if parsed.skip_list:
+        from bspp.errors import SkipList
+
+        options = replace(options, skip_list=SkipList(parsed.skip_list))
+    limits, budget = _limits(parsed)
+    return replace(options, limits=limits, parallel=Parallelism(parsed.workers, parsed.ordered, budget, executor))
+
+
+def _limits(parsed: "argparse.Namespace") -> Tuple[Optional["ResourceLimits"], Optional["MemoryBudget"]]:
+    """
+    :return: the limits of the governed mode and the memory budget of the maps in flight, if they were asked for.
+    """
+    if parsed.memory_budget is None and parsed.max_ratio is None:
+        return None, None
+    # pylint: disable=import-outside-toplevel
+    from dataclasses import replace
+    from bspp.limits import MemoryBudget, ResourceLimits
+
+    limits, budget = ResourceLimits(), None
+    if parsed.memory_budget is not None:
+        limits = replace(limits, memory_budget=parsed.memory_budget * 1024 * 1024)
+        budget = MemoryBudget(parsed.memory_budget * 1024 * 1024)
+    if parsed.max_ratio is not None:
+        limits = replace(limits, max_ratio=parsed.max_ratio)
+    return limits, budget
+
+
+if __name__ == "__main__":
+    main()
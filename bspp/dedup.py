@@ -0,0 +1,132 @@
+import json
+import logging
+from collections import OrderedDict
+from typing import Dict, Mapping, Optional, Sequence, Tuple
+from zipfile import ZipInfo
+
+from bspp.model import EntityFilter
+
+log = logging.getLogger(__name__)
+
+MapKey = Tuple[int, int, str]
+StoredMap = Tuple[bytes, Sequence[Mapping[str, str]]]
+
+
+class MapStore:
+    """
+    Content addressed store of parsed maps, so a BSP repackaged in many PK3 archives is only inflated, hashed and
+    parsed once. Maps are keyed by the CRC32 and uncompressed size of their zip entry, both known from the central
+    directory before decompression, and kept in an in-process LRU, optionally backed by a persistent SQLite store.
+    Stored entities are shared between the results of the copies.
+
+    When pickled to worker processes every process gets its own LRU over the same persistent store.
+    """
+
+    def __init__(self, max_entries: int = 1024, db_file: Optional[str] = None):
+        """
+        :param max_entries: number of maps kept in memory.
+        :param db_file: optional SQLite file to persist the maps in, created if missing.
+        """
+        if max_entries < 1:
+            raise ValueError(f"Invalid number of entries: {max_entries}")
+        self.max_entries = max_entries
+        self.db_file = db_file
+        self.hits = 0
+        self.misses = 0
+        self._lru: "OrderedDict[MapKey, StoredMap]" = OrderedDict()
+        self._db = None
+        if db_file:
+            import sqlite3  # pylint: disable=import-outside-toplevel
+
+            self._db = sqlite3.connect(db_file, timeout=30)
+            with self._db:
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS bsp_map ("
+                    " zip_crc INTEGER NOT NULL,"
+                    " size INTEGER NOT NULL,"
+                    " entity_filter TEXT NOT NULL,"
+                    " crc BLOB NOT NULL,"
+                    " entities TEXT NOT NULL,"
+                    " PRIMARY KEY (zip_crc, size, entity_filter))"
+                )
+
+    def __reduce__(self):
+        return _process_store, (self.max_entries, self.db_file)
+
+    def __enter__(self) -> "MapStore":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    @staticmethod
+    def key(zip_info: ZipInfo, entity_filter: Optional[EntityFilter] = None) -> MapKey:
+        return zip_info.CRC, zip_info.file_size, "" if entity_filter is None else entity_filter.cache_key()
+
+    def get(self, key: MapKey) -> Optional[StoredMap]:
+        """
+        Look up a parsed map.
+        :param key: key of the zip entry, see `key`.
+        :return: the bsp hash and the entities of the map, or `None` on a miss.
+        """
+        stored = self._lru.get(key)
+        if stored is not None:
+            self._lru.move_to_end(key)
+        elif self._db is not None:
+            row = self._db.execute(
+                "SELECT crc, entities FROM bsp_map WHERE zip_crc = ? AND size = ? AND entity_filter = ?", key
+            ).fetchone()
+            if row is not None:
+                stored = bytes(row[0]), json.loads(row[1])
+                self._remember(key, stored)
+        if stored is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return stored
+
+    def put(self, key: MapKey, crc: bytes, entities: Sequence[Mapping[str, str]]) -> None:
+        self._remember(key, (crc, entities))
+        if self._db is not None:
+            with self._db:
+                self._db.execute(
+                    "INSERT OR IGNORE INTO bsp_map (zip_crc, size, entity_filter, crc, entities) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    key + (crc, json.dumps([dict(e) for e in entities], separators=(",", ":"))),
+                )
+
+    def add_counts(self, hits: int, misses: int) -> None:
+        self.hits += hits
+        self.misses += misses
+
+    @property
+    def ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def _remember(self, key: MapKey, stored: StoredMap) -> None:
+        self._lru[key] = stored
+        self._lru.move_to_end(key)
+        if len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+    def __str__(self) -> str:
+        return f"dedup: {self.hits} of {self.hits + self.misses} maps reused ({self.ratio:.1%})"
+
+
+_process_stores: Dict[Tuple[int, Optional[str]], MapStore] = {}
+
+
+def _process_store(max_entries: int, db_file: Optional[str]) -> MapStore:
+    store = _process_stores.get((max_entries, db_file))
+    if store is None:
+        store = _process_stores[(max_entries, db_file)] = MapStore(max_entries, db_file)
+    return store
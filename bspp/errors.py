@@ -0,0 +1,115 @@
+import json
+import logging
+import os
+from typing import Dict, NamedTuple, Optional
+
+from bspp.model import FileError
+
+log = logging.getLogger(__name__)
+skip_list_version = 1
+
+
+class BSPError(Exception):
+    """
+    Invalid BSP data.
+    """
+
+
+class BadHeaderError(BSPError):
+    pass
+
+
+class BadVersionError(BSPError):
+    pass
+
+
+class BadLumpError(BSPError):
+    """
+    A lump directory entry pointing outside of the BSP.
+    """
+
+
+class ParseError(BSPError):
+    """
+    Malformed entities lump.
+    :param position: byte offset in the lump, or line number for `parse_entity_obj`.
+    """
+
+    def __init__(self, message: str, position: int):
+        super().__init__(message)
+        self.position = position
+
+
+class LimitExceededError(Exception):
+    """
+    A map rejected by the resource limits of the governed mode, see `ResourceLimits`.
+    """
+
+
+class SkippedFile(NamedTuple):
+    size: int
+    mtime_ns: int
+    error: str
+
+
+class SkipList:
+    """
+    Files that failed to process, skipped by later runs so known-bad files are not read and inflated again and again.
+    A file is retried once it changes, i.e. its size or modification time differ from when it failed.
+    Only files that failed as a whole are listed, a PK3 with some bad maps still has its good maps processed.
+    """
+
+    def __init__(self, skip_file: Optional[str] = None):
+        """
+        :param skip_file: JSON file to load the list from and save it to, `None` to keep it in memory only.
+        """
+        self.skip_file = skip_file
+        self.entries: Dict[str, SkippedFile] = {}
+        if skip_file and os.path.exists(skip_file):
+            with open(skip_file, "r", encoding="utf-8") as f:
+                self.entries = _entries_from_json(json.load(f))
+
+    def skips(self, file_name: str) -> bool:
+        path = os.path.abspath(file_name)
+        entry = self.entries.get(path)
+        if entry is None:
+            return False
+        try:
+            stat = os.stat(path)
+        except OSError:  # reported by the processing
+            return False
+        if (entry.size, entry.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+            log.info("Skipping %s, it failed before: %s", file_name, entry.error)
+            return True
+        del self.entries[path]
+        return False
+
+    def add(self, error: FileError) -> None:
+        path = os.path.abspath(error.file_name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return
+        self.entries[path] = SkippedFile(stat.st_size, stat.st_mtime_ns, f"{error.error_type}: {error.message}")
+
+    def save(self) -> None:
+        if not self.skip_file:
+            return
+        tmp_file = self.skip_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(_entries_to_json(self.entries), f, separators=(",", ":"))
+        os.replace(tmp_file, self.skip_file)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+def _entries_to_json(entries: Dict[str, SkippedFile]):
+    return dict(version=skip_list_version, entries=[[path, *entry] for path, entry in entries.items()])
+
+
+def _entries_from_json(o) -> Dict[str, SkippedFile]:
+    if o.get("version") != skip_list_version:
+        log.warning("Ignoring skip list of unknown version: %s", o.get("version"))
+        return {}
+    return {path: SkippedFile(size, mtime_ns, error) for path, size, mtime_ns, error in o["entries"]}
@@ -1,11 +1,42 @@
 import hashlib
 import struct
-from typing import List
-from zipfile import ZipFile, ZipInfo
+import time
+from functools import partial
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Iterator, Union
 
+if TYPE_CHECKING:
+    from typing import Protocol
+    from zipfile import ZipInfo
+    from bspp.zipdir import CentralDirEntry
 
-def pk3_hash_info(inf_list: List[ZipInfo]) -> bytes:
-    md4 = hashlib.new("md4")
+    class BinaryStream(Protocol):
+        """
+        Binary stream a BSP is read from: a file, a zip entry or an mmap, which is not an `IO[bytes]`.
+        """
+
+        def read(self, __size: int = ...) -> bytes: ...
+
+        def seek(self, __offset: int) -> Any: ...
+
+
+chunk_size = 256 * 1024
+
+
+def _md4_factory() -> Callable[[], Any]:
+    try:
+        hashlib.new("md4")
+        return partial(hashlib.new, "md4")
+    except ValueError:  # OpenSSL 3 without the legacy provider
+        from bspp.md4 import MD4  # pylint: disable=import-outside-toplevel
+
+        return MD4
+
+
+md4_new = _md4_factory()
+
+
+def pk3_hash_info(inf_list: Iterable[Union["ZipInfo", "CentralDirEntry"]]) -> bytes:
+    md4 = md4_new()
     for info in inf_list:
         if info.file_size > 0:
             md4.update(struct.pack("<I", info.CRC))
@@ -27,13 +58,63 @@ def pk3_hash(file_name: str) -> bytes:
     :param file_name: input pk3 file.
     :return: hash bytes -- that has a hex() method.
     """
+    from zipfile import ZipFile  # pylint: disable=import-outside-toplevel
+
     with ZipFile(file_name, "r") as zip_obj:
         return pk3_hash_info(zip_obj.infolist())
 
 
 def bsp_hash(b: bytes) -> bytes:
-    md4 = hashlib.new("md4")
-    md4.update(b)
-    digest = md4.digest()
-    # A553 4CD1
-    return _md4_to_32bit(digest)
+    return bsp_hash_chunks((b,))
+
+
+def bsp_hash_chunks(chunks: Iterable[bytes]) -> bytes:
+    """
+    Same as `bsp_hash`, for BSP data fed in chunks, so the whole file does not have to be in memory.
+    :param chunks: consecutive parts of the BSP.
+    :return: hash bytes.
+    """
+    hasher = BSPHasher()
+    for chunk in chunks:
+        hasher.update(chunk)
+    return hasher.digest()
+
+
+class BSPHasher:
+    """
+    Incremental `bsp_hash`, for when the BSP is consumed in a single streaming pass.
+    """
+
+    def __init__(self):
+        from bspp import stats  # pylint: disable=import-outside-toplevel
+
+        self._md4 = md4_new()
+        self._timed = stats.active() is not None
+        self._wall = self._cpu = 0.0
+        self._size = 0
+
+    def update(self, chunk: bytes) -> None:
+        if not self._timed:
+            self._md4.update(chunk)
+            return
+        wall, cpu = time.perf_counter(), time.thread_time()
+        self._md4.update(chunk)
+        self._wall += time.perf_counter() - wall
+        self._cpu += time.thread_time() - cpu
+        self._size += len(chunk)
+
+    def digest(self) -> bytes:
+        # A553 4CD1
+        digest = _md4_to_32bit(self._md4.digest())
+        if self._timed:
+            from bspp import stats  # pylint: disable=import-outside-toplevel
+
+            recorder = stats.active()
+            if recorder is not None:
+                # chunks are hashed interleaved with reading them, only the time spent hashing is recorded
+                recorder.record(stats.StageEvent("bsp_hash", self._wall, self._cpu, self._size, len(digest)))
+        return digest
+
+
+def read_chunks(stream: "BinaryStream", size: int = chunk_size) -> Iterator[bytes]:
+    return iter(partial(stream.read, size), b"")
@@ -0,0 +1,317 @@
+import json
+import logging
+import os
+import sqlite3
+from dataclasses import dataclass, fields
+from itertools import groupby
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple, Union
+
+from bspp.bspp import Parallelism, ProcessOptions, process
+from bspp.cache import Fingerprint
+from bspp.manifest import Delta, Manifest
+from bspp.model import FileError, Flags, JSONEncodingAwareClassEncoder, Map, MapEntities, PK3Entity
+from bspp.postprocess import pp_entity_filter, pp_map, pp_pk3
+
+log = logging.getLogger(__name__)
+flag_names = tuple(f.name for f in fields(Flags))
+
+
+@dataclass
+class IndexedMap:
+    pk3_name: str
+    pk3_crc: bytes
+    map: Map
+
+    def to_json(self):
+        return dict(pk3_name=self.pk3_name, pk3_crc=self.pk3_crc.hex(), map=self.map.to_json())
+
+
+class MapIndex:
+    """
+    Persistent SQLite index of `pp_map` summaries, searchable by game mode flags, item and weapon counts and title.
+    Updates are incremental: only archives added or changed since the last update are processed. Archives and maps that
+    fail are recorded, see `failures`, and only retried once they change.
+    """
+
+    def __init__(self, db_file: str):
+        self.db_file = db_file
+        self._db = sqlite3.connect(db_file)
+        self._db.execute("PRAGMA foreign_keys = ON")
+        with self._db:
+            self._db.executescript(
+                "CREATE TABLE IF NOT EXISTS pk3 ("
+                " id INTEGER PRIMARY KEY,"
+                " path TEXT NOT NULL UNIQUE,"
+                " size INTEGER NOT NULL,"
+                " mtime_ns INTEGER NOT NULL,"
+                " crc BLOB NOT NULL);"
+                "CREATE TABLE IF NOT EXISTS map ("
+                " id INTEGER PRIMARY KEY,"
+                " pk3_id INTEGER NOT NULL REFERENCES pk3 (id) ON DELETE CASCADE,"
+                " map_name TEXT NOT NULL,"
+                " map_title TEXT NOT NULL,"
+                " title_key TEXT NOT NULL,"
+                " crc BLOB NOT NULL,"
+                + "".join(f" {flag} INTEGER NOT NULL," for flag in flag_names)
+                + " pk3_crc BLOB NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS map_pk3 ON map (pk3_id);"
+                "CREATE INDEX IF NOT EXISTS map_title ON map (title_key);"
+                "CREATE TABLE IF NOT EXISTS map_count ("
+                " classname TEXT NOT NULL,"
+                " count INTEGER NOT NULL,"
+                " map_id INTEGER NOT NULL REFERENCES map (id) ON DELETE CASCADE,"
+                " PRIMARY KEY (classname, count, map_id)) WITHOUT ROWID;"
+                "CREATE INDEX IF NOT EXISTS map_count_map ON map_count (map_id);"
+                "CREATE TABLE IF NOT EXISTS failure ("
+                " pk3_id INTEGER NOT NULL REFERENCES pk3 (id) ON DELETE CASCADE,"
+                " map_name TEXT,"
+                " error_type TEXT NOT NULL,"
+                " message TEXT NOT NULL,"
+                " position INTEGER);"
+                "CREATE INDEX IF NOT EXISTS failure_pk3 ON failure (pk3_id);"
+            )
+
+    def __enter__(self) -> "MapIndex":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._db.close()
+
+    def update(self, files: Iterable[str], workers: Optional[int] = None) -> Delta:
+        """
+        Bring the index up to date, see `Manifest.scan` for how changes are detected. Each archive is committed on its
+        own, an interrupted update keeps the archives indexed so far.
+        :param files: files or folders to index, archives indexed earlier but not found here are removed.
+        :param workers: number of worker processes, see `process`.
+        :return: the changes applied.
+        """
+        manifest = Manifest()
+        manifest.entries = {
+            path: Fingerprint(path, size, mtime_ns, bytes(crc))
+            for path, size, mtime_ns, crc in self._db.execute("SELECT path, size, mtime_ns, crc FROM pk3")
+        }
+        indexed = dict(manifest.entries)
+        delta = manifest.scan(files)
+        updated = {os.path.abspath(file_name) for file_name in delta.updated}
+        with self._db:
+            for path in delta.removed:
+                self._db.execute("DELETE FROM pk3 WHERE path = ?", (path,))
+            for path, fingerprint in manifest.entries.items():
+                if indexed.get(path) != fingerprint and path not in updated:
+                    # touched archives only get their fingerprint updated
+                    self._put_pk3(fingerprint)
+        options = ProcessOptions(entity_filter=pp_entity_filter, resilient=True, parallel=Parallelism(workers))
+        results = process(delta.updated, options)
+        # the errors of the maps of an archive follow its result
+        for path, archive_results in groupby(results, lambda result: os.path.abspath(_result_path(result))):
+            with self._db:
+                self._add(manifest.entries[path], list(archive_results))
+        return delta
+
+    def _put_pk3(self, fingerprint: Fingerprint) -> int:
+        row = self._db.execute("SELECT id FROM pk3 WHERE path = ?", (fingerprint.path,)).fetchone()
+        if row is None:
+            cursor = self._db.execute(
+                "INSERT INTO pk3 (path, size, mtime_ns, crc) VALUES (?, ?, ?, ?)",
+                (fingerprint.path, fingerprint.size, fingerprint.mtime_ns, fingerprint.crc),
+            )
+            assert cursor.lastrowid is not None  # set by every INSERT
+            return cursor.lastrowid
+        self._db.execute(
+            "UPDATE pk3 SET size = ?, mtime_ns = ?, crc = ? WHERE id = ?",
+            (fingerprint.size, fingerprint.mtime_ns, fingerprint.crc, row[0]),
+        )
+        return row[0]
+
+    def _add(self, fingerprint: Fingerprint, results: List[Union[PK3Entity, MapEntities, FileError]]) -> None:
+        pk3_id = self._put_pk3(fingerprint)
+        self._db.execute("DELETE FROM map WHERE pk3_id = ?", (pk3_id,))
+        self._db.execute("DELETE FROM failure WHERE pk3_id = ?", (pk3_id,))
+        self._db.executemany(
+            "INSERT INTO failure (pk3_id, map_name, error_type, message, position) VALUES (?, ?, ?, ?, ?)",
+            (
+                (pk3_id, error.map_name, error.error_type, error.message, error.position)
+                for error in results
+                if isinstance(error, FileError)
+            ),
+        )
+        result = results[0]
+        if isinstance(result, FileError):
+            return
+        if isinstance(result, MapEntities):
+            pk3_crc, maps = b"", [pp_map(result)]
+        else:
+            pk3 = pp_pk3(result)
+            pk3_crc, maps = pk3.crc, pk3.maps
+        for m in maps:
+            map_id = self._db.execute(
+                f"INSERT INTO map (pk3_id, map_name, map_title, title_key, crc, {', '.join(flag_names)}, pk3_crc)"
+                f" VALUES (?, ?, ?, ?, ?, {', '.join('?' * len(flag_names))}, ?)",
+                (pk3_id, m.map_name, m.map_title, m.map_title.casefold(), m.crc)
+                + tuple(getattr(m.flags, flag) for flag in flag_names)
+                + (pk3_crc,),
+            ).lastrowid
+            self._db.executemany(
+                "INSERT INTO map_count (classname, count, map_id) VALUES (?, ?, ?)",
+                (
+                    (classname, count, map_id)
+                    for counts in (m.aggregated_items, m.aggregated_weapons)
+                    for classname, count in counts.items()
+                ),
+            )
+
+    def query(
+        self,
+        flags: Optional[Mapping[str, bool]] = None,
+        min_counts: Optional[Mapping[str, int]] = None,
+        max_counts: Optional[Mapping[str, int]] = None,
+        title_prefix: Optional[str] = None,
+    ) -> List[IndexedMap]:
+        """
+        Find maps, all conditions have to match.
+        :param flags: required values of `Flags`, e.g. `{"ctf_capable": True, "requires_ta": False}`.
+        :param min_counts: minimum number of items or weapons by classname, e.g. `{"weapon_railgun": 2}`.
+        :param max_counts: maximum number of items or weapons by classname, 0 for maps without any.
+        :param title_prefix: case insensitive prefix of the map title.
+        :return: matching maps ordered by title.
+        """
+        conditions: List[str] = []
+        params: List[Union[str, int]] = []
+        for flag, value in (flags or {}).items():
+            if flag not in flag_names:
+                raise ValueError(f"Unknown flag: {flag}")
+            conditions.append(f"m.{flag} = ?")
+            params.append(int(value))
+        for classname, count in (min_counts or {}).items():
+            if count > 0:
+                conditions.append("m.id IN (SELECT map_id FROM map_count WHERE classname = ? AND count >= ?)")
+                params.extend((classname, count))
+        for classname, count in (max_counts or {}).items():
+            conditions.append("m.id NOT IN (SELECT map_id FROM map_count WHERE classname = ? AND count > ?)")
+            params.extend((classname, count))
+        if title_prefix:
+            # a range instead of LIKE so the title index can be used
+            conditions.append("m.title_key >= ? AND m.title_key < ?")
+            params.extend((title_prefix.casefold(), title_prefix.casefold() + "\U0010ffff"))
+        rows = self._db.execute(
+            f"SELECT m.id, p.path, m.pk3_crc, m.map_title, m.map_name, m.crc, {', '.join(flag_names)}"
+            " FROM map m JOIN pk3 p ON p.id = m.pk3_id"
+            f" WHERE {' AND '.join(conditions) or '1'} ORDER BY m.title_key, m.map_name",
+            params,
+        ).fetchall()
+        counts = self._counts([row[0] for row in rows])
+        return [
+            IndexedMap(
+                path,
+                bytes(pk3_crc),
+                Map(
+                    map_title,
+                    map_name,
+                    bytes(crc),
+                    *_split_counts(counts.get(map_id, {})),
+                    Flags(*(bool(flag) for flag in flag_values)),
+                ),
+            )
+            for map_id, path, pk3_crc, map_title, map_name, crc, *flag_values in rows
+        ]
+
+    def failures(self) -> List[FileError]:
+        """
+        :return: the archives, and the maps of archives, that failed to be indexed.
+        """
+        return [
+            FileError(path, error_type, message, map_name, position)
+            for path, error_type, message, map_name, position in self._db.execute(
+                "SELECT p.path, f.error_type, f.message, f.map_name, f.position"
+                " FROM failure f JOIN pk3 p ON p.id = f.pk3_id ORDER BY p.path, f.map_name"
+            )
+        ]
+
+    def _counts(self, map_ids: List[int]) -> Dict[int, Dict[str, int]]:
+        counts: Dict[int, Dict[str, int]] = {}
+        # stay well below the default limit of host parameters
+        for i in range(0, len(map_ids), 500):
+            batch = map_ids[i : i + 500]
+            for map_id, classname, count in self._db.execute(
+                "SELECT map_id, classname, count FROM map_count" f" WHERE map_id IN ({', '.join('?' * len(batch))})",
+                batch,
+            ):
+                counts.setdefault(map_id, {})[classname] = count
+        return counts
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT count(*) FROM map").fetchone()[0]
+
+    def __str__(self) -> str:
+        return f"index {self.db_file}: {len(self)} maps"
+
+
+def _result_path(result: Union[PK3Entity, MapEntities, FileError]) -> str:
+    if isinstance(result, FileError):
+        return result.file_name
+    return result.pk3_name if isinstance(result, PK3Entity) else result.map_name
+
+
+def _split_counts(counts: Dict[str, int]) -> Tuple[Dict[str, int], Dict[str, int]]:
+    items = {classname: count for classname, count in counts.items() if not classname.startswith("weapon_")}
+    weapons = {classname: count for classname, count in counts.items() if classname.startswith("weapon_")}
+    return items, weapons
+
+
+def _parse_counts(specs: Iterable[str]) -> Dict[str, int]:
+    counts = {}
+    for spec in specs:
+        classname, _, count = spec.partition("=")
+        counts[classname] = int(count) if count else 1
+    return counts
+
+
+def main(args: Optional[List[str]] = None) -> None:
+    import argparse  # pylint: disable=import-outside-toplevel
+
+    parser = argparse.ArgumentParser(description="BSP map index")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+    build = commands.add_parser("build", help="create or update an index")
+    build.add_argument("index", metavar="DB", help="index file, created if missing")
+    build.add_argument("files", metavar="F", nargs="+", help="a .bsp or pk3 or file or folder to be indexed")
+    build.add_argument(
+        "-P", "--workers", type=int, metavar="N", help="process archives in N worker processes, 0 for one per CPU"
+    )
+    query = commands.add_parser("query", help="search an index")
+    query.add_argument("index", metavar="DB", help="index file")
+    query.add_argument("--flag", action="append", default=[], choices=flag_names, help="required flag")
+    query.add_argument("--no-flag", action="append", default=[], choices=flag_names, help="excluded flag")
+    query.add_argument(
+        "--min", action="append", default=[], metavar="CLASSNAME[=N]", help="at least N (default 1) of an item"
+    )
+    query.add_argument(
+        "--max", action="append", default=[], metavar="CLASSNAME[=N]", help="at most N (default 0) of an item"
+    )
+    query.add_argument("--title", metavar="PREFIX", help="map title prefix, case insensitive")
+    query.add_argument("-j", dest="json", action="store_true", help="JSON output")
+    parsed = parser.parse_args(args)
+
+    with MapIndex(parsed.index) as index:
+        if parsed.command == "build":
+            delta = index.update(parsed.files, parsed.workers)
+            log.info("%s, %s, %d failures", delta, index, len(index.failures()))
+            return
+        flags = {flag: True for flag in parsed.flag}
+        flags.update({flag: False for flag in parsed.no_flag})
+        max_counts = {classname: 0 for classname in parsed.max if "=" not in classname}
+        max_counts.update(_parse_counts(spec for spec in parsed.max if "=" in spec))
+        maps = index.query(flags, _parse_counts(parsed.min), max_counts, parsed.title)
+        if parsed.json:
+            print(json.dumps(maps, indent=True, cls=JSONEncodingAwareClassEncoder))
+        else:
+            for indexed in maps:
+                print(f"{indexed.pk3_name}\t{indexed.map.map_name}\t{indexed.map.map_title}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,4 @@
+# header of a Quake 3 BSP: magic, version and the directory of 17 lumps, an offset and a length each
+bsp_head = b"IBSP"
+bsp_version = b"\x2e\0\0\0"
+bsp_header_size = 0x90
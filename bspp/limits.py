@@ -0,0 +1,101 @@
+import sys
+from dataclasses import dataclass
+from typing import Optional, Tuple
+from zipfile import ZipInfo, ZIP_STORED
+
+from bspp.errors import LimitExceededError
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None  # type: ignore
+
+# peak memory of parsing an entities lump, relative to the size of the lump
+entity_overhead = 16
+
+
+@dataclass(frozen=True)
+class ResourceLimits:
+    """
+    Limits of the governed mode, to scan untrusted archives. Maps beyond the limits are rejected before anything is
+    inflated, a worker never holds more than the entities lump of one map and its parsed entities.
+    :param memory_budget: bytes of maps being processed at once across the workers, see `MemoryBudget`.
+    :param max_ratio: highest compression ratio of a map accepted, zip bombs compress much better than any BSP.
+    :param max_member_size: largest uncompressed map accepted, in bytes.
+    :param max_lump_size: largest entities lump accepted, in bytes.
+    """
+
+    memory_budget: Optional[int] = None
+    max_ratio: float = 100.0
+    max_member_size: int = 1024 * 1024 * 1024
+    max_lump_size: int = 32 * 1024 * 1024
+
+    @property
+    def lump_limit(self) -> int:
+        """
+        Largest entities lump accepted, small enough for its parsed entities to fit in the memory budget.
+        """
+        if self.memory_budget is None:
+            return self.max_lump_size
+        return min(self.max_lump_size, self.memory_budget // entity_overhead)
+
+    def check_member(self, info: ZipInfo) -> None:
+        """
+        Check the sizes claimed by the zip directory entry of a member, like a map, before it is inflated.
+        """
+        if info.file_size > self.max_member_size:
+            raise LimitExceededError(f"Member of {info.file_size} bytes is larger than {self.max_member_size}")
+        if info.compress_type == ZIP_STORED or not info.file_size:
+            return
+        if not info.compress_size or info.file_size / info.compress_size > self.max_ratio:
+            raise LimitExceededError(
+                f"Compression ratio of {info.file_size} / {info.compress_size} bytes is above {self.max_ratio:g}"
+            )
+
+
+class MemoryBudget:
+    """
+    Bytes of the work in flight, admitted by `executor_map` as long as they fit the limit. A single item larger than
+    the limit is still admitted, alone.
+    """
+
+    def __init__(self, limit: int):
+        if limit < 1:
+            raise ValueError(f"Invalid memory budget: {limit}")
+        self.limit = limit
+        self.in_flight = 0
+        self.peak = 0
+
+    def acquire(self, size: int) -> bool:
+        if self.in_flight and self.in_flight + size > self.limit:
+            return False
+        self.in_flight += size
+        self.peak = max(self.peak, self.in_flight)
+        return True
+
+    def release(self, size: int) -> None:
+        self.in_flight -= size
+
+
+def peak_rss() -> Tuple[Optional[int], Optional[int]]:
+    """
+    :return: the peak resident memory of this process and of its largest terminated child process, like a worker, in
+        bytes; `None` where unknown.
+    """
+    if resource is None:
+        return None, None
+    # kilobytes on Linux, bytes on macOS
+    unit = 1 if sys.platform == "darwin" else 1024
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit, children or None
+
+
+def memory_report(budget: Optional[MemoryBudget] = None) -> str:
+    own, worker = peak_rss()
+    mib = 1024 * 1024
+    parts = [f"Peak memory: {own / mib:.1f} MiB" if own is not None else "Peak memory: unknown"]
+    if worker is not None:
+        parts.append(f"largest worker {worker / mib:.1f} MiB")
+    if budget is not None:
+        parts.append(f"{budget.peak / mib:.1f} of {budget.limit / mib:.1f} MiB budget in flight at most")
+    return ", ".join(parts)
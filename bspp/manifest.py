@@ -0,0 +1,132 @@
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+from zipfile import BadZipFile
+
+from bspp.bspp import is_pk3, walk
+from bspp.cache import Fingerprint, ResultCache
+
+log = logging.getLogger(__name__)
+manifest_version = 1
+
+
+@dataclass
+class Delta:
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+
+    @property
+    def updated(self) -> List[str]:
+        return self.added + self.changed
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+    def __str__(self) -> str:
+        return f"{len(self.added)} added, {len(self.changed)} changed, {len(self.removed)} removed"
+
+
+class Manifest:
+    """
+    Record of the files seen by previous scans, so that later runs only have to process added or changed ones.
+    Each file is recorded with its size and modification time, PK3 archives with their pk3 checksum too. A rescan costs
+    a `stat` per file, the zip central directory is only read when these differ, and an archive that has only been
+    touched is not reported as changed.
+    """
+
+    def __init__(self, manifest_file: Optional[str] = None):
+        """
+        :param manifest_file: JSON file to load the manifest from and save it to, `None` to keep it in memory only.
+        """
+        self.manifest_file = manifest_file
+        self.entries: Dict[str, Fingerprint] = {}
+        if manifest_file and os.path.exists(manifest_file):
+            with open(manifest_file, "r", encoding="utf-8") as f:
+                self.entries = _entries_from_json(json.load(f))
+
+    def scan(self, files: Iterable[str]) -> Delta:
+        """
+        Compare files to the manifest and record their current state, see `save` to persist it.
+        :param files: files or folders, folders are walked recursively for .pk3 files just like by `process`.
+        :return: the changes since the previous scan.
+        """
+        delta = Delta()
+        seen = set()
+        for file_name in walk(files):
+            path = os.path.abspath(file_name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                log.warning("File not found: %s", file_name)
+                continue
+            seen.add(path)
+            entry = self.entries.get(path)
+            if entry and (entry.size, entry.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+                continue
+            fingerprint = _fingerprint(file_name, stat)
+            self.entries[path] = fingerprint
+            if entry is None:
+                delta.added.append(file_name)
+            elif not entry.crc or entry.crc != fingerprint.crc:
+                delta.changed.append(file_name)
+        for path in self.entries.keys() - seen:
+            del self.entries[path]
+            delta.removed.append(path)
+        return delta
+
+    def save(self) -> None:
+        if not self.manifest_file:
+            return
+        tmp_file = self.manifest_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(_entries_to_json(self.entries), f, separators=(",", ":"))
+        os.replace(tmp_file, self.manifest_file)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+def watch(
+    files: Iterable[str], manifest: Manifest, interval: float = 5.0, sleep: Callable[[float], None] = time.sleep
+) -> Iterator[Delta]:
+    """
+    Rescan files periodically, forever.
+    :param files: files or folders to watch.
+    :param manifest: state of the previous scan, an empty one reports every file as added first.
+    :param interval: seconds to wait between scans.
+    :param sleep: function to wait with.
+    :return: the non empty deltas as they are detected.
+    """
+    files = list(files)
+    while True:
+        delta = manifest.scan(files)
+        if delta:
+            yield delta
+        sleep(interval)
+
+
+def _fingerprint(file_name: str, stat: os.stat_result) -> Fingerprint:
+    if is_pk3(file_name):
+        try:
+            return ResultCache.fingerprint(file_name)
+        except (OSError, BadZipFile) as e:
+            log.warning("Can't read %s: %s", file_name, e)
+    return Fingerprint(os.path.abspath(file_name), stat.st_size, stat.st_mtime_ns, b"")
+
+
+def _entries_to_json(entries: Dict[str, Fingerprint]):
+    return dict(
+        version=manifest_version,
+        entries=[[e.path, e.size, e.mtime_ns, e.crc.hex()] for e in entries.values()],
+    )
+
+
+def _entries_from_json(o) -> Dict[str, Fingerprint]:
+    if o.get("version") != manifest_version:
+        log.warning("Ignoring manifest of unknown version: %s", o.get("version"))
+        return {}
+    return {path: Fingerprint(path, size, mtime_ns, bytes.fromhex(crc)) for path, size, mtime_ns, crc in o["entries"]}
@@ -0,0 +1,175 @@
+import struct
+from typing import Tuple
+
+_block_size = 64
+# blocks compressed per word unpacking, bounds the size of the unpacked tuple
+_blocks_per_batch = 1024
+_initial_state = (0x67452301, 0xEFCDAB89, 0x98BADCFE, 0x10325476)
+
+
+class MD4:
+    """
+    Pure Python MD4 (RFC 1320), a drop-in replacement of `hashlib.new("md4")` where OpenSSL does not provide it.
+    Input is unpacked to 32bit words for many blocks at once, and the rounds are unrolled over local variables, so there
+    is no per-byte work on the Python side.
+    """
+
+    name = "md4"
+    digest_size = 16
+    block_size = _block_size
+
+    def __init__(self, data: bytes = b""):
+        self._state: Tuple[int, int, int, int] = _initial_state
+        self._pending = b""
+        self._length = 0
+        if data:
+            self.update(data)
+
+    def update(self, data: bytes) -> None:
+        view = memoryview(data).cast("B")
+        self._length += len(view)
+        if self._pending:
+            missing = _block_size - len(self._pending)
+            self._pending += bytes(view[:missing])
+            view = view[missing:]
+            if len(self._pending) < _block_size:
+                return
+            self._state = _compress(self._state, self._pending, 1)
+            self._pending = b""
+        blocks = len(view) // _block_size
+        state = self._state
+        for first in range(0, blocks, _blocks_per_batch):
+            batch = min(blocks - first, _blocks_per_batch)
+            state = _compress(state, view[first * _block_size : (first + batch) * _block_size], batch)
+        self._state = state
+        self._pending = bytes(view[blocks * _block_size :])
+
+    def copy(self) -> "MD4":
+        clone = MD4()
+        clone._state, clone._pending, clone._length = self._state, self._pending, self._length
+        return clone
+
+    def digest(self) -> bytes:
+        bit_length = struct.pack("<Q", (self._length * 8) & 0xFFFFFFFFFFFFFFFF)
+        padding = b"\x80" + b"\0" * ((55 - self._length) % _block_size) + bit_length
+        tail = self._pending + padding
+        return struct.pack("<4I", *_compress(self._state, tail, len(tail) // _block_size))
+
+    def hexdigest(self) -> str:
+        return self.digest().hex()
+
+
+# the three rounds are unrolled over local variables for speed, a function call per step costs more than the step
+def _compress(  # pylint: disable=too-many-locals,too-many-statements
+    state: Tuple[int, int, int, int], data, blocks: int
+) -> Tuple[int, int, int, int]:
+    words = struct.unpack_from(f"<{blocks * 16}I", data)
+    a, b, c, d = state
+    for ofs in range(0, blocks * 16, 16):
+        x0, x1, x2, x3, x4, x5, x6, x7, x8, x9, x10, x11, x12, x13, x14, x15 = words[ofs : ofs + 16]
+        aa, bb, cc, dd = a, b, c, d
+
+        a = (a + (d ^ (b & (c ^ d))) + x0) & 0xFFFFFFFF
+        a = (a << 3 | a >> 29) & 0xFFFFFFFF
+        d = (d + (c ^ (a & (b ^ c))) + x1) & 0xFFFFFFFF
+        d = (d << 7 | d >> 25) & 0xFFFFFFFF
+        c = (c + (b ^ (d & (a ^ b))) + x2) & 0xFFFFFFFF
+        c = (c << 11 | c >> 21) & 0xFFFFFFFF
+        b = (b + (a ^ (c & (d ^ a))) + x3) & 0xFFFFFFFF
+        b = (b << 19 | b >> 13) & 0xFFFFFFFF
+        a = (a + (d ^ (b & (c ^ d))) + x4) & 0xFFFFFFFF
+        a = (a << 3 | a >> 29) & 0xFFFFFFFF
+        d = (d + (c ^ (a & (b ^ c))) + x5) & 0xFFFFFFFF
+        d = (d << 7 | d >> 25) & 0xFFFFFFFF
+        c = (c + (b ^ (d & (a ^ b))) + x6) & 0xFFFFFFFF
+        c = (c << 11 | c >> 21) & 0xFFFFFFFF
+        b = (b + (a ^ (c & (d ^ a))) + x7) & 0xFFFFFFFF
+        b = (b << 19 | b >> 13) & 0xFFFFFFFF
+        a = (a + (d ^ (b & (c ^ d))) + x8) & 0xFFFFFFFF
+        a = (a << 3 | a >> 29) & 0xFFFFFFFF
+        d = (d + (c ^ (a & (b ^ c))) + x9) & 0xFFFFFFFF
+        d = (d << 7 | d >> 25) & 0xFFFFFFFF
+        c = (c + (b ^ (d & (a ^ b))) + x10) & 0xFFFFFFFF
+        c = (c << 11 | c >> 21) & 0xFFFFFFFF
+        b = (b + (a ^ (c & (d ^ a))) + x11) & 0xFFFFFFFF
+        b = (b << 19 | b >> 13) & 0xFFFFFFFF
+        a = (a + (d ^ (b & (c ^ d))) + x12) & 0xFFFFFFFF
+        a = (a << 3 | a >> 29) & 0xFFFFFFFF
+        d = (d + (c ^ (a & (b ^ c))) + x13) & 0xFFFFFFFF
+        d = (d << 7 | d >> 25) & 0xFFFFFFFF
+        c = (c + (b ^ (d & (a ^ b))) + x14) & 0xFFFFFFFF
+        c = (c << 11 | c >> 21) & 0xFFFFFFFF
+        b = (b + (a ^ (c & (d ^ a))) + x15) & 0xFFFFFFFF
+        b = (b << 19 | b >> 13) & 0xFFFFFFFF
+
+        a = (a + ((b & (c | d)) | (c & d)) + x0 + 0x5A827999) & 0xFFFFFFFF
+        a = (a << 3 | a >> 29) & 0xFFFFFFFF
+        d = (d + ((a & (b | c)) | (b & c)) + x4 + 0x5A827999) & 0xFFFFFFFF
+        d = (d << 5 | d >> 27) & 0xFFFFFFFF
+        c = (c + ((d & (a | b)) | (a & b)) + x8 + 0x5A827999) & 0xFFFFFFFF
+        c = (c << 9 | c >> 23) & 0xFFFFFFFF
+        b = (b + ((c & (d | a)) | (d & a)) + x12 + 0x5A827999) & 0xFFFFFFFF
+        b = (b << 13 | b >> 19) & 0xFFFFFFFF
+        a = (a + ((b & (c | d)) | (c & d)) + x1 + 0x5A827999) & 0xFFFFFFFF
+        a = (a << 3 | a >> 29) & 0xFFFFFFFF
+        d = (d + ((a & (b | c)) | (b & c)) + x5 + 0x5A827999) & 0xFFFFFFFF
+        d = (d << 5 | d >> 27) & 0xFFFFFFFF
+        c = (c + ((d & (a | b)) | (a & b)) + x9 + 0x5A827999) & 0xFFFFFFFF
+        c = (c << 9 | c >> 23) & 0xFFFFFFFF
+        b = (b + ((c & (d | a)) | (d & a)) + x13 + 0x5A827999) & 0xFFFFFFFF
+        b = (b << 13 | b >> 19) & 0xFFFFFFFF
+        a = (a + ((b & (c | d)) | (c & d)) + x2 + 0x5A827999) & 0xFFFFFFFF
+        a = (a << 3 | a >> 29) & 0xFFFFFFFF
+        d = (d + ((a & (b | c)) | (b & c)) + x6 + 0x5A827999) & 0xFFFFFFFF
+        d = (d << 5 | d >> 27) & 0xFFFFFFFF
+        c = (c + ((d & (a | b)) | (a & b)) + x10 + 0x5A827999) & 0xFFFFFFFF
+        c = (c << 9 | c >> 23) & 0xFFFFFFFF
+        b = (b + ((c & (d | a)) | (d & a)) + x14 + 0x5A827999) & 0xFFFFFFFF
+        b = (b << 13 | b >> 19) & 0xFFFFFFFF
+        a = (a + ((b & (c | d)) | (c & d)) + x3 + 0x5A827999) & 0xFFFFFFFF
+        a = (a << 3 | a >> 29) & 0xFFFFFFFF
+        d = (d + ((a & (b | c)) | (b & c)) + x7 + 0x5A827999) & 0xFFFFFFFF
+        d = (d << 5 | d >> 27) & 0xFFFFFFFF
+        c = (c + ((d & (a | b)) | (a & b)) + x11 + 0x5A827999) & 0xFFFFFFFF
+        c = (c << 9 | c >> 23) & 0xFFFFFFFF
+        b = (b + ((c & (d | a)) | (d & a)) + x15 + 0x5A827999) & 0xFFFFFFFF
+        b = (b << 13 | b >> 19) & 0xFFFFFFFF
+
+        a = (a + (b ^ c ^ d) + x0 + 0x6ED9EBA1) & 0xFFFFFFFF
+        a = (a << 3 | a >> 29) & 0xFFFFFFFF
+        d = (d + (a ^ b ^ c) + x8 + 0x6ED9EBA1) & 0xFFFFFFFF
+        d = (d << 9 | d >> 23) & 0xFFFFFFFF
+        c = (c + (d ^ a ^ b) + x4 + 0x6ED9EBA1) & 0xFFFFFFFF
+        c = (c << 11 | c >> 21) & 0xFFFFFFFF
+        b = (b + (c ^ d ^ a) + x12 + 0x6ED9EBA1) & 0xFFFFFFFF
+        b = (b << 15 | b >> 17) & 0xFFFFFFFF
+        a = (a + (b ^ c ^ d) + x2 + 0x6ED9EBA1) & 0xFFFFFFFF
+        a = (a << 3 | a >> 29) & 0xFFFFFFFF
+        d = (d + (a ^ b ^ c) + x10 + 0x6ED9EBA1) & 0xFFFFFFFF
+        d = (d << 9 | d >> 23) & 0xFFFFFFFF
+        c = (c + (d ^ a ^ b) + x6 + 0x6ED9EBA1) & 0xFFFFFFFF
+        c = (c << 11 | c >> 21) & 0xFFFFFFFF
+        b = (b + (c ^ d ^ a) + x14 + 0x6ED9EBA1) & 0xFFFFFFFF
+        b = (b << 15 | b >> 17) & 0xFFFFFFFF
+        a = (a + (b ^ c ^ d) + x1 + 0x6ED9EBA1) & 0xFFFFFFFF
+        a = (a << 3 | a >> 29) & 0xFFFFFFFF
+        d = (d + (a ^ b ^ c) + x9 + 0x6ED9EBA1) & 0xFFFFFFFF
+        d = (d << 9 | d >> 23) & 0xFFFFFFFF
+        c = (c + (d ^ a ^ b) + x5 + 0x6ED9EBA1) & 0xFFFFFFFF
+        c = (c << 11 | c >> 21) & 0xFFFFFFFF
+        b = (b + (c ^ d ^ a) + x13 + 0x6ED9EBA1) & 0xFFFFFFFF
+        b = (b << 15 | b >> 17) & 0xFFFFFFFF
+        a = (a + (b ^ c ^ d) + x3 + 0x6ED9EBA1) & 0xFFFFFFFF
+        a = (a << 3 | a >> 29) & 0xFFFFFFFF
+        d = (d + (a ^ b ^ c) + x11 + 0x6ED9EBA1) & 0xFFFFFFFF
+        d = (d << 9 | d >> 23) & 0xFFFFFFFF
+        c = (c + (d ^ a ^ b) + x7 + 0x6ED9EBA1) & 0xFFFFFFFF
+        c = (c << 11 | c >> 21) & 0xFFFFFFFF
+        b = (b + (c ^ d ^ a) + x15 + 0x6ED9EBA1) & 0xFFFFFFFF
+        b = (b << 15 | b >> 17) & 0xFFFFFFFF
+
+        a = (a + aa) & 0xFFFFFFFF
+        b = (b + bb) & 0xFFFFFFFF
+        c = (c + cc) & 0xFFFFFFFF
+        d = (d + dd) & 0xFFFFFFFF
+    return a, b, c, d
@@ -1,13 +1,145 @@
-from dataclasses import dataclass
-from json import JSONEncoder
-from typing import Dict, Any, List
+from array import array
+from dataclasses import dataclass, replace
+from json import JSONEncoder, dumps
+from typing import Dict, Any, List, FrozenSet, Iterable, Iterator, Mapping, Optional, Sequence, Tuple, Union, overload
+
+
+class StringTable:
+    """
+    Interned strings with dense integer ids, meant to be shared by many `EntityTable`s.
+    """
+
+    __slots__ = ("strings", "ids")
+
+    def __init__(self) -> None:
+        self.strings: List[str] = []
+        self.ids: Dict[str, int] = {}
+
+    def intern(self, string: str) -> int:
+        string_id = self.ids.get(string)
+        if string_id is None:
+            string_id = self.ids[string] = len(self.strings)
+            self.strings.append(string)
+        return string_id
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+
+class EntityTable(Sequence[Mapping[str, str]]):
+    """
+    Compact, read-only columnar storage of the entities of a map.
+    Keys and classnames are interned in a `StringTable`, values are concatenated into a single string with an offset
+    array, so an entity costs a few array slots instead of a dictionary and a string object per key and value.
+    Entities are exposed as read-only mapping views.
+    """
+
+    __slots__ = ("strings", "_entity_ends", "_classname_ids", "_key_ids", "_value_ends", "_values")
+
+    def __init__(self, entities: Iterable[Mapping[str, str]], strings: Optional[StringTable] = None):
+        self.strings = StringTable() if strings is None else strings
+        self._entity_ends = array("I")  # end of the pairs of each entity
+        self._classname_ids = array("I")
+        self._key_ids = array("I")
+        self._value_ends = array("I")  # end of each value in _values
+        values: List[str] = []
+        value_end = 0
+        intern = self.strings.intern
+        for entity in entities:
+            for key, value in entity.items():
+                self._key_ids.append(intern(key))
+                value_end += len(value)
+                self._value_ends.append(value_end)
+                values.append(value)
+            self._entity_ends.append(len(self._key_ids))
+            self._classname_ids.append(intern(entity["classname"]))
+        self._values = "".join(values)
+
+    def __len__(self) -> int:
+        return len(self._entity_ends)
+
+    @overload
+    def __getitem__(self, index: int) -> "EntityView": ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List["EntityView"]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union["EntityView", List["EntityView"]]:
+        if isinstance(index, slice):
+            return [EntityView(self, i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("entity index out of range")
+        return EntityView(self, index)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def classnames(self) -> Iterator[str]:
+        strings = self.strings.strings
+        return (strings[classname_id] for classname_id in self._classname_ids)
+
+    def entity_keys(self, index: int) -> List[str]:
+        strings = self.strings.strings
+        return list(dict.fromkeys(strings[self._key_ids[pair]] for pair in self._pair_range(index)))
+
+    def entity_value(self, index: int, key: str) -> Optional[str]:
+        key_id = self.strings.ids.get(key)
+        if key_id is not None:
+            for pair in reversed(self._pair_range(index)):  # the last one wins, like with dictionaries
+                if self._key_ids[pair] == key_id:
+                    return self._values[self._value_ends[pair - 1] if pair else 0 : self._value_ends[pair]]
+        return None
+
+    def _pair_range(self, index: int) -> range:
+        return range(self._entity_ends[index - 1] if index else 0, self._entity_ends[index])
+
+
+class EntityView(Mapping[str, str]):
+    __slots__ = ("_table", "_index")
+
+    def __init__(self, table: EntityTable, index: int):
+        self._table = table
+        self._index = index
+
+    def __getitem__(self, key: str) -> str:
+        value = self._table.entity_value(self._index, key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._table.entity_keys(self._index))
+
+    def __len__(self) -> int:
+        return len(self._table.entity_keys(self._index))
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
 
 
 @dataclass
 class MapEntities:
     map_name: str
     crc: bytes
-    entities: List[Dict[str, str]]
+    entities: Sequence[Mapping[str, str]]
+
+    def compacted(self, strings: Optional[StringTable] = None) -> "MapEntities":
+        """
+        Copy of these map entities stored in an `EntityTable`.
+        :param strings: string table to share between maps.
+        """
+        return replace(self, entities=EntityTable(self.entities, strings))
+
+    def to_json(self):
+        return dict(map_name=self.map_name, crc=self.crc.hex(), entities=[dict(e) for e in self.entities])
+
+    @staticmethod
+    def from_json(obj: Dict[str, Any]) -> "MapEntities":
+        return MapEntities(obj["map_name"], bytes.fromhex(obj["crc"]), obj["entities"])
 
 
 @dataclass
@@ -16,6 +148,43 @@ class PK3Entity:
     crc: bytes
     map_entities: List[MapEntities]
 
+    def compacted(self, strings: Optional[StringTable] = None) -> "PK3Entity":
+        return replace(self, map_entities=[m.compacted(strings) for m in self.map_entities])
+
+    def to_json(self):
+        return dict(pk3_name=self.pk3_name, crc=self.crc.hex(), map_entities=[m.to_json() for m in self.map_entities])
+
+    @staticmethod
+    def from_json(obj: Dict[str, Any]) -> "PK3Entity":
+        return PK3Entity(
+            obj["pk3_name"], bytes.fromhex(obj["crc"]), [MapEntities.from_json(m) for m in obj["map_entities"]]
+        )
+
+
+@dataclass(frozen=True)
+class EntityFilter:
+    """
+    Projection of the entities to parse: entities are kept when their classname is listed or starts with one of the
+    prefixes -- all of them when neither is given, and only the listed keys of them are kept besides the classname.
+    """
+
+    classnames: Optional[FrozenSet[str]] = None
+    classname_prefixes: Tuple[str, ...] = ()
+    keys: Optional[FrozenSet[str]] = None
+
+    def accepts(self, classname: str) -> bool:
+        if self.classnames is None and not self.classname_prefixes:
+            return True
+        if self.classnames is not None and classname in self.classnames:
+            return True
+        return classname.startswith(self.classname_prefixes)
+
+    def cache_key(self) -> str:
+        def sorted_or_none(values: Optional[FrozenSet[str]]) -> Optional[List[str]]:
+            return None if values is None else sorted(values)
+
+        return dumps([sorted_or_none(self.classnames), list(self.classname_prefixes), sorted_or_none(self.keys)])
+
 
 @dataclass
 class Flags:
@@ -65,6 +234,51 @@ class PK3:
         return dict(pk3_name=self.pk3_name, crc=self.crc.hex(), maps=[m.to_json() for m in self.maps])
 
 
+@dataclass
+class FileError:
+    """
+    A file, or a map of a PK3 when `map_name` is set, that failed to process.
+    """
+
+    file_name: str
+    error_type: str
+    message: str
+    map_name: Optional[str] = None
+    position: Optional[int] = None
+
+    @staticmethod
+    def of(file_name: str, error: Exception, map_name: Optional[str] = None) -> "FileError":
+        return FileError(file_name, type(error).__name__, str(error), map_name, getattr(error, "position", None))
+
+    def to_json(self):
+        return dict(
+            file_name=self.file_name,
+            error_type=self.error_type,
+            message=self.message,
+            map_name=self.map_name,
+            position=self.position,
+        )
+
+
+@dataclass
+class MapListing:
+    map_name: str
+    size: int
+
+    def to_json(self):
+        return dict(map_name=self.map_name, size=self.size)
+
+
+@dataclass
+class PK3Listing:
+    pk3_name: str
+    crc: bytes
+    maps: List[MapListing]
+
+    def to_json(self):
+        return dict(pk3_name=self.pk3_name, crc=self.crc.hex(), maps=[m.to_json() for m in self.maps])
+
+
 class JSONEncodingAwareClassEncoder(JSONEncoder):
     def default(self, o: Any) -> Any:
         if callable(getattr(o, "to_json", None)):
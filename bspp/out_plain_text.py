@@ -1,8 +1,11 @@
+import io
 import logging
 import struct
-from typing import Union, Iterable, Tuple, Dict, Optional, Any
+import sys
+import threading
+from typing import IO, Union, Iterable, NamedTuple, Tuple, Dict, Optional
 
-from bspp.model import PK3Entity, MapEntities, Map
+from bspp.model import PK3Entity, MapEntities, Map, PK3Listing, FileError
 from bspp.postprocess import pp_map
 
 log = logging.getLogger(__name__)
@@ -73,72 +76,160 @@ def translate_names(class_to_name: Dict[str, str], objects: Dict[str, int]) -> I
         yield name, count
 
 
-def plain_text(entity_containers: Iterable[Union[MapEntities, PK3Entity]]) -> None:
-    flag_to_name = {
-        "ctf_capable": "CTF capable",
-        "requires_ta": "Requires team arena",
-        "ctf_1f_capable": "One flag CTF capable",
-        "overload_capable": "Overload capable",
-        "harvester_capable": "Harvester capable",
-    }
-
-    def longest_value(*dicts: Dict[Any, str]) -> int:
-        max_v_len = 0
-        for d in dicts:
-            for v in d.values():
-                max_v_len = max(max_v_len, len(v))
-        return max_v_len
-
-    def print_class_counts(justification: int, entries: Iterable[Tuple[str, int]], indent: str = "") -> None:
-        for name, count in entries:
-            print(f"{indent}{name.ljust(justification, '.')}", ": ×%d" % count)
-
-    def print_flag(flag: bool, dict_key: str, indent: str = "") -> None:
-        if flag:
-            name = flag_to_name[dict_key]
-            print(f"{indent}{name.ljust(class_name_pad, '.')}", ": Yes")
-
-    def section_title(title: str, indent: str = "", underline: str = "-"):
-        print(f"{indent}{title}")
-        print(f"{indent}{underline * len(title)}")
-        print()
-
-    class_name_pad = longest_value(_weapon_to_name, _item_to_name, flag_to_name)
-
-    def print_map_entity(map_data: Map, indent: str = ""):
-        section_title(map_data.map_name, indent, "=")
-        print(f"{indent}Map name: {map_data.map_title}")
-        print(f"{indent}CRC:", map_data.crc.hex(), f"(sv_mapChecksum {struct.unpack('>i', map_data.crc)[0]})")
-        print()
-
-        section_title("Items", indent)
-        print_class_counts(class_name_pad, translate_names(_item_to_name, map_data.aggregated_items), indent)
-        print()
-
-        section_title("Weapons", indent)
-        print_class_counts(class_name_pad, translate_names(_weapon_to_name, map_data.aggregated_weapons), indent)
-        print()
-
-        f = map_data.flags
-
-        if f.ctf_capable or f.overload_capable or f.harvester_capable or f.ctf_1f_capable or f.requires_ta:
-            section_title("Properties", indent)
-            print_flag(f.requires_ta, "requires_ta", indent)
-            print_flag(f.ctf_capable, "ctf_capable", indent)
-            print_flag(f.ctf_1f_capable, "ctf_1f_capable", indent)
-            print_flag(f.overload_capable, "overload_capable", indent)
-            print_flag(f.harvester_capable, "harvester_capable", indent)
-            print()
-
-    def print_pk3_entity(e: PK3Entity):
-        section_title(e.pk3_name)
-        print("CRC: ", e.crc.hex(), f"(sv_currentPak: {struct.unpack('>i', e.crc)[0]})")
-        print()
+_flag_to_name = {
+    "ctf_capable": "CTF capable",
+    "requires_ta": "Requires team arena",
+    "ctf_1f_capable": "One flag CTF capable",
+    "overload_capable": "Overload capable",
+    "harvester_capable": "Harvester capable",
+}
+# the order flags are listed in
+_flag_order = ("requires_ta", "ctf_capable", "ctf_1f_capable", "overload_capable", "harvester_capable")
+
+
+class _Labels(NamedTuple):
+    """
+    Display names padded to the same width, and the lines of the flags, by class name or flag.
+    """
+
+    items: Dict[str, str]
+    weapons: Dict[str, str]
+    flag_lines: Dict[str, str]
+
+    @staticmethod
+    def padded() -> "_Labels":
+        pad = max(len(name) for names in (_weapon_to_name, _item_to_name, _flag_to_name) for name in names.values())
+        return _Labels(
+            {class_name: name.ljust(pad, ".") for class_name, name in _item_to_name.items()},
+            {class_name: name.ljust(pad, ".") for class_name, name in _weapon_to_name.items()},
+            {flag: f"{_flag_to_name[flag].ljust(pad, '.')} : Yes\n" for flag in _flag_order},
+        )
+
+
+class PlainTextRenderer:
+    """
+    Streaming plain text renderer. Display names are padded once, each block is assembled in a reusable buffer and
+    written to the sink in large batches: when the buffer is full, or when output has been held back for too long --
+    by a timer, as the next result may take longer than that to arrive.
+    """
+
+    def __init__(self, out: Optional[IO[str]] = None, buffer_size: int = 64 * 1024, max_delay: float = 1.0):
+        """
+        :param out: text stream to write to, standard output by default.
+        :param buffer_size: number of characters collected before they are written.
+        :param max_delay: seconds output is held back at most, so a slow scan still shows progress.
+        """
+        self.out = out
+        self.buffer_size = buffer_size
+        self.max_delay = max_delay
+        self._labels = _Labels.padded()
+        self._buffer = io.StringIO()
+        self._timer: Optional[threading.Timer] = None
+        # the timer flushes from its own thread
+        self._lock = threading.RLock()
+
+    def write(self, entity_containers: Iterable[Union[MapEntities, PK3Entity, PK3Listing, FileError]]) -> None:
+        try:
+            for entity_container in entity_containers:
+                with self._lock:
+                    self.render(entity_container)
+                    if self._buffer.tell() >= self.buffer_size or self.max_delay <= 0:
+                        self.flush()
+        finally:
+            timer = self._timer
+            self.flush()
+            if timer is not None:
+                timer.join()
+
+    def render(self, entity_container: Union[MapEntities, PK3Entity, PK3Listing, FileError]) -> None:
+        """
+        Render a result into the buffer.
+        """
+        with self._lock:
+            held = self._buffer.tell()
+            if isinstance(entity_container, MapEntities):
+                self._render_map(pp_map(entity_container), "")
+            elif isinstance(entity_container, FileError):
+                self._render_error(entity_container)
+            elif isinstance(entity_container, PK3Listing):
+                self._render_listing(entity_container)
+            else:
+                self._render_pk3(entity_container)
+            if not held and self.max_delay > 0:
+                # written by then, even if the next result takes longer to arrive
+                self._timer = threading.Timer(self.max_delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            out = self.out or sys.stdout
+            if self._buffer.tell():
+                out.write(self._buffer.getvalue())
+                self._buffer.seek(0)
+                self._buffer.truncate()
+            out.flush()
+
+    def _section_title(self, title: str, indent: str = "", underline: str = "-") -> None:
+        self._buffer.write(f"{indent}{title}\n{indent}{underline * len(title)}\n\n")
+
+    def _render_counts(self, padded: Dict[str, str], counts: Dict[str, int], indent: str) -> None:
+        write = self._buffer.write
+        for class_name, count in counts.items():
+            name = padded.get(class_name)
+            if name is None:
+                log.warning("Unknown class: %s", class_name)
+                continue
+            write(f"{indent}{name} : ×{count}\n")
+
+    def _render_map(self, map_data: Map, indent: str) -> None:
+        write = self._buffer.write
+        self._section_title(map_data.map_name, indent, "=")
+        write(
+            f"{indent}Map name: {map_data.map_title}\n"
+            f"{indent}CRC: {map_data.crc.hex()} (sv_mapChecksum {struct.unpack('>i', map_data.crc)[0]})\n\n"
+        )
+        self._section_title("Items", indent)
+        self._render_counts(self._labels.items, map_data.aggregated_items, indent)
+        write("\n")
+        self._section_title("Weapons", indent)
+        self._render_counts(self._labels.weapons, map_data.aggregated_weapons, indent)
+        write("\n")
+        flags = [flag for flag in _flag_order if getattr(map_data.flags, flag)]
+        if flags:
+            self._section_title("Properties", indent)
+            for flag in flags:
+                write(indent)
+                write(self._labels.flag_lines[flag])
+            write("\n")
+
+    def _render_pk3(self, e: PK3Entity) -> None:
+        self._section_title(e.pk3_name)
+        self._buffer.write(f"CRC:  {e.crc.hex()} (sv_currentPak: {struct.unpack('>i', e.crc)[0]})\n\n")
         for map_entity in e.map_entities:
-            print_map_entity(pp_map(map_entity), "  ")
+            self._render_map(pp_map(map_entity), "  ")
+
+    def _render_listing(self, listing: PK3Listing) -> None:
+        write = self._buffer.write
+        write(f"{listing.pk3_name}\nCRC:  {listing.crc.hex()} (sv_currentPak: {struct.unpack('>i', listing.crc)[0]})\n")
+        name_pad = max((len(m.map_name) for m in listing.maps), default=0)
+        for m in listing.maps:
+            write(f"  {m.map_name.ljust(name_pad, '.')} : {m.size} bytes\n")
+        write("\n")
+
+    def _render_error(self, e: FileError) -> None:
+        name = f"{e.file_name}: {e.map_name}" if e.map_name else e.file_name
+        self._buffer.write(f"Failed: {name}\n  {e.error_type}: {e.message}\n\n")
+
+
+def plain_text(
+    entity_containers: Iterable[Union[MapEntities, PK3Entity, FileError]], out: Optional[IO[str]] = None
+) -> None:
+    PlainTextRenderer(out).write(entity_containers)
+
 
-    for entity_container in entity_containers:
-        if isinstance(entity_container, MapEntities):
-            print_map_entity(pp_map(entity_container))
-        else:
-            print_pk3_entity(entity_container)
+def plain_listing(listings: Iterable[Union[PK3Listing, FileError]], out: Optional[IO[str]] = None) -> None:
+    PlainTextRenderer(out).write(listings)
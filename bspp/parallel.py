@@ -0,0 +1,158 @@
+import threading
+from concurrent.futures import Executor, Future, FIRST_COMPLETED, wait
+from dataclasses import dataclass
+from queue import Full, Queue
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+if TYPE_CHECKING:
+    from bspp.limits import MemoryBudget
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+@dataclass(frozen=True)
+class Schedule:
+    """
+    How the items of `pool_map` and `executor_map` are fed to the executor and their results yielded.
+    :param ordered: yield results in input order instead of completion order.
+    :param submit: custom submission of an item, it may return an already completed future to bypass the pool.
+    :param budget: also hold back items while their weights in flight would exceed the budget.
+    :param weight: weight of an item in the budget, like its size in bytes.
+    """
+
+    ordered: bool = False
+    submit: Optional[Callable[[Executor, Any], Future]] = None
+    budget: Optional["MemoryBudget"] = None
+    weight: Optional[Callable[[Any], int]] = None
+
+
+def pool_map(
+    fn: Callable[[T], R],
+    items: Iterable[T],
+    workers: int,
+    schedule: Schedule = Schedule(),
+    backlog: Optional[int] = None,
+) -> Iterator[R]:
+    """
+    Lazy, bounded alternative of `Executor.map` backed by a process pool.
+    Items are pulled from the input only when there is room in the backlog, so neither the input nor the results are
+    ever materialized as a whole.
+    :param fn: picklable function to call with each item.
+    :param items: input items, consumed lazily.
+    :param workers: number of worker processes.
+    :param schedule: ordering, custom submission and memory budget of the items.
+    :param backlog: maximum number of submitted but not yet yielded items, twice the workers by default.
+    :return: results as they become available.
+    """
+    # multiprocessing is only imported when a pool is needed
+    from concurrent.futures import ProcessPoolExecutor  # pylint: disable=import-outside-toplevel
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor_map(executor, fn, items, backlog or workers * 2, schedule)
+
+
+def completed(result: R) -> Future:
+    future: Future = Future()
+    future.set_result(result)
+    return future
+
+
+def executor_map(
+    executor: Executor,
+    fn: Callable[[T], R],
+    items: Iterable[T],
+    backlog: int,
+    schedule: Schedule = Schedule(),
+) -> Iterator[R]:
+    submit_item = schedule.submit or (lambda ex, item: ex.submit(fn, item))
+    budget = schedule.budget
+    item_iter = iter(items)
+    # futures in flight with the weights of their items, in submission order
+    pending: Dict[Future, int] = {}
+    # an item pulled from the input but held back until it fits the budget, with its weight
+    held: List[Tuple[T, int]] = []
+
+    def submit_next() -> bool:
+        if not held:
+            for item in item_iter:
+                held.append((item, schedule.weight(item) if budget is not None and schedule.weight is not None else 0))
+                break
+            else:
+                return False
+        item, item_weight = held[0]
+        if budget is not None and not budget.acquire(item_weight):
+            return False
+        held.clear()
+        pending[submit_item(executor, item)] = item_weight
+        return True
+
+    try:
+        while len(pending) < backlog and submit_next():
+            pass
+        while pending:
+            if schedule.ordered:
+                done = list(pending)[:1]
+            else:
+                done = list(wait(pending, return_when=FIRST_COMPLETED).done)
+            for future in done:
+                # the weight is in flight until the work is done, not just until its turn comes in ordered mode
+                result = future.result()
+                item_weight = pending.pop(future)
+                if budget is not None:
+                    budget.release(item_weight)
+                while len(pending) < backlog and submit_next():
+                    pass
+                yield result
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def prefetched(items: Iterable[T], size: int) -> Iterator[T]:
+    """
+    Consume an iterable in a background thread, up to `size` items ahead of the caller. Results of a producer like
+    `pool_map` keep being collected, and new work submitted, while the caller formats and writes the previous ones.
+    :param items: input items, consumed lazily from the background thread.
+    :param size: maximum number of items fetched ahead.
+    :return: the items in the same order, errors of the producer are raised in the caller.
+    """
+    queue: "Queue[Tuple[bool, Any]]" = Queue(size)
+    stop = threading.Event()
+
+    def put(entry: Tuple[bool, Any]) -> bool:
+        while not stop.is_set():
+            try:
+                queue.put(entry, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
+
+    def produce() -> None:
+        iterator = iter(items)
+        try:
+            for item in iterator:
+                if not put((False, item)):
+                    return
+            put((True, None))
+        except BaseException as e:  # pylint: disable=broad-except
+            put((True, e))
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+
+    thread = threading.Thread(target=produce, name="prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            done, value = queue.get()
+            if done:
+                if value is not None:
+                    raise value
+                return
+            yield value
+    finally:
+        stop.set()
+        thread.join()
@@ -1,23 +1,62 @@
 import logging
-from typing import Dict, List, Iterable, Union, Callable, Any
+from array import array
+from collections import Counter
+from dataclasses import dataclass, fields
+from functools import lru_cache
+from operator import itemgetter
+from typing import Dict, List, Iterable, Mapping, Union, Callable, Any, Sequence, Tuple
 
-from .model import Map, Flags, MapEntities
+from . import stats
+from .errors import ParseError
+from .model import Map, Flags, MapEntities, EntityFilter, EntityTable, PK3, PK3Entity, StringTable
 
 log = logging.getLogger(__name__)
 items_filtered = {"item_botroam"}
+ta_classnames = (
+    "item_guard",
+    "item_doubler",
+    "item_scout",
+    "item_ammoregen",
+    "weapon_chaingun",
+    "weapon_prox_launcher",
+    "weapon_nailgun",
+    "ammo_belt",
+    "ammo_mines",
+    "ammo_nails",
+    "holdable_kamikaze",
+)
+_classname = itemgetter("classname")
+# everything pp_map looks at: the map title, items, weapons and game mode specific objects
+pp_entity_filter = EntityFilter(
+    classnames=frozenset({"worldspawn"}),
+    classname_prefixes=("item_", "ammo_", "holdable_", "weapon_", "team_"),
+    keys=frozenset({"message"}),
+)
 
 
-def aggregate_by_classname(objects: List[Dict[str, str]]) -> Dict[str, List[Dict[str, str]]]:
-    by_classname: Dict[str, List[Dict[str, str]]] = {}
+def aggregate_by_classname(objects: Iterable[Mapping[str, str]]) -> Dict[str, List[Mapping[str, str]]]:
+    by_classname: Dict[str, List[Mapping[str, str]]] = {}
     for obj in objects:
         classname = obj["classname"]
         by_classname.setdefault(classname, []).append(obj)
     return by_classname
 
 
+def count_by_classname(objects: Iterable[Mapping[str, str]]) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    classnames = objects.classnames() if isinstance(objects, EntityTable) else (obj["classname"] for obj in objects)
+    for classname in classnames:
+        counts[classname] = counts.get(classname, 0) + 1
+    return counts
+
+
 def filter_aggregated(filter_spec: Union[str, Callable[[str], bool]], objects: Dict[str, List]) -> Dict[str, int]:
+    return filter_counts(filter_spec, {key: len(value) for (key, value) in objects.items()})
+
+
+def filter_counts(filter_spec: Union[str, Callable[[str], bool]], counts: Dict[str, int]) -> Dict[str, int]:
     filter_l = (lambda n: n.startswith(filter_spec)) if isinstance(filter_spec, str) else filter_spec
-    return {key: len(value) for (key, value) in objects.items() if filter_l(key)}
+    return {key: count for (key, count) in counts.items() if filter_l(key)}
 
 
 def check_ctf_capable(objects: Dict[str, Any]) -> bool:
@@ -50,47 +89,220 @@ def item_filter(item):
 
 
 def pp_map(m: MapEntities) -> Map:
-    aggregated_objects = aggregate_by_classname(m.entities)
-    world_spawns = aggregated_objects.get("worldspawn", None)
-    if not world_spawns:
-        raise Exception(f"No worldspawn for {m.map_name}")
-    world_spawn = world_spawns.pop()
-    map_title = world_spawn.get("message", None)
-    if not map_title:
-        map_title = m.map_name
-        log.warning("No message for worldspawn for %s", m.map_name)
+    """
+    Summarize a map: title, item and weapon counts and game mode flags.
+    Entities parsed with `pp_entity_filter` are sufficient, there's no need to keep every entity for this.
+    """
+    with stats.timed("pp_map", m.map_name) as timer:
+        timer.entities = len(m.entities)
+        return _pp_map(m)
+
+
+def _pp_map(m: MapEntities) -> Map:
+    aggregated_objects = count_by_classname(m.entities)
+    map_title = _map_title(m)
 
     ctf_capable = check_ctf_capable(aggregated_objects)
     overload_capable = check_overload_capable(aggregated_objects)
     harvester_capable = check_harvester_capable(aggregated_objects)
     ctf_1f_capable = check_1f_ctf_capable(aggregated_objects)
     requires_ta = (
-        overload_capable
-        or harvester_capable
-        or ctf_1f_capable
-        or has_any_key(
-            aggregated_objects,
-            [
-                "item_guard",
-                "item_doubler",
-                "item_scout",
-                "item_ammoregen",
-                "weapon_chaingun",
-                "weapon_prox_launcher",
-                "weapon_nailgun",
-                "ammo_belt",
-                "ammo_mines",
-                "ammo_nails",
-                "holdable_kamikaze",
-            ],
-        )
+        overload_capable or harvester_capable or ctf_1f_capable or has_any_key(aggregated_objects, ta_classnames)
     )
 
     return Map(
         map_title,
         m.map_name,
         m.crc,
-        filter_aggregated(item_filter, aggregated_objects),
-        filter_aggregated("weapon_", aggregated_objects),
+        filter_counts(item_filter, aggregated_objects),
+        filter_counts("weapon_", aggregated_objects),
         Flags(ctf_capable, overload_capable, harvester_capable, ctf_1f_capable, requires_ta),
     )
+
+
+def pp_pk3(pk3: PK3Entity) -> PK3:
+    return PK3(pk3.pk3_name, pk3.crc, [pp_map(m) for m in pk3.map_entities])
+
+
+def _map_title(m: MapEntities) -> str:
+    world_spawn = next((obj for obj in reversed(m.entities) if obj["classname"] == "worldspawn"), None)
+    if world_spawn is None:
+        raise ParseError(f"No worldspawn for {m.map_name}", 0)
+    map_title = world_spawn.get("message", None)
+    if not map_title:
+        map_title = m.map_name
+        log.warning("No message for worldspawn for %s", m.map_name)
+    return map_title
+
+
+@dataclass
+class MapBatch:
+    """
+    Post-processed maps along with a map × classname count matrix.
+    `counts` is a NumPy array when NumPy is available, a list of `array` rows otherwise; its columns are indexed like
+    `vocabulary`.
+    """
+
+    vocabulary: List[str]
+    counts: Any
+    maps: List[Map]
+
+    def column(self, classname: str) -> List[int]:
+        """
+        :return: the count of a classname in each map.
+        """
+        if classname not in self.vocabulary:
+            return [0] * len(self.maps)
+        column = self.vocabulary.index(classname)
+        np = _numpy()
+        if np is not None and isinstance(self.counts, np.ndarray):
+            return self.counts[:, column].tolist()
+        return [row[column] for row in self.counts]
+
+    def totals(self) -> Dict[str, int]:
+        """
+        :return: mirror wide count of every classname.
+        """
+        np = _numpy()
+        if np is not None and isinstance(self.counts, np.ndarray):
+            sums = self.counts.sum(axis=0).tolist()
+        else:
+            sums = [sum(column) for column in zip(*self.counts)] if self.counts else [0] * len(self.vocabulary)
+        return dict(zip(self.vocabulary, sums))
+
+    def flag_totals(self) -> Dict[str, int]:
+        """
+        :return: the number of maps each flag is set for.
+        """
+        totals = dict.fromkeys((f.name for f in fields(Flags)), 0)
+        for m in self.maps:
+            for flag, value in m.flags.to_json().items():
+                totals[flag] += value
+        return totals
+
+
+@lru_cache(maxsize=None)
+def _numpy() -> Any:
+    """
+    NumPy if it's installed, imported on first use: it takes longer to import than a small PK3 takes to process.
+    """
+    try:
+        import numpy  # pylint: disable=import-outside-toplevel
+    except ImportError:  # optional, pp_maps counts with plain arrays without it
+        return None
+    return numpy
+
+
+def pp_maps(maps: Sequence[MapEntities]) -> MapBatch:
+    """
+    Batch version of `pp_map` for mirror wide statistics.
+    Classnames are encoded to ids in a vocabulary shared by all maps and scattered into a single count matrix, the
+    flags are evaluated column wise instead of per map.
+    :param maps: maps to summarize, entities parsed with `pp_entity_filter` are sufficient.
+    :return: the count matrix along with the same `Map` summaries `pp_map` makes.
+    """
+    sparse = _SparseCounts.of(maps)
+    width = len(sparse.vocabulary)
+    if _numpy() is not None:
+        counts = _count_matrix_numpy(sparse.ids, sparse.values, sparse.bounds, width)
+        present = counts > 0
+    else:
+        counts = _count_matrix(sparse.ids, sparse.values, sparse.bounds, width)
+        present = None
+    flags = _batch_flags(sparse.vocabulary, counts, present, len(maps))
+    strings = sparse.vocabulary.strings
+    is_item = [item_filter(classname) for classname in strings]
+    is_weapon = [classname.startswith("weapon_") for classname in strings]
+    summaries = []
+    for i, m in enumerate(maps):
+        entries = sparse.entries(i)
+        summaries.append(
+            Map(
+                _map_title(m),
+                m.map_name,
+                m.crc,
+                {strings[c]: n for c, n in entries if is_item[c]},
+                {strings[c]: n for c, n in entries if is_weapon[c]},
+                flags[i],
+            )
+        )
+    return MapBatch(strings, counts, summaries)
+
+
+@dataclass
+class _SparseCounts:
+    """
+    Classname ids and counts of every map of a batch, the entries of map i are at bounds[i]:bounds[i + 1].
+    """
+
+    vocabulary: StringTable
+    ids: array
+    values: array
+    bounds: List[int]
+
+    @staticmethod
+    def of(maps: Sequence[MapEntities]) -> "_SparseCounts":
+        sparse = _SparseCounts(StringTable(), array("l"), array("l"), [0])
+        vocabulary = sparse.vocabulary
+        for m in maps:
+            classnames = m.entities.classnames() if isinstance(m.entities, EntityTable) else map(_classname, m.entities)
+            # Counter counts in C, only the distinct classnames of a map are looked up in the vocabulary
+            counted = Counter(classnames)
+            for classname in counted.keys() - vocabulary.ids.keys():
+                vocabulary.intern(classname)
+            sparse.ids.extend(map(vocabulary.ids.__getitem__, counted))
+            sparse.values.extend(counted.values())
+            sparse.bounds.append(len(sparse.ids))
+        return sparse
+
+    def entries(self, i: int) -> List[Tuple[int, int]]:
+        start, end = self.bounds[i], self.bounds[i + 1]
+        return list(zip(self.ids[start:end], self.values[start:end]))
+
+
+def _batch_flags(vocabulary: StringTable, counts: Any, present: Any, size: int) -> List[Flags]:
+    """
+    The flags of every map of a batch, evaluated column wise with the same rules as the check_* functions.
+    :param present: boolean NumPy matrix of the classnames present in each map, `None` to look at `counts` rows.
+    """
+
+    def has(classname: str) -> List[bool]:
+        column = vocabulary.ids.get(classname)
+        if column is None:
+            return [False] * size
+        if present is not None:
+            return present[:, column].tolist()
+        return [row[column] > 0 for row in counts]
+
+    def has_all(*classnames: str) -> List[bool]:
+        return [all(values) for values in zip(*map(has, classnames))]
+
+    def has_any(classnames: Iterable[str]) -> List[bool]:
+        return [any(values) for values in zip(*map(has, classnames))]
+
+    ctf = has("team_CTF_blueflag")
+    overload = has_all("team_redobelisk", "team_blueobelisk")
+    harvester = has("team_neutralobelisk")
+    ctf_1f = has("team_CTF_neutralflag")
+    ta = [any(values) for values in zip(overload, harvester, ctf_1f, has_any(ta_classnames))]
+    return [Flags(*flags) for flags in zip(ctf, overload, harvester, ctf_1f, ta)]
+
+
+def _count_matrix_numpy(ids: array, values: array, bounds: List[int], width: int) -> Any:
+    np = _numpy()
+    counts = np.zeros((len(bounds) - 1, width), dtype=np.int64)
+    if ids:
+        rows = np.repeat(np.arange(len(bounds) - 1), np.diff(bounds))
+        counts[rows, np.frombuffer(ids, dtype=f"i{ids.itemsize}")] = np.frombuffer(values, dtype=f"i{values.itemsize}")
+    return counts
+
+
+def _count_matrix(ids: array, values: array, bounds: List[int], width: int) -> List[array]:
+    zeros = array("l", bytes(width * ids.itemsize))
+    counts = []
+    for start, end in zip(bounds, bounds[1:]):
+        row = array("l", zeros)
+        for classname_id, count in zip(ids[start:end], values[start:end]):
+            row[classname_id] = count
+        counts.append(row)
+    return counts
@@ -0,0 +1,369 @@
+import io
+import json
+import logging
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import IO, Iterator, List, Optional, Sequence, Tuple, Type, Union
+from urllib.parse import parse_qs, urlsplit
+from zipfile import BadZipFile
+
+from bspp.bspp import ProcessOptions, is_pk3, process_file_resilient, process_pk3_file, resolve_workers
+from bspp.cache import Fingerprint, ResultCache
+from bspp.hash import chunk_size
+from bspp.limits import ResourceLimits
+from bspp.model import FileError, JSONEncodingAwareClassEncoder, Map, MapEntities, PK3, PK3Entity
+from bspp.postprocess import pp_entity_filter, pp_map, pp_pk3
+
+log = logging.getLogger(__name__)
+max_request_size = 1024 * 1024
+# Unix sockets are not available on Windows
+unix_sockets = hasattr(socket, "AF_UNIX")
+
+
+class RequestError(Exception):
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass(frozen=True)
+class ServiceOptions:
+    """
+    Limits of the requests served by a `MapInfoService`.
+    :param max_concurrent: number of requests processed at the same time.
+    :param max_batch: number of paths accepted in a single request.
+    :param max_upload: size of the largest PK3 accepted as an upload, in bytes.
+    :param roots: only serve files in these folders, any file when not given.
+    :param wait_timeout: seconds a request waits for a free slot before it's rejected as too busy.
+    :param limits: maps beyond these limits are reported as errors, without inflating them.
+    """
+
+    max_concurrent: int = 8
+    max_batch: int = 64
+    max_upload: int = 256 * 1024 * 1024
+    roots: Optional[Sequence[str]] = None
+    wait_timeout: float = 30.0
+    limits: Optional[ResourceLimits] = ResourceLimits()
+
+
+class MapInfoService:
+    """
+    The state kept warm between requests of the map info server: a pool of worker processes and a result cache.
+    Every path of a request is submitted to the pool at once, requests beyond `max_concurrent` wait for a free slot.
+    """
+
+    def __init__(
+        self, workers: Optional[int] = 0, cache_file: Optional[str] = None, options: ServiceOptions = ServiceOptions()
+    ):
+        """
+        :param workers: number of worker processes, 0 for one per CPU.
+        :param cache_file: persistent result cache file, the cache is kept in memory when not given.
+        """
+        if options.max_concurrent < 1:
+            raise ValueError(f"Invalid number of concurrent requests: {options.max_concurrent}")
+        self.options = options
+        self.roots = [os.path.realpath(root) for root in options.roots] if options.roots else None
+        self.cache = ResultCache(cache_file or ":memory:", check_same_thread=False)
+        self._cache_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(options.max_concurrent)
+        worker_count = resolve_workers(workers)
+        self.executor = ProcessPoolExecutor(worker_count)
+        # start the workers now, before any request thread, rather than forking them from a busy server later
+        for future in [self.executor.submit(os.getpid) for _ in range(worker_count)]:
+            future.result()
+
+    def __enter__(self) -> "MapInfoService":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.executor.shutdown()
+        self.cache.close()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        if not self._slots.acquire(timeout=self.options.wait_timeout):
+            raise RequestError(HTTPStatus.SERVICE_UNAVAILABLE, "Too many concurrent requests")
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+    def process_paths(self, paths: Sequence[str]) -> List[Union[PK3, Map, FileError]]:
+        """
+        Process a batch of .pk3 or .bsp files, a file that fails is reported as a `FileError` in its place.
+        """
+        if len(paths) > self.options.max_batch:
+            raise RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"More than {self.options.max_batch} paths")
+        for path in paths:
+            self._check_path(path)
+        results: List[List[Union[PK3, Map, FileError]]] = [[] for _ in paths]
+        pending: List[Tuple[int, Optional[Fingerprint], Future]] = []
+        for i, path in enumerate(paths):
+            fingerprint = None
+            if is_pk3(path):
+                try:
+                    fingerprint = ResultCache.fingerprint(path)
+                except (OSError, BadZipFile) as e:
+                    results[i] = [FileError.of(path, e)]
+                    continue
+                with self._cache_lock:
+                    cached = self.cache.get(fingerprint, path, pp_entity_filter)
+                if cached is not None:
+                    results[i] = _postprocessed(path, [cached])
+                    continue
+            future = self.executor.submit(process_file_resilient, path, self._file_options)
+            pending.append((i, fingerprint, future))
+        for i, fingerprint, future in pending:
+            results[i] = self._completed(paths[i], fingerprint, future)
+        return [result for file_results in results for result in file_results]
+
+    def _completed(
+        self, path: str, fingerprint: Optional[Fingerprint], future: Future
+    ) -> List[Union[PK3, Map, FileError]]:
+        """
+        Post-process the results of a file, and cache them only when that succeeded.
+        """
+        try:
+            file_results = future.result()
+        except Exception as e:  # pylint: disable=broad-except
+            log.warning("Failed to process %s: %s", path, e)
+            return [FileError.of(path, e)]
+        processed = _postprocessed(path, file_results)
+        pk3 = file_results[0] if len(file_results) == 1 else None
+        if fingerprint is not None and isinstance(pk3, PK3Entity) and isinstance(processed[0], PK3):
+            with self._cache_lock:
+                self.cache.put(fingerprint, pk3, pp_entity_filter)
+        return processed
+
+    def process_upload(self, pk3_name: str, body: io.BufferedIOBase, length: int) -> Union[PK3, FileError]:
+        """
+        Process an uploaded PK3, spooled to a temporary file in chunks rather than held in memory.
+        :param body: stream of the upload, like the request body, only `length` bytes are read from it.
+        """
+        if length > self.options.max_upload:
+            raise RequestError(
+                HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Upload larger than {self.options.max_upload} bytes"
+            )
+        fd, upload_file = tempfile.mkstemp(suffix=".pk3")
+        try:
+            # closed before a worker opens it, Windows doesn't allow opening it twice
+            with os.fdopen(fd, "wb") as upload:
+                _copy(body, upload, length)
+            return self._process_upload(pk3_name, upload_file)
+        finally:
+            os.unlink(upload_file)
+
+    def _process_upload(self, pk3_name: str, upload_file: str) -> Union[PK3, FileError]:
+        try:
+            future = self.executor.submit(process_pk3_file, upload_file, self._file_options)
+            return pp_pk3(replace(future.result(), pk3_name=pk3_name))
+        except Exception as e:  # pylint: disable=broad-except
+            log.warning("Failed to process upload %s: %s", pk3_name, e)
+            return FileError.of(pk3_name, e)
+
+    @property
+    def _file_options(self) -> ProcessOptions:
+        return ProcessOptions(entity_filter=pp_entity_filter, limits=self.options.limits)
+
+    def _check_path(self, path: str) -> None:
+        if self.roots is None:
+            return
+        real_path = os.path.realpath(path)
+        if not any(real_path.startswith(os.path.join(root, "")) for root in self.roots):
+            raise RequestError(HTTPStatus.FORBIDDEN, f"Not served: {path}")
+
+    def __str__(self) -> str:
+        return str(self.cache)
+
+
+def _copy(source: io.BufferedIOBase, target: IO[bytes], length: int) -> None:
+    while length > 0:
+        chunk = source.read(min(length, chunk_size))
+        if not chunk:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "Incomplete upload")
+        target.write(chunk)
+        length -= len(chunk)
+
+
+def _postprocessed(
+    path: str, results: Sequence[Union[PK3Entity, MapEntities, FileError]]
+) -> List[Union[PK3, Map, FileError]]:
+    """
+    :return: the summaries of the results of a file, or a single error if post-processing any of them failed.
+    """
+    try:
+        return [_postprocessed_one(result) for result in results]
+    except Exception as e:  # pylint: disable=broad-except
+        log.warning("Failed to post-process %s: %s", path, e)
+        return [FileError.of(path, e)]
+
+
+def _postprocessed_one(result: Union[PK3Entity, MapEntities, FileError]) -> Union[PK3, Map, FileError]:
+    if isinstance(result, PK3Entity):
+        return pp_pk3(result)
+    if isinstance(result, MapEntities):
+        return pp_map(result)
+    return result
+
+
+def handler_class(service: MapInfoService) -> Type[BaseHTTPRequestHandler]:
+    """
+    Request handler of the map info API:
+
+    - `GET /health` status of the server.
+    - `POST /maps` with a JSON body `{"paths": [...]}`, the `PK3` and `Map` summaries of the files, in order.
+    - `POST /maps/upload?name=NAME` with the bytes of a PK3 as the body, its `PK3` summary.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self) -> None:  # pylint: disable=invalid-name
+            if urlsplit(self.path).path == "/health":
+                self._send(HTTPStatus.OK, dict(status="ok", cache=str(service)))
+            else:
+                self._send(HTTPStatus.NOT_FOUND, dict(error=f"Not found: {self.path}"))
+
+        def do_POST(self) -> None:  # pylint: disable=invalid-name
+            url = urlsplit(self.path)
+            try:
+                length = self._content_length()
+                if url.path == "/maps":
+                    paths = self._read_paths(length)
+                    with service.slot():
+                        result: object = service.process_paths(paths)
+                elif url.path == "/maps/upload":
+                    if length > service.options.max_upload:
+                        raise RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Upload too large")
+                    pk3_name = parse_qs(url.query).get("name", ["upload.pk3"])[0]
+                    with service.slot():
+                        result = service.process_upload(pk3_name, self.rfile, length)
+                else:
+                    raise RequestError(HTTPStatus.NOT_FOUND, f"Not found: {self.path}")
+            except RequestError as e:
+                # the body may not have been read, don't reuse the connection
+                self.close_connection = True
+                self._send(e.status, dict(error=str(e)))
+                return
+            except Exception as e:  # pylint: disable=broad-except
+                log.exception("Failed to serve %s", self.path)
+                self.close_connection = True
+                self._send(HTTPStatus.INTERNAL_SERVER_ERROR, dict(error=f"{type(e).__name__}: {e}"))
+                return
+            self._send(HTTPStatus.OK, result)
+
+        def _content_length(self) -> int:
+            try:
+                return int(self.headers.get("Content-Length", 0))
+            except ValueError as e:
+                raise RequestError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length") from e
+
+        def _read_paths(self, length: int) -> List[str]:
+            if length > max_request_size:
+                raise RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request too large")
+            try:
+                paths = json.loads(self.rfile.read(length))["paths"]
+            except (ValueError, KeyError, TypeError) as e:
+                raise RequestError(HTTPStatus.BAD_REQUEST, f"Invalid request: {e}") from e
+            if not isinstance(paths, list) or not all(isinstance(path, str) for path in paths):
+                raise RequestError(HTTPStatus.BAD_REQUEST, "Invalid request: paths must be a list of strings")
+            return paths
+
+        def _send(self, status: HTTPStatus, obj: object) -> None:
+            body = json.dumps(obj, cls=JSONEncodingAwareClassEncoder, separators=(",", ":")).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def address_string(self) -> str:
+            # Unix socket clients have no address
+            return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+        def log_message(self, format: str, *args) -> None:  # pylint: disable=redefined-builtin
+            log.info("%s %s", self.address_string(), format % args)
+
+    return Handler
+
+
+def _unix_server(path: str, handler: Type[BaseHTTPRequestHandler]) -> socketserver.BaseServer:
+    # defined on use, `UnixStreamServer` doesn't exist where Unix sockets are not supported
+    class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+    if os.path.exists(path):
+        os.unlink(path)  # a socket left behind by a previous run
+    return ThreadingUnixHTTPServer(path, handler)
+
+
+def make_server(service: MapInfoService, address: Union[Tuple[str, int], str]) -> socketserver.BaseServer:
+    """
+    :param address: `(host, port)` to listen on TCP, or the path of a Unix socket where supported.
+    :return: the server, to `serve_forever` or `handle_request`.
+    """
+    handler = handler_class(service)
+    if isinstance(address, str):
+        if not unix_sockets:
+            raise ValueError("Unix sockets are not supported on this platform")
+        return _unix_server(address, handler)
+    return ThreadingHTTPServer(address, handler)
+
+
+def main(args: Optional[List[str]] = None) -> None:
+    import argparse  # pylint: disable=import-outside-toplevel
+
+    parser = argparse.ArgumentParser(description="BSP info server")
+    parser.add_argument("--host", default="127.0.0.1", help="interface to listen on")
+    parser.add_argument("--port", type=int, default=8346, help="TCP port to listen on")
+    if unix_sockets:
+        parser.add_argument("--unix", metavar="PATH", help="listen on a Unix socket instead of TCP")
+    parser.add_argument(
+        "-P", "--workers", type=int, default=0, metavar="N", help="number of worker processes, 0 for one per CPU"
+    )
+    parser.add_argument("--cache", metavar="DB", help="persistent result cache file, in memory otherwise")
+    parser.add_argument("--max-concurrent", type=int, default=8, metavar="N", help="requests processed at once")
+    parser.add_argument("--max-batch", type=int, default=64, metavar="N", help="paths accepted per request")
+    parser.add_argument("--max-upload", type=int, default=256, metavar="MB", help="largest PK3 upload accepted")
+    parser.add_argument("--root", action="append", metavar="DIR", help="only serve files in this folder")
+    parser.add_argument(
+        "--max-ratio", type=float, default=100.0, metavar="R", help="reject maps compressed better than R:1"
+    )
+    parsed = parser.parse_args(args)
+    unix = getattr(parsed, "unix", None)
+
+    options = ServiceOptions(
+        parsed.max_concurrent,
+        parsed.max_batch,
+        parsed.max_upload * 1024 * 1024,
+        parsed.root,
+        limits=ResourceLimits(max_ratio=parsed.max_ratio),
+    )
+    with MapInfoService(parsed.workers, parsed.cache, options) as service:
+        server = make_server(service, unix or (parsed.host, parsed.port))
+        log.info("Listening on %s", unix or f"http://{parsed.host}:{parsed.port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            if unix:
+                os.unlink(unix)
+            log.info("%s", service)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,204 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TypeVar
+
+log = logging.getLogger(__name__)
+T = TypeVar("T")
+
+
+@dataclass
+class StageEvent:
+    stage: str
+    wall: float
+    cpu: float
+    bytes_in: int = 0
+    bytes_out: int = 0
+    entities: int = 0
+    name: str = ""
+
+    def to_json(self):
+        return asdict(self)
+
+
+@dataclass
+class StageTotals:
+    count: int = 0
+    wall: float = 0.0
+    cpu: float = 0.0
+    bytes_in: int = 0
+    bytes_out: int = 0
+    entities: int = 0
+
+    def add(self, event: StageEvent) -> None:
+        self.count += 1
+        self.wall += event.wall
+        self.cpu += event.cpu
+        self.bytes_in += event.bytes_in
+        self.bytes_out += event.bytes_out
+        self.entities += event.entities
+
+    def to_json(self):
+        return asdict(self)
+
+
+@dataclass
+class Stats:
+    """
+    Per stage wall and CPU time, bytes in and out and entity counts of the processing pipeline.
+    Stages nest, a stage's time includes the time of the stages it calls: `file` > `pk3` > `map` > `bsp_hash`.
+    The time of a `map` not spent in `bsp_hash` is spent reading and inflating.
+    Events may be recorded from several threads, like the one prefetching the results of a pool and the one writing
+    them, totals are updated under a lock.
+    :param slow_threshold: files that take longer than this many seconds are logged and kept in `slow`.
+    :param callbacks: called with every `StageEvent`, e.g. to export them to a metrics collector.
+    """
+
+    slow_threshold: Optional[float] = None
+    callbacks: List[Callable[[StageEvent], None]] = field(default_factory=list)
+    stages: Dict[str, StageTotals] = field(default_factory=dict)
+    slow: List[StageEvent] = field(default_factory=list)
+    events: Optional[List[StageEvent]] = None
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False, compare=False)
+
+    def record(self, event: StageEvent) -> None:
+        slow = event.stage == "file" and self.slow_threshold is not None and event.wall > self.slow_threshold
+        with self._lock:
+            self.stages.setdefault(event.stage, StageTotals()).add(event)
+            if slow:
+                self.slow.append(event)
+            if self.events is not None:
+                self.events.append(event)
+        if slow:
+            log.warning("Slow file: %s took %.3fs", event.name, event.wall)
+        for callback in self.callbacks:
+            callback(event)
+
+    def summary(self) -> str:
+        lines = [
+            f"{'stage':10} {'count':>8} {'wall s':>10} {'cpu s':>10} {'MB in':>10} {'MB out':>10} {'MB/s':>10} "
+            f"{'entities':>10}"
+        ]
+        for stage, totals in self.stages.items():
+            throughput = totals.bytes_in / totals.wall / 1e6 if totals.wall and totals.bytes_in else 0.0
+            lines.append(
+                f"{stage:10} {totals.count:8} {totals.wall:10.3f} {totals.cpu:10.3f} {totals.bytes_in / 1e6:10.2f} "
+                f"{totals.bytes_out / 1e6:10.2f} {throughput:10.2f} {totals.entities:10}"
+            )
+        for event in self.slow:
+            lines.append(f"slow: {event.name} {event.wall:.3f}s")
+        return "\n".join(lines)
+
+    def to_json(self):
+        return dict(
+            stages={stage: totals.to_json() for stage, totals in self.stages.items()},
+            slow=[event.to_json() for event in self.slow],
+        )
+
+
+class _Timer:
+    __slots__ = ("stage", "name", "bytes_in", "bytes_out", "entities", "_wall", "_cpu")
+
+    def __init__(self, stage: str, name: str):
+        self.stage = stage
+        self.name = name
+        self.bytes_in = self.bytes_out = self.entities = 0
+        self._wall = self._cpu = 0.0
+
+    def __bool__(self) -> bool:
+        return True
+
+    def __enter__(self) -> "_Timer":
+        self._wall = time.perf_counter()
+        self._cpu = time.thread_time()
+        return self
+
+    def __exit__(self, exc_type, *_) -> None:
+        stats = _active
+        if exc_type is None and stats is not None:
+            wall = time.perf_counter() - self._wall
+            cpu = time.thread_time() - self._cpu
+            stats.record(StageEvent(self.stage, wall, cpu, self.bytes_in, self.bytes_out, self.entities, self.name))
+
+
+class _NoTimer:
+    __slots__ = ("bytes_in", "bytes_out", "entities")
+
+    def __bool__(self) -> bool:
+        return False
+
+    def __enter__(self) -> "_NoTimer":
+        return self
+
+    def __exit__(self, *_) -> None:
+        pass
+
+
+_no_timer = _NoTimer()
+_active: Optional[Stats] = None
+
+
+def active() -> Optional[Stats]:
+    return _active
+
+
+def timed(stage: str, name: str = ""):
+    """
+    Time a stage when statistics are being collected, a no-op otherwise.
+    The returned context is falsy when disabled, so any extra work for the statistics can be skipped.
+    """
+    return _no_timer if _active is None else _Timer(stage, name)
+
+
+@contextmanager
+def collecting(stats: Stats) -> Iterator[Stats]:
+    """
+    Collect statistics of the processing done in this process within the context.
+    """
+    global _active  # pylint: disable=global-statement
+    previous, _active = _active, stats
+    try:
+        yield stats
+    finally:
+        _active = previous
+
+
+def record_all(events: Iterable[StageEvent]) -> None:
+    """
+    Record events collected elsewhere, like in a worker process.
+    """
+    if _active is not None:
+        for event in events:
+            _active.record(event)
+
+
+def timed_output(output: Callable[[Iterable[T]], None], results: Iterable[T]) -> None:
+    """
+    Call an output function and record the time it spends formatting and writing, but not waiting for the results.
+    """
+    if _active is None:
+        output(results)
+        return
+    waited = [0.0, 0.0]
+
+    def producer() -> Iterator[T]:
+        iterator = iter(results)
+        while True:
+            wall, cpu = time.perf_counter(), time.thread_time()
+            try:
+                result = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                waited[0] += time.perf_counter() - wall
+                waited[1] += time.thread_time() - cpu
+            yield result
+
+    stats, wall, cpu = _active, time.perf_counter(), time.thread_time()
+    output(producer())
+    # the time waited for the results is already recorded by the processing stages
+    wall = time.perf_counter() - wall - waited[0]
+    cpu = time.thread_time() - cpu - waited[1]
+    stats.record(StageEvent("output", wall, cpu))
@@ -0,0 +1,164 @@
+import struct
+from typing import IO, List, NamedTuple, Optional, Tuple
+from zipfile import BadZipFile
+
+# end of central directory record, zip64 end of central directory locator and record, central directory file header
+_eocd = struct.Struct("<4s4H2LH")
+_eocd_signature = b"PK\x05\x06"
+_zip64_locator = struct.Struct("<4sLQL")
+_zip64_locator_signature = b"PK\x06\x07"
+_zip64_eocd = struct.Struct("<4sQ2H2L4Q")
+_zip64_eocd_signature = b"PK\x06\x06"
+_central_header = struct.Struct("<4s4B4HL2L5H2L")
+_central_header_signature = b"PK\x01\x02"
+_zip64_extra_id = 0x0001
+_utf8_flag = 0x800
+_max_comment = 0xFFFF
+
+
+class CentralDirEntry(NamedTuple):
+    """
+    The members of a `ZipInfo` available from the central directory, named alike.
+    """
+
+    filename: str
+    CRC: int
+    compress_type: int
+    compress_size: int
+    file_size: int
+    header_offset: int
+
+
+def read_central_directory(zip_file: IO[bytes]) -> List[CentralDirEntry]:
+    """
+    Read the entries of a zip archive straight from its central directory, found by seeking to the end of central
+    directory record. Unlike `ZipFile` nothing else is read or parsed, which is all listing needs.
+    :param zip_file: seekable binary stream of the archive.
+    :return: the entries in central directory order, like `ZipFile.infolist`.
+    :raise BadZipFile: on a truncated or corrupt central directory, like `ZipFile`.
+    """
+    cd_offset, cd_size, entry_count, concat = _locate_central_directory(zip_file)
+    cd_offset += concat
+    zip_file.seek(cd_offset)
+    data = zip_file.read(cd_size)
+    if len(data) < cd_size:
+        raise BadZipFile("Truncated central directory")
+    entries = []
+    position = 0
+    for _ in range(entry_count):
+        if data[position : position + 4] != _central_header_signature:
+            raise BadZipFile(f"Bad central directory entry at {cd_offset + position}")
+        entry, position = _central_dir_entry(data, position)
+        entries.append(entry._replace(header_offset=entry.header_offset + concat))
+    return entries
+
+
+def _central_dir_entry(data: bytes, position: int) -> Tuple[CentralDirEntry, int]:
+    """
+    :return: the central directory file header at `position`, and the position of the next one.
+    """
+    if position + _central_header.size > len(data):
+        raise BadZipFile("Truncated central directory entry")
+    (
+        _,
+        _,
+        _,
+        _,
+        _,
+        flags,
+        compress_type,
+        _,
+        _,
+        crc,
+        compress_size,
+        file_size,
+        name_length,
+        extra_length,
+        comment_length,
+        _,
+        _,
+        _,
+        header_offset,
+    ) = _central_header.unpack_from(data, position)
+    position += _central_header.size
+    if position + name_length + extra_length + comment_length > len(data):
+        raise BadZipFile("Truncated central directory entry")
+    filename = data[position : position + name_length].decode("utf-8" if flags & _utf8_flag else "cp437")
+    position += name_length
+    if 0xFFFFFFFF in (file_size, compress_size, header_offset):
+        file_size, compress_size, header_offset = _zip64_sizes(
+            data[position : position + extra_length], file_size, compress_size, header_offset
+        )
+    entry = CentralDirEntry(filename, crc, compress_type, compress_size, file_size, header_offset)
+    return entry, position + extra_length + comment_length
+
+
+def _locate_central_directory(zip_file: IO[bytes]) -> Tuple[int, int, int, int]:
+    file_size = zip_file.seek(0, 2)
+    tail_size = min(file_size, _eocd.size + _max_comment)
+    zip_file.seek(file_size - tail_size)
+    tail = zip_file.read(tail_size)
+    # the record is normally the last 22 bytes, unless the archive has a comment that may contain the signature too
+    search_end = len(tail) - _eocd.size + 4
+    while True:
+        eocd_position = tail.rfind(_eocd_signature, 0, search_end)
+        if eocd_position < 0:
+            raise BadZipFile("File is not a zip file")
+        _, _, _, _, entry_count, cd_size, cd_offset, comment_length = _eocd.unpack_from(tail, eocd_position)
+        if eocd_position + _eocd.size + comment_length == len(tail):
+            break
+        search_end = eocd_position + 3
+    eocd_offset = file_size - tail_size + eocd_position
+    zip64 = _zip64_end_record(zip_file, eocd_offset)
+    if zip64 is not None:
+        eocd_offset, entry_count, cd_size, cd_offset = zip64
+    # data prepended to the archive, like a self extracting stub, shifts every offset
+    concat = eocd_offset - cd_size - cd_offset
+    if concat < 0:
+        raise BadZipFile("Bad central directory offset")
+    return cd_offset, cd_size, entry_count, concat
+
+
+def _zip64_end_record(zip_file: IO[bytes], eocd_offset: int) -> Optional[Tuple[int, int, int, int]]:
+    """
+    :return: the offset, entry count, central directory size and offset of the zip64 end of central directory record
+        that precedes the end of central directory record, `None` if there is none.
+    """
+    locator_offset = eocd_offset - _zip64_locator.size
+    if locator_offset < 0:
+        return None
+    zip_file.seek(locator_offset)
+    if zip_file.read(_zip64_locator.size)[:4] != _zip64_locator_signature:
+        return None
+    record_offset = locator_offset - _zip64_eocd.size
+    if record_offset < 0:
+        raise BadZipFile("Truncated zip64 end of central directory record")
+    zip_file.seek(record_offset)
+    record = zip_file.read(_zip64_eocd.size)
+    if len(record) < _zip64_eocd.size or record[:4] != _zip64_eocd_signature:
+        raise BadZipFile("Bad zip64 end of central directory record")
+    _, _, _, _, _, _, _, entry_count, cd_size, cd_offset = _zip64_eocd.unpack(record)
+    return record_offset, entry_count, cd_size, cd_offset
+
+
+def _zip64_sizes(extra: bytes, file_size: int, compress_size: int, header_offset: int) -> Tuple[int, int, int]:
+    position = 0
+    while position + 4 <= len(extra):
+        header_id, length = struct.unpack_from("<2H", extra, position)
+        position += 4
+        if header_id == _zip64_extra_id:
+            # only the fields that overflow in the central header are present, in this order
+            end = min(position + length, len(extra))
+            fields = iter([struct.unpack_from("<Q", extra, p)[0] for p in range(position, end - 7, 8)])
+            try:
+                if file_size == 0xFFFFFFFF:
+                    file_size = next(fields)
+                if compress_size == 0xFFFFFFFF:
+                    compress_size = next(fields)
+                if header_offset == 0xFFFFFFFF:
+                    header_offset = next(fields)
+            except StopIteration:
+                raise BadZipFile("Truncated zip64 extra field") from None
+            return file_size, compress_size, header_offset
+        position += length
+    raise BadZipFile("Missing zip64 extra field")
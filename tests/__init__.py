@@ -1,3 +1,46 @@
+from tests.test_aio import TestAio
+from tests.test_bspfile import TestBSPFile
 from tests.test_bspp import TestBspp
+from tests.test_cache import TestCache
+from tests.test_cli import TestCli
+from tests.test_dedup import TestDedup
+from tests.test_entities import TestEntities
+from tests.test_errors import TestErrors
+from tests.test_index import TestIndex
+from tests.test_limits import TestLimits
+from tests.test_manifest import TestManifest
+from tests.test_md4 import TestMD4
+from tests.test_model import TestEntityTable
+from tests.test_output import TestJsonLines, TestPlainText
+from tests.test_parallel import TestParallel
+from tests.test_postprocess import TestBatch
+from tests.test_server import TestServer
+from tests.test_stats import TestStats
+from tests.test_stream import TestStream
+from tests.test_synthetic import TestSynthetic
+from tests.test_zipdir import TestZipDir
 
-__all__ = [TestBspp]
+__all__ = [
+    TestAio,
+    TestBatch,
+    TestBSPFile,
+    TestBspp,
+    TestCache,
+    TestCli,
+    TestDedup,
+    TestEntities,
+    TestEntityTable,
+    TestErrors,
+    TestIndex,
+    TestJsonLines,
+    TestLimits,
+    TestManifest,
+    TestMD4,
+    TestParallel,
+    TestPlainText,
+    TestServer,
+    TestStats,
+    TestStream,
+    TestSynthetic,
+    TestZipDir,
+]
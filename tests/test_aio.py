@@ -0,0 +1,63 @@
+import asyncio
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase
+
+from bspp import bspp
+from bspp.aio import process_many
+from bspp.model import PK3
+from bench.synthetic import bsp_bytes, map_entities, write_pk3
+
+
+async def collect(results):
+    return [result async for result in results]
+
+
+class TestAio(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.pk3_files = [
+            write_pk3(
+                os.path.join(self.tmp_dir.name, f"pack{i}.pk3"),
+                {f"map{i}": bsp_bytes(map_entities(f"Map {i}", {"weapon_railgun": i + 1}))},
+            )
+            for i in range(5)
+        ]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_matches_sync(self):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            results = asyncio.run(collect(process_many(self.pk3_files, concurrency=2, executor=executor)))
+        self.assertEqual(sorted(results, key=lambda pk3: pk3.pk3_name), list(bspp.process(self.pk3_files)))
+
+    def test_postprocess_in_process_pool(self):
+        results = asyncio.run(collect(process_many(self.pk3_files, concurrency=2, postprocess=True)))
+        self.assertEqual(len(results), len(self.pk3_files))
+        for pk3 in results:
+            self.assertIsInstance(pk3, PK3)
+            self.assertEqual(len(pk3.maps), 1)
+
+    def test_early_close(self):
+        submitted = []
+
+        def paths():
+            for path in self.pk3_files:
+                submitted.append(path)
+                yield path
+
+        async def first():
+            results = process_many(paths(), concurrency=2, executor=executor)
+            async for pk3 in results:
+                await results.aclose()
+                return pk3
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            self.assertIsNotNone(asyncio.run(first()))
+        self.assertLessEqual(len(submitted), 3)
+
+    def test_invalid_concurrency(self):
+        with self.assertRaises(ValueError):
+            asyncio.run(collect(process_many(self.pk3_files, concurrency=0)))
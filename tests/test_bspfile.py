@@ -0,0 +1,137 @@
+import io
+import os
+import struct
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+from zipfile import ZIP_DEFLATED, ZipFile
+
+from bspp import bspp
+from bspp.assets import AssetIndex, asset_key, shader_names
+from bspp.bspfile import BSPFile, lump_directory, read_lumps
+from bspp.errors import BadHeaderError, BadLumpError, BadVersionError, LimitExceededError
+from bspp.layout import bsp_header_size
+from bspp.limits import ResourceLimits
+from bench.synthetic import bsp_bytes, map_entities, write_pk3
+
+shader_script = """
+// walls
+textures/custom/wall_glow
+{
+    { map textures/custom/wall.tga }
+}
+textures/custom/sky { surfaceparm sky }
+"""
+
+
+class TestBSPFile(TestCase):
+    def setUp(self):
+        self.bsp_data = bsp_bytes(
+            map_entities("Lumps", {"item_quad": 1}),
+            padding=1000,
+            shaders=["textures/base_wall/metal", "textures/custom/wall_glow", "noshader"],
+            models=3,
+        )
+
+    def test_lumps(self):
+        bsp = BSPFile(self.bsp_data)
+        self.assertEqual(bsp.entities(), bspp.get_lump(self.bsp_data, 0))
+        visibility = bsp.lump(16)
+        self.assertIsInstance(visibility, memoryview)
+        self.assertEqual(len(visibility), 1000)
+        self.assertEqual(bsp.model_count, 3)
+        self.assertEqual(bsp.count(1), 3)
+        with self.assertRaises(ValueError):
+            bsp.count(0)
+
+    def test_shaders(self):
+        shaders = BSPFile(self.bsp_data).shaders()
+        self.assertEqual(shaders.names, ["textures/base_wall/metal", "textures/custom/wall_glow", "noshader"])
+        self.assertEqual(list(shaders.surface_flags), [0, 0, 0])
+        self.assertEqual(list(shaders)[0], ("textures/base_wall/metal", 0, 1))
+
+    def test_validation(self):
+        with self.assertRaises(BadHeaderError):
+            BSPFile(self.bsp_data[:100])
+        with self.assertRaises(BadVersionError):
+            BSPFile(self.bsp_data[:4] + b"\x2f\0\0\0" + self.bsp_data[8:])
+        with self.assertRaises(BadLumpError):
+            BSPFile(self.bsp_data[:-1])
+        bad_shaders = bytearray(self.bsp_data)
+        struct.pack_into("<i", bad_shaders, 8 + 8 + 4, 71)
+        with self.assertRaises(BadLumpError):
+            BSPFile(bad_shaders).shaders()
+
+    def test_read_lumps(self):
+        bsp = BSPFile(self.bsp_data)
+        stream = io.BytesIO(self.bsp_data)
+        lumps = lump_directory(stream.read(bsp_header_size), len(self.bsp_data))
+        self.assertEqual(lumps, bsp.lumps)
+        seeks = []
+        with patch.object(
+            stream, "seek", side_effect=lambda offset: seeks.append(offset) or io.BytesIO.seek(stream, offset)
+        ):
+            shaders, entities = read_lumps(stream, lumps, [1, 0])
+        self.assertEqual((shaders, entities), (bytes(bsp.lump(1)), bytes(bsp.lump(0))))
+        self.assertEqual(seeks, sorted(seeks))
+        with self.assertRaises(LimitExceededError):
+            read_lumps(stream, lumps, [0, 1], max_length=len(shaders) - 1)
+
+    def test_shader_names(self):
+        self.assertEqual(list(shader_names(shader_script)), ["textures/custom/wall_glow", "textures/custom/sky"])
+        self.assertEqual(asset_key("Textures\\Base_Wall\\Metal.TGA"), "textures/base_wall/metal")
+        self.assertEqual(asset_key("sound/world/hum.wav"), "sound/world/hum.wav")
+
+    def test_asset_index(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            base = os.path.join(tmp_dir, "base.pk3")
+            with ZipFile(base, "w") as zip_obj:
+                zip_obj.writestr("textures/base_wall/metal.jpg", b"jpeg")
+            custom = os.path.join(tmp_dir, "custom.pk3")
+            write_pk3(custom, {"custom1": self.bsp_data})
+            with ZipFile(custom, "a") as zip_obj:
+                zip_obj.writestr("scripts/custom.shader", shader_script)
+            broken = write_pk3(
+                os.path.join(tmp_dir, "broken.pk3"), {"broken1": bsp_bytes([], shaders=["textures/lost/gone"])}
+            )
+
+            index = AssetIndex()
+            index.add([tmp_dir])
+            self.assertEqual(
+                sorted((m.map_name, m.model_count, len(m.shaders)) for m in index.maps),
+                [("broken1", 0, 1), ("custom1", 3, 3)],
+            )
+            self.assertEqual(index.missing(), {(broken, "broken1"): ["textures/lost/gone"]})
+            self.assertEqual(index.dependencies(custom), {base})
+            self.assertEqual(index.dependencies(base), set())
+
+            # only broken1 has a shaders lump small enough
+            index = AssetIndex(ResourceLimits(max_lump_size=100))
+            with self.assertLogs("bspp.assets", "WARNING"):
+                index.add([tmp_dir])
+            self.assertEqual([m.map_name for m in index.maps], ["broken1"])
+
+    def test_asset_index_failures(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            pk3_file = os.path.join(tmp_dir, "scripts.pk3")
+            with ZipFile(pk3_file, "w", ZIP_DEFLATED) as zip_obj:
+                zip_obj.writestr("scripts/big.shader", shader_script * 10)
+                zip_obj.writestr("scripts/corrupt.shader", shader_script.replace("custom", "corrupt") * 10)
+                zip_obj.writestr("scripts/small.shader", "textures/small/floor { }")
+                zip_obj.writestr("maps/good.bsp", self.bsp_data)
+            with ZipFile(pk3_file) as zip_obj:
+                corrupt = zip_obj.getinfo("scripts/corrupt.shader")
+            with open(pk3_file, "r+b") as f:
+                f.seek(corrupt.header_offset + 30 + len(corrupt.filename) + 10)
+                f.write(b"\xff" * 10)
+            with open(os.path.join(tmp_dir, "bad.pk3"), "wb") as f:
+                f.write(b"not a zip")
+
+            index = AssetIndex(ResourceLimits(max_lump_size=len(shader_script) * 5))
+            with self.assertLogs("bspp.assets", "WARNING") as logs:
+                index.add([tmp_dir])
+            self.assertEqual(len(logs.records), 3)
+            self.assertIn("textures/small/floor", index.providers)
+            self.assertNotIn("textures/custom/sky", index.providers)
+            self.assertNotIn("textures/corrupt/sky", index.providers)
+            self.assertEqual([m.map_name for m in index.maps], ["good"])
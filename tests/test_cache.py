@@ -0,0 +1,46 @@
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+from bspp import bspp
+from bspp.bspp import Parallelism, ProcessOptions
+from bspp.cache import ResultCache
+from bench.synthetic import bsp_bytes, map_entities, write_pk3
+
+
+class TestCache(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.pk3_file = write_pk3(
+            os.path.join(self.tmp_dir.name, "pack.pk3"),
+            {"one": bsp_bytes(map_entities("One", {"item_quad": 1})), "two": bsp_bytes(map_entities("Two", {}))},
+        )
+        self.cache = ResultCache(os.path.join(self.tmp_dir.name, "cache.db"))
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp_dir.cleanup()
+
+    def test_hit_skips_decompression(self):
+        first = bspp.process_pk3_file(self.pk3_file, ProcessOptions(self.cache))
+        with patch.object(bspp, "process_pk3_zip") as process_pk3_zip:
+            second = bspp.process_pk3_file(self.pk3_file, ProcessOptions(self.cache))
+            process_pk3_zip.assert_not_called()
+        self.assertEqual(second, first)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_parallel_uses_cache(self):
+        first = list(bspp.process([self.pk3_file], ProcessOptions(self.cache, parallel=Parallelism(2))))
+        second = list(bspp.process([self.pk3_file], ProcessOptions(self.cache, parallel=Parallelism(2))))
+        self.assertEqual(second, first)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_evict_stale(self):
+        bspp.process_pk3_file(self.pk3_file, ProcessOptions(self.cache))
+        write_pk3(self.pk3_file, {"one": bsp_bytes(map_entities("Changed", {}))})
+        os.utime(self.pk3_file, ns=(0, 0))
+        self.assertEqual(self.cache.evict_stale(), 1)
+        pk3 = bspp.process_pk3_file(self.pk3_file, ProcessOptions(self.cache))
+        self.assertEqual(len(pk3.map_entities), 1)
+        self.assertEqual(self.cache.misses, 2)
@@ -0,0 +1,106 @@
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from unittest import TestCase
+from unittest.mock import patch
+
+from bspp import bspp, cli
+from bench.synthetic import bsp_bytes, map_entities, write_pk3
+
+
+class TestCli(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.pk3_files = [
+            write_pk3(
+                os.path.join(self.tmp_dir.name, f"pack{i}.pk3"),
+                {f"map{i}": bsp_bytes(map_entities(f"Map {i}", {"weapon_railgun": i + 1}))},
+            )
+            for i in range(2)
+        ]
+
+    def run_cli(self, args, stdin=""):
+        out = io.StringIO()
+        with patch.object(sys, "stdin", io.StringIO(stdin)), patch.object(sys, "stdout", out):
+            cli.main(args)
+        return out.getvalue()
+
+    def test_file_names(self):
+        self.assertTrue(bspp.is_pk3_bsp("maps/q3dm17.bsp"))
+        self.assertTrue(bspp.is_pk3_bsp("MAPS/Q3DM17.BSP"))
+        self.assertTrue(bspp.is_pk3_bsp("maps/sub/q3dm17.bsp"))
+        self.assertFalse(bspp.is_pk3_bsp("maps/.bsp"))
+        self.assertFalse(bspp.is_pk3_bsp("maps/q3dm17.v2.bsp"))
+        self.assertFalse(bspp.is_pk3_bsp("levelshots/q3dm17.bsp"))
+        self.assertFalse(bspp.is_pk3_bsp("maps/q3dm17.aas"))
+        self.assertTrue(bspp.is_bsp("q3dm17.BSP"))
+        self.assertFalse(bspp.is_bsp(".bsp"))
+
+    def test_stdin(self):
+        missing = os.path.join(self.tmp_dir.name, "missing.pk3")
+        lines = self.run_cli(["--stdin", "-J", "-k"], f"{self.pk3_files[0]}\n\n{missing}\n{self.pk3_files[1]}\n")
+        records = [json.loads(line) for line in lines.splitlines()]
+        self.assertEqual(
+            [r.get("pk3_name") or r.get("file_name") for r in records], [self.pk3_files[0], missing, self.pk3_files[1]]
+        )
+        self.assertEqual(records[1]["error_type"], "FileNotFoundError")
+        # each line would be scanned alone, marking the rest of the manifest as removed
+        with patch.object(sys, "stderr", io.StringIO()), self.assertRaises(SystemExit):
+            self.run_cli(["--stdin", "--manifest", os.path.join(self.tmp_dir.name, "manifest.json")], "")
+
+    def test_stdin_pool(self):
+        with patch("concurrent.futures.ProcessPoolExecutor", wraps=ProcessPoolExecutor) as pool:
+            lines = self.run_cli(["--stdin", "-J", "-P", "2"], "".join(f"{pk3}\n" for pk3 in self.pk3_files))
+        self.assertEqual([json.loads(line)["pk3_name"] for line in lines.splitlines()], self.pk3_files)
+        # every line is processed by the pool of the session
+        self.assertEqual(pool.call_count, 1)
+
+    def test_outputs(self):
+        self.assertEqual(json.loads(self.run_cli(["-j", self.pk3_files[0]]))[0]["pk3_name"], self.pk3_files[0])
+        self.assertIn("Map 1", self.run_cli([self.pk3_files[1]]))
+        self.assertIn("map0", self.run_cli(["--list", self.tmp_dir.name]))
+        with patch.object(sys, "stderr", io.StringIO()), self.assertRaises(SystemExit):
+            self.run_cli([])
+
+    def test_list_keep_going(self):
+        corrupt = os.path.join(self.tmp_dir.name, "corrupt.pk3")
+        with open(corrupt, "wb") as f:
+            f.write(b"PK\x03\x04 truncated")
+        with self.assertLogs("bspp", "WARNING"):
+            records = [
+                json.loads(line) for line in self.run_cli(["-k", "-J", "--list", self.tmp_dir.name]).splitlines()
+            ]
+        self.assertEqual(
+            sorted(r.get("pk3_name") or r.get("file_name") for r in records), sorted([corrupt, *self.pk3_files])
+        )
+        self.assertEqual([r["error_type"] for r in records if "error_type" in r], ["BadZipFile"])
+        with self.assertLogs("bspp", "WARNING"):
+            self.assertIn(f"Failed: {corrupt}", self.run_cli(["-k", "--list", self.tmp_dir.name]))
+
+    def test_lazy_imports(self):
+        heavy = ["argparse", "concurrent.futures", "mmap", "numpy", "sqlite3", "zipfile"] + [
+            f"bspp.{module}"
+            for module in ("cache", "dedup", "hash", "limits", "parallel", "postprocess", "stats", "zipdir")
+        ]
+        script = f"import sys; from bspp import bspp, cli; print([m for m in {heavy!r} if m in sys.modules])"
+        loaded = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True).stdout
+        self.assertEqual(loaded.strip(), "[]")
+
+        # a run on a single file, as `python -m bspp.bspp`, which is reused by the command line instead of run twice
+        pool = ["concurrent.futures", "queue", "mmap", "numpy", "sqlite3"] + [
+            f"bspp.{module}" for module in ("cache", "dedup", "limits", "parallel", "zipdir")
+        ]
+        script = (
+            f"import runpy, sys; sys.argv = ['bspp', '-J', {self.pk3_files[0]!r}]; "
+            "runpy.run_module('bspp.bspp', run_name='__main__', alter_sys=True); "
+            f"print([m for m in {pool!r} if m in sys.modules], sys.modules['bspp.bspp'].__name__)"
+        )
+        run = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True).stdout
+        record, loaded = run.splitlines()
+        self.assertEqual(json.loads(record)["pk3_name"], self.pk3_files[0])
+        self.assertEqual(loaded, "[] __main__")
@@ -0,0 +1,67 @@
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+from bspp import bspp
+from bspp.bspp import Parallelism, ProcessOptions
+from bspp.dedup import MapStore
+from bspp.postprocess import pp_entity_filter
+from bench.synthetic import bsp_bytes, map_entities, write_pk3
+
+
+class TestDedup(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        shared = bsp_bytes(map_entities("Shared", {"weapon_railgun": 2}))
+        self.pk3_files = [
+            write_pk3(
+                os.path.join(self.tmp_dir.name, f"pack{i}.pk3"),
+                {"shared": shared, f"own{i}": bsp_bytes(map_entities(f"Own {i}", {"item_quad": i + 1}))},
+            )
+            for i in range(4)
+        ]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_copies_parsed_once(self):
+        store = MapStore()
+        with patch.object(bspp, "lump_entities", wraps=bspp.lump_entities) as lump_entities:
+            deduplicated = list(bspp.process(self.pk3_files, ProcessOptions(map_store=store)))
+        self.assertEqual(lump_entities.call_count, 5)
+        self.assertEqual(deduplicated, list(bspp.process(self.pk3_files)))
+        self.assertEqual((store.hits, store.misses), (3, 5))
+        self.assertAlmostEqual(store.ratio, 3 / 8)
+
+    def test_entity_filter_in_key(self):
+        store = MapStore()
+        bspp.process_pk3_file(self.pk3_files[0], ProcessOptions(map_store=store))
+        filtered = bspp.process_pk3_file(
+            self.pk3_files[1], ProcessOptions(entity_filter=pp_entity_filter, map_store=store)
+        )
+        self.assertEqual(store.hits, 0)
+        self.assertEqual(
+            filtered, bspp.process_pk3_file(self.pk3_files[1], ProcessOptions(entity_filter=pp_entity_filter))
+        )
+
+    def test_lru_eviction(self):
+        store = MapStore(max_entries=1)
+        list(bspp.process(self.pk3_files, ProcessOptions(map_store=store)))
+        self.assertEqual(len(store), 1)
+        self.assertEqual(store.hits, 0)
+
+    def test_persistent_store(self):
+        db_file = os.path.join(self.tmp_dir.name, "maps.db")
+        with MapStore(db_file=db_file) as store:
+            first = bspp.process_pk3_file(self.pk3_files[0], ProcessOptions(map_store=store))
+        with MapStore(db_file=db_file) as store:
+            self.assertEqual(bspp.process_pk3_file(self.pk3_files[0], ProcessOptions(map_store=store)), first)
+            self.assertEqual((store.hits, store.misses), (2, 0))
+
+    def test_parallel_counts(self):
+        store = MapStore()
+        results = list(bspp.process(self.pk3_files, ProcessOptions(map_store=store, parallel=Parallelism(2, True))))
+        self.assertEqual(results, list(bspp.process(self.pk3_files)))
+        self.assertEqual(store.hits + store.misses, 8)
+        self.assertGreaterEqual(store.hits, 1)
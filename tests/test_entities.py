@@ -0,0 +1,63 @@
+from unittest import TestCase
+
+from bspp import bspp
+from bspp.errors import ParseError
+from bspp.model import MapEntities
+from bspp.postprocess import pp_map, pp_entity_filter
+from bench.synthetic import bsp_bytes, entities_lump, map_entities
+
+
+class TestEntities(TestCase):
+    def test_matches_line_parser(self):
+        lump = entities_lump(map_entities("Lines", {"light": 3, "weapon_railgun": 2}))[:-1]
+        expected = list(bspp.parse_entity_obj(str(lump, encoding="ascii").splitlines()))
+        self.assertEqual(list(bspp.parse_entities(lump)), expected)
+
+    def test_free_form_layout(self):
+        lump = b'{ "classname" "worldspawn" "message" "Tight" }{"classname"\n\t"light" "light" "300"\r\n}\n\0'
+        self.assertEqual(
+            list(bspp.parse_entities(lump)),
+            [{"classname": "worldspawn", "message": "Tight"}, {"classname": "light", "light": "300"}],
+        )
+
+    def test_skips_objects_without_classname(self):
+        self.assertEqual(list(bspp.parse_entities(b'{ "origin" "0 0 0" }\n{\n}\n')), [])
+
+    def test_error_offsets(self):
+        cases = {
+            b'{ "classname" "light" } x': "Unexpected character 'x' at byte 24",
+            b'"classname" "light" }': "Expected object open curly at byte 0",
+            b'{ "classname" "light" "origin" }': "Expected string literal value at byte 31",
+            b'{ "classname" { }': "Expected string literal key at byte 14",
+            b'{ "classname" "light }': "Unterminated string literal at byte 14",
+            b'{ "classname" "l\xe9ght" }': "Non-ASCII character at byte 16",
+        }
+        for lump, message in cases.items():
+            with self.assertRaises(ParseError) as context:
+                list(bspp.parse_entities(lump))
+            self.assertEqual(str(context.exception), message)
+
+    def test_projection(self):
+        lump = entities_lump(map_entities("Projected", {"light": 3, "weapon_railgun": 2}))
+        self.assertEqual(
+            list(bspp.parse_entities(lump, classnames={"worldspawn", "weapon_railgun"}, keys={"message"})),
+            [{"classname": "worldspawn", "message": "Projected"}] + [{"classname": "weapon_railgun"}] * 2,
+        )
+        self.assertEqual(len(list(bspp.parse_entities(lump, classnames=lambda c: c.startswith("li")))), 3)
+        self.assertEqual(
+            bspp.count_entities(lump),
+            {"worldspawn": 1, "light": 3, "weapon_railgun": 2},
+        )
+        self.assertEqual(bspp.count_entities(lump, classnames={"light"}), {"light": 3})
+
+    def test_pp_map_on_filtered_entities(self):
+        items = {"light": 5, "misc_model": 2, "item_quad": 1, "weapon_railgun": 2, "team_CTF_neutralflag": 1}
+        bsp_data = bsp_bytes(map_entities("Filtered", items))
+        full = MapEntities("filtered", b"\0" * 4, bspp.process_entities(bsp_data))
+        filtered = MapEntities(
+            "filtered",
+            b"\0" * 4,
+            bspp.process_entities(bsp_data, pp_entity_filter.accepts, pp_entity_filter.keys),
+        )
+        self.assertEqual(len(filtered.entities), 5)
+        self.assertEqual(pp_map(filtered), pp_map(full))
@@ -0,0 +1,99 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from bspp import bspp
+from bspp.bspp import Parallelism, ProcessOptions
+from bspp.cache import ResultCache
+from bspp.errors import BadHeaderError, BadLumpError, BadVersionError, ParseError, SkipList
+from bspp.model import FileError, PK3Entity
+from bench.synthetic import bsp_bytes, map_entities, write_pk3
+
+
+class TestErrors(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        good = bsp_bytes(map_entities("Good", {"item_quad": 1}))
+        self.bad_version = good[:4] + b"\x2f\0\0\0" + good[8:]
+        self.mixed_pk3 = write_pk3(
+            os.path.join(self.tmp_dir.name, "mixed.pk3"), {"good": good, "bad": self.bad_version}
+        )
+        self.good_pk3 = write_pk3(os.path.join(self.tmp_dir.name, "good.pk3"), {"good": good})
+        self.corrupt_pk3 = os.path.join(self.tmp_dir.name, "corrupt.pk3")
+        with open(self.corrupt_pk3, "wb") as f:
+            f.write(b"PK\x03\x04 truncated")
+        self.files = [self.corrupt_pk3, self.good_pk3, self.mixed_pk3]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_typed_exceptions(self):
+        good = bsp_bytes(map_entities("Good", {}))
+        with self.assertRaises(BadHeaderError):
+            bspp.get_lump(b"IBSX" + good[4:], 0)
+        with self.assertRaises(BadVersionError):
+            bspp.get_lump(self.bad_version, 0)
+        with self.assertRaises(BadLumpError):
+            bspp.get_lump(good[:-1], 0)
+        with self.assertRaises(ParseError) as context:
+            list(bspp.parse_entities(b'{ "classname" "light" } x'))
+        self.assertEqual(context.exception.position, 24)
+        with self.assertRaises(ParseError) as context:
+            list(bspp.parse_entity_obj(["{", '"classname" "light"', "x"]))
+        self.assertEqual(context.exception.position, 3)
+
+    def assertResilientResults(self, results):
+        errors = [r for r in results if isinstance(r, FileError)]
+        self.assertEqual(
+            sorted((e.file_name, e.map_name, e.error_type) for e in errors),
+            [(self.corrupt_pk3, None, "BadZipFile"), (self.mixed_pk3, "bad", "BadVersionError")],
+        )
+        mixed = next(r for r in results if isinstance(r, PK3Entity) and r.pk3_name == self.mixed_pk3)
+        self.assertEqual([m.map_name for m in mixed.map_entities], ["good"])
+        self.assertEqual(len(results), 4)
+
+    def test_resilient(self):
+        with self.assertRaises(Exception):
+            list(bspp.process(self.files))
+        self.assertResilientResults(list(bspp.process(self.files, ProcessOptions(resilient=True))))
+
+    def test_resilient_parallel(self):
+        self.assertResilientResults(
+            list(bspp.process(self.files, ProcessOptions(resilient=True, parallel=Parallelism(2))))
+        )
+        with ResultCache(os.path.join(self.tmp_dir.name, "cache.db")) as cache:
+            # the archives are fingerprinted for the cache in this process
+            self.assertResilientResults(
+                list(bspp.process(self.files, ProcessOptions(cache, resilient=True, parallel=Parallelism(2))))
+            )
+
+    def test_no_worldspawn(self):
+        lights = bsp_bytes([{"classname": "light"}])
+        write_pk3(self.mixed_pk3, {"good": bsp_bytes(map_entities("Good", {})), "bad": lights})
+        results = list(bspp.process([self.mixed_pk3], ProcessOptions(resilient=True)))
+        self.assertEqual([m.map_name for m in results[0].map_entities], ["good"])
+        self.assertEqual((results[1].map_name, results[1].error_type), ("bad", "ParseError"))
+        self.assertEqual(len(bspp.process_entities(lights, {"light"})), 1)
+
+    def test_partial_results_not_cached(self):
+        with ResultCache(os.path.join(self.tmp_dir.name, "cache.db")) as cache:
+            list(bspp.process(self.files, ProcessOptions(cache, resilient=True)))
+            results = list(bspp.process(self.files, ProcessOptions(cache, resilient=True)))
+            self.assertEqual((cache.hits, cache.misses), (1, 3))
+        self.assertResilientResults(results)
+
+    def test_skip_list(self):
+        skip_file = os.path.join(self.tmp_dir.name, "skip.json")
+        skip_list = SkipList(skip_file)
+        self.assertResilientResults(list(bspp.process(self.files, ProcessOptions(skip_list=skip_list))))
+        skip_list.save()
+
+        skip_list = SkipList(skip_file)
+        self.assertEqual(list(skip_list.entries), [os.path.abspath(self.corrupt_pk3)])
+        results = list(bspp.process(self.files, ProcessOptions(skip_list=skip_list)))
+        self.assertEqual([r.file_name for r in results if isinstance(r, FileError)], [self.mixed_pk3])
+
+        os.utime(self.corrupt_pk3, ns=(0, 0))
+        results = list(bspp.process(self.files, ProcessOptions(skip_list=skip_list)))
+        self.assertResilientResults(results)
+        self.assertEqual(len(skip_list), 1)
@@ -0,0 +1,93 @@
+import io
+import json
+import os
+import tempfile
+from contextlib import redirect_stdout
+from unittest import TestCase
+
+from bspp import bspp, cli, index
+from bspp.index import MapIndex
+from bspp.postprocess import pp_pk3
+from bench.synthetic import bsp_bytes, map_entities, write_pk3
+
+ctf_flags = {"team_CTF_redflag": 1, "team_CTF_blueflag": 1}
+
+
+class TestIndex(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.pk3_dir = os.path.join(self.tmp_dir.name, "baseq3")
+        os.mkdir(self.pk3_dir)
+        self.write("ctf.pk3", {"rail": ("Rail Arena", {"weapon_railgun": 2, "item_quad": 1, **ctf_flags})})
+        self.write("ta.pk3", {"nails": ("Rail Nails", {"weapon_railgun": 3, "item_quad": 1, "weapon_nailgun": 1})})
+        self.write("dm.pk3", {"dm1": ("Deathmatch", {"weapon_railgun": 1}), "dm2": ("Quad Hall", {"item_quad": 2})})
+        self.index = MapIndex(os.path.join(self.tmp_dir.name, "index.db"))
+        self.index.update([self.pk3_dir])
+
+    def tearDown(self):
+        self.index.close()
+        self.tmp_dir.cleanup()
+
+    def write(self, name, maps):
+        return write_pk3(
+            os.path.join(self.pk3_dir, name),
+            {map_name: bsp_bytes(map_entities(title, items)) for map_name, (title, items) in maps.items()},
+        )
+
+    def names(self, **kwargs):
+        return [indexed.map.map_name for indexed in self.index.query(**kwargs)]
+
+    def test_query(self):
+        self.assertEqual(len(self.index), 4)
+        self.assertEqual(
+            self.names(flags={"requires_ta": False}, min_counts={"weapon_railgun": 2, "item_quad": 1}), ["rail"]
+        )
+        self.assertEqual(self.names(flags={"ctf_capable": True}), ["rail"])
+        self.assertEqual(self.names(min_counts={"weapon_railgun": 2}), ["rail", "nails"])
+        self.assertEqual(self.names(max_counts={"weapon_railgun": 0}), ["dm2"])
+        self.assertEqual(self.names(title_prefix="rail"), ["rail", "nails"])
+        with self.assertRaises(ValueError):
+            self.index.query(flags={"bogus": True})
+
+    def test_round_trip(self):
+        pk3_file = os.path.join(self.pk3_dir, "dm.pk3")
+        expected = {m.map_name: m for m in pp_pk3(bspp.process_pk3_file(pk3_file)).maps}
+        for indexed in self.index.query(title_prefix=""):
+            if indexed.pk3_name == os.path.abspath(pk3_file):
+                self.assertEqual(indexed.map, expected.pop(indexed.map.map_name))
+        self.assertEqual(expected, {})
+
+    def test_incremental_update(self):
+        self.write("dm.pk3", {"dm1": ("Deathmatch Redux", {"weapon_railgun": 1})})
+        os.utime(os.path.join(self.pk3_dir, "dm.pk3"), ns=(0, 0))
+        os.remove(os.path.join(self.pk3_dir, "ta.pk3"))
+        os.utime(os.path.join(self.pk3_dir, "ctf.pk3"), ns=(0, 0))
+
+        delta = self.index.update([self.pk3_dir])
+        self.assertEqual((len(delta.added), len(delta.changed), len(delta.removed)), (0, 1, 1))
+        self.assertEqual(self.names(), ["dm1", "rail"])
+        self.assertFalse(self.index.update([self.pk3_dir]))
+
+    def test_failures(self):
+        good = bsp_bytes(map_entities("Good", {"item_quad": 1}))
+        write_pk3(os.path.join(self.pk3_dir, "broken.pk3"), {"good": good, "bad": b"IBSP"})
+        with open(os.path.join(self.pk3_dir, "bad.pk3"), "wb") as f:
+            f.write(b"not a zip")
+
+        with self.assertLogs("bspp", "WARNING"):
+            self.index.update([self.pk3_dir])
+        self.assertIn("good", self.names())
+        failures = {(os.path.basename(f.file_name), f.map_name, f.error_type) for f in self.index.failures()}
+        self.assertEqual(failures, {("bad.pk3", None, "BadZipFile"), ("broken.pk3", "bad", "BadHeaderError")})
+        # failed archives are only retried once they change
+        self.assertFalse(self.index.update([self.pk3_dir]))
+
+    def test_cli(self):
+        out = io.StringIO()
+        with redirect_stdout(out):
+            index.main(["query", self.index.db_file, "--no-flag", "requires_ta", "--min", "weapon_railgun=2", "-j"])
+        self.assertEqual([m["map"]["map_name"] for m in json.loads(out.getvalue())], ["rail"])
+        out = io.StringIO()
+        with redirect_stdout(out):
+            cli.main(["query", self.index.db_file, "--title", "quad"])
+        self.assertEqual(out.getvalue().split("\t")[1:], ["dm2", "Quad Hall\n"])
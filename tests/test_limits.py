@@ -0,0 +1,95 @@
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase
+from unittest.mock import patch
+
+from bspp import bspp
+from bspp.bspfile import BSPFile
+from bspp.bspp import Parallelism, ProcessOptions
+from bspp.errors import LimitExceededError
+from bspp.limits import MemoryBudget, ResourceLimits, entity_overhead, memory_report
+from bspp.model import FileError, PK3Entity
+from bspp.parallel import Schedule, executor_map
+from bench.synthetic import bsp_bytes, map_entities, write_pk3
+
+
+class TestLimits(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.good = bsp_bytes(map_entities("Good", {"weapon_railgun": 1}), padding=10_000, seed=1)
+        # a repeating filler deflates far better than any real map
+        self.bomb = bsp_bytes(map_entities("Bomb", {"weapon_railgun": 1}), padding=4_000_000)
+        self.pk3_file = write_pk3(os.path.join(self.tmp_dir.name, "mixed.pk3"), {"good": self.good, "bomb": self.bomb})
+
+    def test_compression_ratio(self):
+        limits = ResourceLimits()
+        results = list(bspp.process([self.pk3_file], ProcessOptions(limits=limits, resilient=True)))
+        self.assertEqual([m.map_name for m in results[0].map_entities], ["good"])
+        self.assertIsInstance(results[1], FileError)
+        self.assertEqual((results[1].map_name, results[1].error_type), ("bomb", "LimitExceededError"))
+        self.assertEqual(
+            len(list(bspp.process([self.pk3_file], ProcessOptions(limits=ResourceLimits(max_ratio=10_000))))), 1
+        )
+        with self.assertRaises(LimitExceededError):
+            list(bspp.process([self.pk3_file], ProcessOptions(limits=limits)))
+
+    def test_sizes(self):
+        options = ProcessOptions(limits=ResourceLimits(max_member_size=100_000), resilient=True)
+        results = list(bspp.process([self.pk3_file], options))
+        self.assertEqual([m.map_name for m in results[0].map_entities], ["good"])
+        # the entities lump of the good map is about 90 bytes
+        limits = ResourceLimits(memory_budget=16 * 40)
+        self.assertEqual(limits.lump_limit, 40)
+        results = list(bspp.process([self.pk3_file], ProcessOptions(limits=limits, resilient=True)))
+        self.assertEqual([r.map_name for r in results[1:]], ["good", "bomb"])
+        self.assertIn("Lump of", results[1].message)
+        bsp_file = os.path.join(self.tmp_dir.name, "good.bsp")
+        with open(bsp_file, "wb") as f:
+            f.write(self.good)
+        with self.assertRaises(LimitExceededError):
+            bspp.process_map_file(bsp_file, ProcessOptions(limits=limits))
+
+    def test_budget(self):
+        budget = MemoryBudget(10)
+        in_flight = []
+
+        def task(weight):
+            in_flight.append(budget.in_flight)
+            return weight
+
+        weights = [4, 4, 4, 20, 1, 1]
+        with ThreadPoolExecutor(4) as executor:
+            schedule = Schedule(True, budget=budget, weight=lambda w: w)
+            results = list(executor_map(executor, task, weights, 4, schedule))
+        self.assertEqual(results, weights)
+        self.assertTrue(all(w <= 10 for w in in_flight[:3]))
+        # larger than the whole budget, processed alone
+        self.assertEqual(in_flight[3], 20)
+        self.assertEqual((budget.in_flight, budget.peak), (0, 20))
+
+    def test_parallel_budget(self):
+        pk3_files = [
+            write_pk3(os.path.join(self.tmp_dir.name, f"pack{i}.pk3"), {f"map{i}": self.good}) for i in range(4)
+        ]
+        # the entities lump only, not the whole map
+        weight = BSPFile(self.good).lumps[0][1] * entity_overhead
+        self.assertLess(weight, len(self.good))
+        self.assertEqual(bspp.memory_estimate(pk3_files[0]), weight)
+        self.assertEqual(bspp.memory_estimate(self.pk3_file), weight)
+        # the entities lump can't be larger than the lump limit
+        self.assertEqual(bspp.memory_estimate(pk3_files[0], ResourceLimits(memory_budget=16 * 40)), 16 * 40)
+        self.assertEqual(bspp.memory_estimate(os.path.join(self.tmp_dir.name, "missing.pk3")), 0)
+        budget = MemoryBudget(weight * 2)
+        options = ProcessOptions(limits=ResourceLimits(), parallel=Parallelism(4, True, budget))
+        results = list(bspp.process(pk3_files, options))
+        self.assertEqual([r.pk3_name for r in results if isinstance(r, PK3Entity)], pk3_files)
+        self.assertEqual(budget.peak, weight * 2)
+
+        # one file at a time in the calling process, nothing to estimate
+        budget = MemoryBudget(weight * 2)
+        with patch.object(bspp, "memory_estimate") as memory_estimate:
+            self.assertEqual(len(list(bspp.process(pk3_files, ProcessOptions(parallel=Parallelism(budget=budget))))), 4)
+        memory_estimate.assert_not_called()
+        self.assertIn("of 0.0 MiB budget", memory_report(MemoryBudget(1)))
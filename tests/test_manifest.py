@@ -0,0 +1,59 @@
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+from bspp import cache
+from bspp.manifest import Manifest, watch
+from bench.synthetic import bsp_bytes, map_entities, write_pk3
+
+
+class TestManifest(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.manifest_file = os.path.join(self.tmp_dir.name, "manifest.json")
+        self.pk3_dir = os.path.join(self.tmp_dir.name, "baseq3")
+        os.mkdir(self.pk3_dir)
+        self.pk3_files = [self.write(f"pack{i}.pk3", f"Map {i}") for i in range(3)]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, name: str, title: str) -> str:
+        return write_pk3(os.path.join(self.pk3_dir, name), {"map": bsp_bytes(map_entities(title, {}))})
+
+    def test_rescan(self):
+        manifest = Manifest(self.manifest_file)
+        self.assertEqual(sorted(manifest.scan([self.pk3_dir]).added), self.pk3_files)
+        manifest.save()
+
+        self.write("pack0.pk3", "Changed")
+        os.utime(self.pk3_files[0], ns=(0, 0))
+        os.remove(self.pk3_files[1])
+        new_file = self.write("new.pk3", "New")
+
+        delta = Manifest(self.manifest_file).scan([self.pk3_dir])
+        self.assertEqual(delta.added, [new_file])
+        self.assertEqual(delta.changed, [self.pk3_files[0]])
+        self.assertEqual(delta.removed, [os.path.abspath(self.pk3_files[1])])
+
+    def test_unchanged_costs_stat_only(self):
+        manifest = Manifest(self.manifest_file)
+        manifest.scan([self.pk3_dir])
+        manifest.save()
+        os.utime(self.pk3_files[2], ns=(0, 0))
+        with patch.object(cache, "pk3_hash_info", wraps=cache.pk3_hash_info) as pk3_hash_info:
+            delta = Manifest(self.manifest_file).scan([self.pk3_dir])
+        # touched, but the same content
+        self.assertFalse(delta)
+        self.assertEqual(pk3_hash_info.call_count, 1)
+
+    def test_watch(self):
+        manifest = Manifest()
+
+        def sleep(_):
+            self.write("late.pk3", "Late")
+
+        deltas = watch([self.pk3_dir], manifest, 1, sleep)
+        self.assertEqual(len(next(deltas).added), 3)
+        self.assertEqual([os.path.basename(f) for f in next(deltas).added], ["late.pk3"])
@@ -0,0 +1,33 @@
+import os
+from unittest import TestCase
+from unittest.mock import patch
+
+from bspp import hash as bspp_hash
+from bspp.md4 import MD4
+
+
+class TestMD4(TestCase):
+    def test_rfc1320_vectors(self):
+        vectors = {
+            b"": "31d6cfe0d16ae931b73c59d7e0c089c0",
+            b"a": "bde52cb31de33e46245e05fbdbd6fb24",
+            b"abc": "a448017aaf21d8525fc10ae87aa6729d",
+            b"message digest": "d9130a8164549fe818874806e1c7014b",
+            b"abcdefghijklmnopqrstuvwxyz": "d79e1c308aa5bbcdeea8ed63df412da9",
+            b"1234567890" * 8: "e33b4ddc9c38f2199c3e7b164fcc0536",
+        }
+        for message, digest in vectors.items():
+            self.assertEqual(MD4(message).hexdigest(), digest)
+
+    def test_chunked_updates(self):
+        data = os.urandom(70_000)
+        expected = MD4(data).digest()
+        for chunk in (1, 63, 64, 65, 4096):
+            md4 = MD4()
+            for ofs in range(0, len(data), chunk):
+                md4.update(data[ofs : ofs + chunk])
+            self.assertEqual(md4.digest(), expected)
+
+    def test_bsp_hash_fallback(self):
+        with patch.object(bspp_hash, "md4_new", MD4):
+            self.assertEqual(bspp_hash.bsp_hash(b"message digest").hex(), "24dc0744")
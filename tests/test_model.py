@@ -0,0 +1,43 @@
+import pickle
+from unittest import TestCase
+
+from bspp import bspp
+from bspp.model import EntityTable, MapEntities, StringTable
+from bspp.postprocess import aggregate_by_classname, pp_map
+from bench.synthetic import bsp_bytes, map_entities
+
+
+class TestEntityTable(TestCase):
+    def setUp(self):
+        bsp_data = bsp_bytes(map_entities("Compact", {"light": 4, "item_quad": 1, "weapon_railgun": 2}))
+        self.map_entities = MapEntities("compact", b"\0" * 4, bspp.process_entities(bsp_data))
+
+    def test_mapping_views(self):
+        table = EntityTable([{"classname": "light", "light": "300"}, {"classname": "worldspawn"}])
+        self.assertEqual(len(table), 2)
+        self.assertEqual(table[0]["light"], "300")
+        self.assertEqual(dict(table[-1]), {"classname": "worldspawn"})
+        self.assertIsNone(table[1].get("message"))
+        self.assertEqual(list(table.classnames()), ["light", "worldspawn"])
+        with self.assertRaises(KeyError):
+            _ = table[0]["message"]
+        with self.assertRaises(IndexError):
+            _ = table[2]
+
+    def test_compacted_map(self):
+        compact = self.map_entities.compacted()
+        self.assertIsInstance(compact.entities, EntityTable)
+        self.assertEqual(compact.entities, self.map_entities.entities)
+        self.assertEqual(pp_map(compact), pp_map(self.map_entities))
+        self.assertEqual(
+            {k: len(v) for k, v in aggregate_by_classname(compact.entities).items()},
+            {k: len(v) for k, v in aggregate_by_classname(self.map_entities.entities).items()},
+        )
+        self.assertEqual(pickle.loads(pickle.dumps(compact)), compact)
+
+    def test_shared_strings(self):
+        strings = StringTable()
+        self.map_entities.compacted(strings)
+        vocabulary = len(strings)
+        self.map_entities.compacted(strings)
+        self.assertEqual(len(strings), vocabulary)
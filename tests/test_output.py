@@ -0,0 +1,131 @@
+import io
+import json
+import time
+from unittest import TestCase
+from unittest.mock import patch
+
+from bspp import bspp
+from bspp.model import FileError, MapEntities, MapListing, PK3Entity, PK3Listing
+from bspp.out_plain_text import PlainTextRenderer, plain_listing, plain_text
+from bench.synthetic import map_entities
+
+expected_plain_text = """pack.pk3
+--------
+
+CRC:  05060708 (sv_currentPak: 84281096)
+
+  q3ctf1
+  ======
+
+  Map name: Flags
+  CRC: 01020304 (sv_mapChecksum 16909060)
+
+  Items
+  -----
+
+  Quad damage.......... : ×1
+
+  Weapons
+  -------
+
+  Railgun.............. : ×2
+
+  Properties
+  ----------
+
+  CTF capable.......... : Yes
+
+Failed: pack.pk3: broken
+  BadVersionError: Invalid BSP version
+
+"""
+
+
+class TestJsonLines(TestCase):
+    def setUp(self):
+        self.map = MapEntities("q3dm1", b"\x01\x02\x03\x04", map_entities("Arena", {"weapon_railgun": 2}))
+        self.pk3 = PK3Entity("pack.pk3", b"\x05\x06\x07\x08", [self.map])
+
+    def test_records(self):
+        out = io.StringIO()
+        bspp.json_lines([self.pk3, self.map], out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(json.loads(lines[0]), bspp.pp_pk3(self.pk3).to_json())
+        self.assertEqual(json.loads(lines[1]), bspp.pp_map(self.map).to_json())
+        self.assertEqual(json.loads(lines[1])["aggregated_weapons"], {"weapon_railgun": 2})
+
+    def test_streaming(self):
+        out = io.StringIO()
+
+        def results():
+            yield self.map
+            # the first record is already written when the next one is being processed
+            self.assertEqual(len(out.getvalue().splitlines()), 1)
+            yield self.map
+
+        bspp.json_lines(results(), out)
+        self.assertEqual(len(out.getvalue().splitlines()), 2)
+
+
+class TestPlainText(TestCase):
+    def setUp(self):
+        entities = map_entities(
+            "Flags", {"team_CTF_redflag": 1, "team_CTF_blueflag": 1, "weapon_railgun": 2, "item_quad": 1}
+        )
+        self.pk3 = PK3Entity("pack.pk3", b"\x05\x06\x07\x08", [MapEntities("q3ctf1", b"\x01\x02\x03\x04", entities)])
+        self.error = FileError("pack.pk3", "BadVersionError", "Invalid BSP version", "broken")
+
+    def test_format(self):
+        out = io.StringIO()
+        plain_text([self.pk3, self.error], out)
+        self.assertEqual(out.getvalue(), expected_plain_text)
+
+    def test_batched_writes(self):
+        out = io.StringIO()
+        with patch.object(out, "write", wraps=out.write) as write:
+            PlainTextRenderer(out).write([self.pk3] * 100)
+        self.assertEqual(write.call_count, 1)
+        self.assertEqual(out.getvalue(), "".join(expected_plain_text.split("Failed")[0] for _ in range(100)))
+
+        with patch.object(out, "write", wraps=out.write) as write:
+            PlainTextRenderer(out, buffer_size=1).write([self.pk3] * 3)
+        self.assertEqual(write.call_count, 3)
+
+    def test_max_delay(self):
+        out = io.StringIO()
+
+        def results():
+            yield self.pk3
+            # held back no longer than max_delay, zero here
+            self.assertTrue(out.getvalue())
+            yield self.error
+
+        PlainTextRenderer(out, max_delay=0).write(results())
+        self.assertEqual(out.getvalue(), expected_plain_text)
+
+    def test_slow_results(self):
+        out = io.StringIO()
+
+        def results():
+            yield self.pk3
+            # the next result takes longer than max_delay, the previous one is written meanwhile
+            deadline = time.monotonic() + 5
+            while not out.getvalue() and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertTrue(out.getvalue())
+            yield self.error
+
+        PlainTextRenderer(out, max_delay=0.05).write(results())
+        self.assertEqual(out.getvalue(), expected_plain_text)
+
+    def test_listing(self):
+        listing = PK3Listing("pack.pk3", b"\x05\x06\x07\x08", [MapListing("q3ctf1", 1000), MapListing("dm", 20)])
+        out = io.StringIO()
+        with patch.object(out, "write", wraps=out.write) as write:
+            plain_listing([listing, self.error] * 10, out)
+        self.assertEqual(write.call_count, 1)
+        self.assertEqual(
+            out.getvalue().split("Failed")[0],
+            "pack.pk3\nCRC:  05060708 (sv_currentPak: 84281096)\n  q3ctf1 : 1000 bytes\n  dm.... : 20 bytes\n\n",
+        )
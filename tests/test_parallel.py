@@ -0,0 +1,68 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from bspp import bspp
+from bspp.bspp import Parallelism, ProcessOptions
+from bspp.parallel import prefetched
+from bench.synthetic import bsp_bytes, map_entities, write_pk3
+
+
+class TestParallel(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.pk3_files = [
+            write_pk3(
+                os.path.join(self.tmp_dir.name, f"pack{i}.pk3"),
+                {f"map{i}": bsp_bytes(map_entities(f"Map {i}", {"weapon_railgun": i + 1}))},
+            )
+            for i in range(6)
+        ]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_ordered_matches_sequential(self):
+        sequential = list(bspp.process(self.pk3_files))
+        parallel = list(bspp.process(self.pk3_files, ProcessOptions(parallel=Parallelism(3, True))))
+        self.assertEqual(parallel, sequential)
+
+    def test_unordered_yields_all(self):
+        parallel = list(bspp.process([self.tmp_dir.name], ProcessOptions(parallel=Parallelism(2))))
+        self.assertEqual(sorted(pk3.pk3_name for pk3 in parallel), sorted(self.pk3_files))
+        for pk3 in parallel:
+            self.assertEqual(len(pk3.map_entities), 1)
+
+    def test_laziness(self):
+        results = bspp.process(self.pk3_files, ProcessOptions(parallel=Parallelism(2)))
+        self.assertIsNotNone(next(iter(results)))
+        results.close()
+
+    def test_prefetched(self):
+        self.assertEqual(
+            list(prefetched(bspp.process(self.pk3_files, ProcessOptions(parallel=Parallelism(2, True))), 2)),
+            list(bspp.process(self.pk3_files)),
+        )
+
+        def failing():
+            yield 1
+            raise ValueError("producer failed")
+
+        results = prefetched(failing(), 1)
+        self.assertEqual(next(results), 1)
+        with self.assertRaises(ValueError):
+            next(results)
+
+        closed = []
+
+        def endless():
+            try:
+                while True:
+                    yield 1
+            finally:
+                closed.append(True)
+
+        results = prefetched(endless(), 4)
+        next(results)
+        results.close()
+        self.assertEqual(closed, [True])
@@ -0,0 +1,41 @@
+from unittest import TestCase, skipIf
+from unittest.mock import patch
+
+from bspp import postprocess
+from bspp.model import MapEntities, StringTable
+from bspp.postprocess import pp_map, pp_maps
+from bench.synthetic import map_entities
+
+
+class TestBatch(TestCase):
+    def setUp(self):
+        self.maps = [
+            MapEntities("dm", b"\0\0\0\1", map_entities("DM", {"weapon_railgun": 2, "item_quad": 1, "light": 5})),
+            MapEntities("ctf", b"\0\0\0\2", map_entities("CTF", {"team_CTF_redflag": 1, "team_CTF_blueflag": 1})),
+            MapEntities("ta", b"\0\0\0\3", map_entities("TA", {"weapon_nailgun": 1, "team_neutralobelisk": 1})),
+            MapEntities("1f", b"\0\0\0\4", map_entities("", {"team_CTF_neutralflag": 1, "item_botroam": 3})),
+        ]
+
+    def check_batch(self):
+        batch = pp_maps(self.maps)
+        self.assertEqual(batch.maps, [pp_map(m) for m in self.maps])
+        self.assertEqual(batch.column("weapon_railgun"), [2, 0, 0, 0])
+        self.assertEqual(batch.column("weapon_bfg"), [0, 0, 0, 0])
+        self.assertEqual(batch.totals()["worldspawn"], 4)
+        self.assertEqual(batch.totals()["item_botroam"], 3)
+        self.assertEqual(batch.flag_totals()["requires_ta"], 2)
+        self.assertEqual(pp_maps([]).maps, [])
+
+    def test_matches_pp_map(self):
+        with patch.object(postprocess, "_numpy", return_value=None):
+            self.check_batch()
+
+    def test_entity_tables(self):
+        strings = StringTable()
+        self.maps = [m.compacted(strings) for m in self.maps]
+        with patch.object(postprocess, "_numpy", return_value=None):
+            self.check_batch()
+
+    @skipIf(postprocess._numpy() is None, "NumPy is not installed")
+    def test_numpy(self):
+        self.check_batch()
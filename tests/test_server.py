@@ -0,0 +1,149 @@
+import json
+import os
+import socket
+import tempfile
+import threading
+from contextlib import ExitStack
+from dataclasses import replace
+from http.client import HTTPConnection
+from unittest import TestCase, mock, skipUnless
+
+from bspp.server import MapInfoService, ServiceOptions, make_server, unix_sockets
+from bench.synthetic import bsp_bytes, map_entities, write_pk3
+
+
+class UnixHTTPConnection(HTTPConnection):
+    def __init__(self, path: str):
+        super().__init__("localhost")
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+
+class TestServer(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.pk3_files = [
+            write_pk3(
+                os.path.join(cls.tmp_dir.name, f"pack{i}.pk3"),
+                {f"map{i}": bsp_bytes(map_entities(f"Map {i}", {"weapon_railgun": i + 1}))},
+            )
+            for i in range(3)
+        ]
+        cls.service = MapInfoService(workers=2, options=ServiceOptions(max_batch=4, roots=[cls.tmp_dir.name]))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.service.close()
+        cls.tmp_dir.cleanup()
+
+    def serve(self, address):
+        server = make_server(self.service, address)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+
+        def stop():
+            server.shutdown()
+            server.server_close()
+
+        self.addCleanup(stop)
+        return server
+
+    def request(self, connection: HTTPConnection, method: str, path: str, body=None):
+        connection.request(method, path, body)
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+
+    def test_paths(self):
+        server = self.serve(("127.0.0.1", 0))
+        connection = HTTPConnection(*server.server_address)
+        self.addCleanup(connection.close)
+        body = json.dumps(dict(paths=self.pk3_files + [os.path.join(self.tmp_dir.name, "missing.pk3")]))
+        status, maps = self.request(connection, "POST", "/maps", body)
+        self.assertEqual(status, 200)
+        self.assertEqual([m.get("pk3_name") for m in maps[:3]], self.pk3_files)
+        self.assertEqual(maps[1]["maps"][0]["aggregated_weapons"], {"weapon_railgun": 2})
+        self.assertEqual(maps[3]["error_type"], "FileNotFoundError")
+
+        hits = self.service.cache.hits
+        status, again = self.request(connection, "POST", "/maps", body)
+        self.assertEqual(again, maps)
+        self.assertEqual(self.service.cache.hits, hits + 3)
+
+    def test_postprocess_failure(self):
+        server = self.serve(("127.0.0.1", 0))
+        connection = HTTPConnection(*server.server_address)
+        self.addCleanup(connection.close)
+        pk3_file = write_pk3(
+            os.path.join(self.tmp_dir.name, "fresh.pk3"), {"fresh": bsp_bytes(map_entities("Fresh", {}))}
+        )
+        body = json.dumps(dict(paths=[pk3_file, self.pk3_files[0]]))
+        with mock.patch("bspp.server.pp_pk3", side_effect=ValueError("broken")):
+            status, maps = self.request(connection, "POST", "/maps", body)
+        self.assertEqual(status, 200)
+        self.assertEqual([m.get("error_type") for m in maps], ["ValueError", "ValueError"])
+        # not cached, served once post-processing works again
+        status, maps = self.request(connection, "POST", "/maps", body)
+        self.assertEqual([m["pk3_name"] for m in maps], [pk3_file, self.pk3_files[0]])
+
+        with mock.patch.object(self.service, "process_paths", side_effect=RuntimeError("boom")):
+            connection = HTTPConnection(*server.server_address)
+            self.addCleanup(connection.close)
+            status, error = self.request(connection, "POST", "/maps", body)
+        self.assertEqual((status, error["error"]), (500, "RuntimeError: boom"))
+
+    def test_upload(self):
+        server = self.serve(("127.0.0.1", 0))
+        connection = HTTPConnection(*server.server_address)
+        self.addCleanup(connection.close)
+        files = set(os.listdir(self.tmp_dir.name))
+        with open(self.pk3_files[0], "rb") as f, mock.patch("tempfile.tempdir", self.tmp_dir.name):
+            status, pk3 = self.request(connection, "POST", "/maps/upload?name=upload.pk3", f.read())
+            self.assertEqual(status, 200)
+            self.assertEqual((pk3["pk3_name"], pk3["maps"][0]["map_name"]), ("upload.pk3", "map0"))
+            status, error = self.request(connection, "POST", "/maps/upload", b"not a zip")
+            self.assertEqual((status, error["error_type"]), (200, "BadZipFile"))
+        # the uploads are spooled to temporary files, removed once processed
+        self.assertEqual(set(os.listdir(self.tmp_dir.name)), files)
+
+    @skipUnless(unix_sockets, "no Unix sockets")
+    def test_unix_socket(self):
+        socket_path = os.path.join(self.tmp_dir.name, "bspp.sock")
+        self.serve(socket_path)
+        connection = UnixHTTPConnection(socket_path)
+        self.addCleanup(connection.close)
+        status, health = self.request(connection, "GET", "/health")
+        self.assertEqual((status, health["status"]), (200, "ok"))
+        with open(self.pk3_files[0], "rb") as f:
+            status, pk3 = self.request(connection, "POST", "/maps/upload?name=upload.pk3", f.read())
+        self.assertEqual((status, pk3["maps"][0]["map_name"]), (200, "map0"))
+
+    def test_limits(self):
+        server = self.serve(("127.0.0.1", 0))
+
+        def post(path, body):
+            connection = HTTPConnection(*server.server_address)
+            try:
+                return self.request(connection, "POST", path, body)[0]
+            finally:
+                connection.close()
+
+        self.assertEqual(post("/maps", json.dumps(dict(paths=self.pk3_files * 2))), 413)
+        self.assertEqual(post("/maps", json.dumps(dict(paths=["/etc/passwd.pk3"]))), 403)
+        self.assertEqual(post("/maps", "{"), 400)
+        self.assertEqual(post("/maps", json.dumps(dict(paths="x"))), 400)
+        self.assertEqual(post("/nowhere", ""), 404)
+        options = self.service.options
+        self.service.options = replace(options, wait_timeout=0.01)
+        try:
+            with ExitStack() as busy:
+                for _ in range(8):  # all slots taken
+                    busy.enter_context(self.service.slot())
+                self.assertEqual(post("/maps", json.dumps(dict(paths=self.pk3_files))), 503)
+                # an upload waits for a slot before its body is read
+                self.assertEqual(post("/maps/upload", b"x" * 1024), 503)
+        finally:
+            self.service.options = options
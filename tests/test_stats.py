@@ -0,0 +1,54 @@
+import io
+import os
+import tempfile
+from unittest import TestCase
+
+from bspp import bspp, stats
+from bspp.bspp import Parallelism, ProcessOptions
+from bspp.stats import Stats
+from bench.synthetic import bsp_bytes, map_entities, write_pk3
+
+
+class TestStats(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.pk3_files = [
+            write_pk3(
+                os.path.join(self.tmp_dir.name, f"pack{i}.pk3"),
+                {f"map{i}": bsp_bytes(map_entities(f"Map {i}", {"weapon_railgun": 2}), padding=10_000)},
+            )
+            for i in range(3)
+        ]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_stages(self):
+        events = []
+        with stats.collecting(Stats(callbacks=[events.append])) as collected:
+            stats.timed_output(lambda results: bspp.json_lines(results, io.StringIO()), bspp.process(self.pk3_files))
+        self.assertEqual(set(collected.stages), {"file", "pk3", "map", "bsp_hash", "entities", "pp_map", "output"})
+        self.assertEqual(collected.stages["file"].count, 3)
+        self.assertEqual(collected.stages["entities"].entities, 9)
+        bsp_size = len(bsp_bytes(map_entities("Map 0", {"weapon_railgun": 2}), padding=10_000))
+        self.assertEqual(collected.stages["map"].bytes_out, 3 * bsp_size)
+        self.assertEqual(collected.stages["bsp_hash"].bytes_in, collected.stages["map"].bytes_out)
+        self.assertEqual(len(events), sum(totals.count for totals in collected.stages.values()))
+        self.assertEqual(collected.slow, [])
+
+    def test_slow_log(self):
+        with stats.collecting(Stats(slow_threshold=0)) as collected, self.assertLogs("bspp.stats", "WARNING"):
+            list(bspp.process(self.pk3_files))
+        self.assertEqual(sorted(event.name for event in collected.slow), self.pk3_files)
+
+    def test_parallel(self):
+        with stats.collecting(Stats()) as collected:
+            list(bspp.process(self.pk3_files, ProcessOptions(parallel=Parallelism(2))))
+        self.assertEqual(collected.stages["file"].count, 3)
+        self.assertEqual(collected.stages["bsp_hash"].count, 3)
+
+    def test_disabled(self):
+        self.assertIsNone(stats.active())
+        with stats.timed("file") as timer:
+            self.assertFalse(timer)
+        list(bspp.process(self.pk3_files))
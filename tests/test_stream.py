@@ -0,0 +1,49 @@
+import io
+import os
+import tempfile
+from unittest import TestCase
+from zipfile import ZIP_STORED, ZIP_DEFLATED
+
+from bspp import bspp
+from bspp.hash import bsp_hash
+from bench.synthetic import bsp_bytes, map_entities, write_pk3
+
+
+class TestStream(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.bsp_data = bsp_bytes(map_entities("Streamed", {"item_quad": 1, "weapon_bfg": 2}), padding=600_000)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_read_lump(self):
+        self.assertEqual(
+            bspp.read_lump(io.BytesIO(self.bsp_data), 0, len(self.bsp_data)), bspp.get_lump(self.bsp_data, 0)
+        )
+
+    def test_read_lump_and_hash(self):
+        expected = (bspp.get_lump(self.bsp_data, 0), bsp_hash(self.bsp_data))
+        for read_size in (7, 0x90, 4096, len(self.bsp_data) + 1):
+            self.assertEqual(
+                bspp.read_lump_and_hash(io.BytesIO(self.bsp_data), 0, len(self.bsp_data), read_size), expected
+            )
+
+    def test_map_file(self):
+        bsp_file = os.path.join(self.tmp_dir.name, "streamed.bsp")
+        with open(bsp_file, "wb") as f:
+            f.write(self.bsp_data)
+        bsp_map = bspp.process_map_file(bsp_file)
+        self.assertEqual(bsp_map.crc, bsp_hash(self.bsp_data))
+        self.assertEqual(bsp_map.entities, bspp.process_entities(self.bsp_data))
+
+    def test_pk3_compression_types(self):
+        stored, deflated = [
+            bspp.process_pk3_file(
+                write_pk3(os.path.join(self.tmp_dir.name, f"{c}.pk3"), {"streamed": self.bsp_data}, c)
+            )
+            for c in (ZIP_STORED, ZIP_DEFLATED)
+        ]
+        self.assertEqual(stored.map_entities, deflated.map_entities)
+        self.assertEqual(stored.map_entities[0].crc, bsp_hash(self.bsp_data))
+        self.assertEqual(len(stored.map_entities[0].entities), 4)
@@ -0,0 +1,29 @@
+import os
+import tempfile
+from unittest import TestCase
+from zipfile import ZIP_STORED, ZipFile
+
+from bspp import bspp
+from bench.synthetic import synthetic_bsp, write_synthetic_tree
+
+
+class TestSynthetic(TestCase):
+    def test_deterministic_bsp(self):
+        bsp_data = synthetic_bsp(200, lump_size=50_000, bsp_size=300_000, seed=7)
+        self.assertEqual(bsp_data, synthetic_bsp(200, lump_size=50_000, bsp_size=300_000, seed=7))
+        self.assertNotEqual(bsp_data, synthetic_bsp(200, lump_size=50_000, bsp_size=300_000, seed=8))
+        self.assertGreaterEqual(len(bspp.get_lump(bsp_data, 0)), 50_000 - 1)
+        self.assertEqual(len(bsp_data), 300_000)
+
+    def test_tree(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            pk3_files = write_synthetic_tree(tmp_dir, 2, maps_per_pk3=3, entity_count=50, compression=ZIP_STORED)
+            with ZipFile(pk3_files[0]) as pk3_zip:
+                self.assertEqual(len(pk3_zip.namelist()), 3)
+                self.assertEqual({info.compress_type for info in pk3_zip.infolist()}, {ZIP_STORED})
+            results = list(bspp.process([tmp_dir]))
+        self.assertEqual(
+            sorted(os.path.basename(pk3.pk3_name) for pk3 in results), ["synth00000.pk3", "synth00001.pk3"]
+        )
+        self.assertEqual(len({m.crc for pk3 in results for m in pk3.map_entities}), 6)
+        self.assertEqual(len(results[0].map_entities[0].entities), 51)
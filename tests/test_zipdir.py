@@ -0,0 +1,107 @@
+import io
+import os
+import struct
+import tempfile
+import zipfile
+from contextlib import redirect_stdout
+from unittest import TestCase
+from unittest.mock import patch
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
+
+from bspp import bspp
+from bspp.hash import pk3_hash
+from bspp.model import MapListing
+from bspp.out_plain_text import plain_listing
+from bspp.zipdir import _zip64_sizes, read_central_directory
+from bench.synthetic import bsp_bytes, map_entities, write_pk3
+
+
+def zip_entries(data: bytes):
+    with ZipFile(io.BytesIO(data)) as zip_obj:
+        return [
+            (i.filename, i.CRC, i.compress_type, i.compress_size, i.file_size, i.header_offset)
+            for i in zip_obj.infolist()
+        ]
+
+
+def archive(comment: bytes = b"", compression: int = ZIP_DEFLATED) -> bytes:
+    buffer = io.BytesIO()
+    with ZipFile(buffer, "w", compression) as zip_obj:
+        zip_obj.writestr("maps/", b"")
+        zip_obj.writestr("maps/a.bsp", bsp_bytes(map_entities("A", {"item_quad": 1})))
+        zip_obj.writestr("textures/ünicode.tga", b"\0" * 100)
+        zip_obj.writestr("maps/b.bsp", bsp_bytes(map_entities("B", {}), padding=5000))
+        zip_obj.comment = comment
+    return buffer.getvalue()
+
+
+class TestZipDir(TestCase):
+    def assertSameEntries(self, data: bytes):
+        entries = read_central_directory(io.BytesIO(data))
+        self.assertEqual([tuple(e) for e in entries], zip_entries(data))
+        return entries
+
+    def test_matches_zipfile(self):
+        for compression in (ZIP_STORED, ZIP_DEFLATED):
+            entries = self.assertSameEntries(archive(compression=compression))
+            self.assertEqual(entries[2].filename, "textures/ünicode.tga")
+
+    def test_comment(self):
+        self.assertSameEntries(archive(b"x" * 1000))
+        # ZipFile takes the last signature, even one inside the comment
+        entries = read_central_directory(io.BytesIO(archive(b"PK\x05\x06 looks like a record")))
+        self.assertEqual([tuple(e) for e in entries], zip_entries(archive()))
+
+    def test_prepended_data(self):
+        self.assertSameEntries(b"\x7fELF stub" * 100 + archive())
+
+    def test_zip64(self):
+        with patch.object(zipfile, "ZIP64_LIMIT", 64), patch.object(zipfile, "ZIP_FILECOUNT_LIMIT", 2):
+            data = archive()
+        self.assertIn(b"PK\x06\x06", data)
+        entries = self.assertSameEntries(data)
+        self.assertEqual(len(entries), 4)
+
+    def test_not_a_zip(self):
+        with self.assertRaises(zipfile.BadZipFile):
+            read_central_directory(io.BytesIO(b"not a zip file" * 10))
+        with self.assertRaises(zipfile.BadZipFile):
+            read_central_directory(io.BytesIO(archive()[-200:]))
+
+    def test_truncated(self):
+        eocd = struct.pack("<4s4H2LH", b"PK\x05\x06", 0, 0, 1, 1, 10, 0, 0)
+        locator = struct.pack("<4sLQL", b"PK\x06\x07", 0, 0, 1)
+        for data in (b"PK\x01\x02" + b"\0" * 6 + eocd, locator + eocd):
+            with self.assertRaises(zipfile.BadZipFile):
+                read_central_directory(io.BytesIO(data))
+        with self.assertRaises(zipfile.BadZipFile):
+            _zip64_sizes(struct.pack("<2HQ", 1, 8, 5), 0xFFFFFFFF, 0xFFFFFFFF, 0)
+        self.assertEqual(_zip64_sizes(struct.pack("<2HQ", 1, 16, 5), 0xFFFFFFFF, 7, 0), (5, 7, 0))
+
+    def test_list_pk3(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            pk3_file = os.path.join(tmp_dir, "pack.pk3")
+            with open(pk3_file, "wb") as f:
+                f.write(archive())
+            with open(os.path.join(tmp_dir, "readme.txt"), "w") as f:
+                f.write("not listed")
+            listing = bspp.list_pk3(pk3_file)
+            self.assertEqual(listing.crc, pk3_hash(pk3_file))
+            with ZipFile(pk3_file) as zip_obj:
+                sizes = [zip_obj.getinfo(f"maps/{name}.bsp").file_size for name in ("a", "b")]
+            self.assertEqual(listing.maps, [MapListing("a", sizes[0]), MapListing("b", sizes[1])])
+            self.assertEqual(list(bspp.inventory([tmp_dir])), [listing])
+            with patch.object(bspp, "lump_entities") as lump_entities:
+                list(bspp.inventory([pk3_file]))
+            lump_entities.assert_not_called()
+
+    def test_outputs(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            pk3_file = write_pk3(os.path.join(tmp_dir, "pack.pk3"), {"q3ctf1": bsp_bytes(map_entities("Q", {}))})
+            listing = bspp.list_pk3(pk3_file)
+        out = io.StringIO()
+        bspp.json_lines([listing], out)
+        self.assertIn('"maps":[{"map_name":"q3ctf1","size":', out.getvalue())
+        with redirect_stdout(io.StringIO()) as text:
+            plain_listing([listing])
+        self.assertIn("  q3ctf1 : ", text.getvalue())